@@ -1,10 +1,35 @@
-from app.models.student import Student
+from app.models.student import Student, VersionConflict
+from app.models.student_change import CursorExpired, StudentChangeLog, change_notifier
+from app.models.student_stats import RebuildThrottled, StudentStats
+from app.models.student_query import QueryError, StudentQuery
+import json
 import logging
+import zlib
 
 logger = logging.getLogger(__name__)
 
 class StudentController:
     """Controller for student business logic."""
+
+    DEFAULT_PAGE_SIZE = 100
+    MAX_PAGE_SIZE = 1000
+    STREAM_CHUNK_SIZE = 1000
+    MAX_BATCH_IDS = 500
+    DEFAULT_SEARCH_LIMIT = 20
+    MAX_SEARCH_LIMIT = 100
+    # Trigram matching needs at least three characters; shorter terms use prefix mode
+    MIN_TRIGRAM_TERM = 3
+    DEFAULT_CHANGES_LIMIT = 500
+    MAX_CHANGES_LIMIT = 5000
+    # Longest long-poll on /students/changes; keep below the server's graceful shutdown timeout
+    MAX_CHANGES_WAIT = 20
+    # Lower edges of the /students/stats age histogram buckets after the first
+    DEFAULT_AGE_BUCKETS = (18, 25, 35, 50, 65)
+    MAX_AGE_BUCKETS = 50
+    DEFAULT_STATS_DOMAINS = 10
+    MAX_STATS_DOMAINS = 100
+    # 'python' builds list responses from Student objects, 'db' has Postgres render the JSON
+    SERIALIZATION_MODES = ('python', 'db')
     
     @staticmethod
     def get_all_students():
@@ -16,6 +41,276 @@ class StudentController:
             logger.error(f"Controller error getting all students: {e}")
             return None, str(e)
     
+    @staticmethod
+    def build_query(args):
+        """Compile list arguments (fields, filters, sort) into a StudentQuery."""
+        try:
+            return StudentQuery.from_args(args), None
+        except QueryError as e:
+            return None, str(e)
+
+    @staticmethod
+    def get_students_page(query=None, after=None, limit=None, serialize='python'):
+        """Get one keyset page of students plus the key of its last row.
+
+        ``next_key`` is the (sort value, id) to continue from, or None on the
+        last page. With ``serialize='db'`` the page comes back as pre-rendered
+        JSON bytes under ``data_json`` instead of a list of dicts under ``data``.
+        """
+        try:
+            query = query or StudentQuery()
+            limit = limit or StudentController.DEFAULT_PAGE_SIZE
+            if serialize == 'db':
+                data_json, next_key = Student.get_page_json(query, after, limit)
+                return {'data_json': data_json, 'next_key': next_key}, None
+            rows, has_more = Student.get_page(query, after, limit)
+            return {
+                'data': [StudentController._row_dict(query, row) for row in rows],
+                'next_key': query.key_of(rows[-1]) if has_more else None
+            }, None
+        except Exception as e:
+            logger.error(f"Controller error getting students page after {after}: {e}")
+            return None, str(e)
+
+    @staticmethod
+    def _row_dict(query, row):
+        """Serialize a row; full rows go through Student, sparse ones map fields directly."""
+        if query.is_full:
+            return Student.from_row(row).to_dict()
+        return query.to_dict(row)
+
+    @staticmethod
+    def get_students_by_ids(student_ids):
+        """Get several students by ID; IDs that do not exist are listed as missing."""
+        try:
+            students = Student.get_many(student_ids)
+            return {
+                'data': [student.to_dict() for student in students if student],
+                'missing': [student_id for student_id, student in zip(student_ids, students) if not student]
+            }, None
+        except Exception as e:
+            logger.error(f"Controller error getting students {student_ids}: {e}")
+            return None, str(e)
+
+    @staticmethod
+    def search_students(term, limit=None, prefix=False):
+        """Search students by partial name or email, ranked by similarity."""
+        try:
+            prefix = prefix or len(term) < StudentController.MIN_TRIGRAM_TERM
+            results = Student.search(term, limit or StudentController.DEFAULT_SEARCH_LIMIT, prefix)
+            return {
+                'query': term,
+                'mode': 'prefix' if prefix else 'fuzzy',
+                'data': [dict(student.to_dict(), score=round(score, 4)) for student, score in results]
+            }, None
+        except Exception as e:
+            logger.error(f"Controller error searching students for {term!r}: {e}")
+            return None, str(e)
+
+    @staticmethod
+    def get_changes(since=None, limit=None):
+        """Get the students changed after cursor ``since``, compacted to one entry each.
+
+        Entries are ``{'op': 'upsert', 'id', 'student'}`` with the current row,
+        or ``{'op': 'delete', 'id'}`` when the student no longer exists; a
+        truncation shows up as a leading ``{'op': 'reset'}``. Without ``since``
+        no changes are returned, only the cursor to start from.
+        """
+        try:
+            if since is None:
+                return {'changes': [], 'cursor': StudentChangeLog.latest(), 'has_more': False}, None
+            limit = limit or StudentController.DEFAULT_CHANGES_LIMIT
+            entries, has_more = StudentChangeLog.read(since, limit)
+            reset = False
+            latest = {}
+            for seq, student_id, row in entries:
+                if student_id is None:
+                    # TRUNCATE: everything before it is gone
+                    reset = True
+                    latest.clear()
+                    continue
+                # Re-insert so the dict stays ordered by each student's newest change
+                latest.pop(student_id, None)
+                latest[student_id] = row
+            changes = [{'op': 'reset'}] if reset else []
+            for student_id, row in latest.items():
+                if row is None:
+                    changes.append({'op': 'delete', 'id': student_id})
+                else:
+                    changes.append({'op': 'upsert', 'id': student_id, 'student': Student.from_row(row).to_dict()})
+            return {
+                'changes': changes,
+                'cursor': entries[-1][0] if entries else since,
+                'has_more': has_more
+            }, None
+        except CursorExpired:
+            return None, "Cursor expired"
+        except Exception as e:
+            logger.error(f"Controller error getting student changes after {since}: {e}")
+            return None, str(e)
+
+    @staticmethod
+    def wait_for_changes(since, timeout, interrupted=None):
+        """Block until a change after ``since`` is announced over LISTEN/NOTIFY or ``timeout`` passes."""
+        return change_notifier.wait(since, timeout, interrupted)
+
+    @staticmethod
+    def get_student_stats(age_buckets=None, domain_limit=None):
+        """Get roster statistics: total, age distribution and top email domains.
+
+        ``age_buckets`` are ascending lower edges: ``(18, 25)`` gives the
+        buckets below 18, 18-24 and 25 and over. Everything is derived from the
+        per-age and per-domain summary counts, never from the students rows.
+        """
+        try:
+            summary = StudentStats.summary(domain_limit or StudentController.DEFAULT_STATS_DOMAINS)
+            return StudentController._stats_response(summary, age_buckets), None
+        except Exception as e:
+            logger.error(f"Controller error getting student statistics: {e}")
+            return None, str(e)
+
+    @staticmethod
+    def rebuild_student_stats(age_buckets=None, domain_limit=None):
+        """Rebuild the statistics summary from the students table; returns the rebuilt stats and ``drift``.
+
+        When throttled the result is ``{'retry_after': seconds}`` with the
+        error "Rebuild throttled".
+        """
+        try:
+            drift, summary = StudentStats.rebuild(domain_limit or StudentController.DEFAULT_STATS_DOMAINS)
+            stats = StudentController._stats_response(summary, age_buckets)
+            stats['drift'] = drift
+            return stats, None
+        except RebuildThrottled as e:
+            return {'retry_after': e.retry_after}, "Rebuild throttled"
+        except Exception as e:
+            logger.error(f"Controller error rebuilding student statistics: {e}")
+            return None, str(e)
+
+    @staticmethod
+    def _stats_response(summary, age_buckets):
+        total, refreshed_at, ages, domains = summary
+        edges = list(age_buckets or StudentController.DEFAULT_AGE_BUCKETS)
+        histogram = [
+            {'min': low, 'max': high - 1 if high is not None else None, 'count': 0}
+            for low, high in zip([None] + edges, edges + [None])
+        ]
+        known = age_sum = 0
+        bucket = 0
+        for age, count in ages:
+            while bucket < len(edges) and age >= edges[bucket]:
+                bucket += 1
+            histogram[bucket]['count'] += count
+            known += count
+            age_sum += age * count
+        top = [{'domain': domain, 'count': count} for domain, count in domains]
+        return {
+            'total': total,
+            'age': {
+                'min': ages[0][0] if ages else None,
+                'max': ages[-1][0] if ages else None,
+                'avg': round(age_sum / known, 2) if known else None,
+                'known': known,
+                'unknown': total - known,
+                'histogram': histogram
+            },
+            'email_domains': {
+                'top': top,
+                'other': total - sum(entry['count'] for entry in top)
+            },
+            'refreshed_at': refreshed_at.isoformat() if refreshed_at else None
+        }
+
+    @staticmethod
+    def stream_all_students(query=None, serialize='python'):
+        """Stream all students matching ``query`` as a JSON array.
+
+        The first chunk is read eagerly so connection and query errors are
+        reported before the response has started.
+        """
+        query = query or StudentQuery()
+        try:
+            if serialize == 'db':
+                chunks = Student.iter_json(query)
+                first_chunk = next(chunks, b'')
+            else:
+                chunks = Student.iter_rows(query, StudentController.STREAM_CHUNK_SIZE)
+                first_chunk = next(chunks, [])
+        except Exception as e:
+            logger.error(f"Controller error streaming students: {e}")
+            return None, str(e)
+        if serialize == 'db':
+            return StudentController._ndjson_array(first_chunk, chunks), None
+        return StudentController._json_array(query, first_chunk, chunks), None
+
+    @staticmethod
+    def _ndjson_array(first_chunk, chunks):
+        """Join NDJSON chunks made of whole rows into one JSON array, as bytes."""
+        yield b'['
+        separator = b''
+        try:
+            for chunk in StudentController._prepend(first_chunk, chunks):
+                yield separator + chunk[:-1].replace(b'\n', b',')
+                separator = b','
+        finally:
+            chunks.close()
+        yield b']'
+
+    @staticmethod
+    def _json_array(query, first_chunk, chunks):
+        """Encode row chunks into pieces of one JSON array."""
+        yield '['
+        separator = ''
+        rows = first_chunk
+        try:
+            while rows:
+                yield separator + ','.join(json.dumps(StudentController._row_dict(query, row)) for row in rows)
+                separator = ','
+                rows = next(chunks, None)
+        finally:
+            chunks.close()
+        yield ']'
+
+    @staticmethod
+    def export_students(fmt, gzip=False):
+        """Stream a COPY export of all students, optionally gzip-compressed.
+
+        The first chunk is read eagerly so a failing query is reported as an
+        error instead of a truncated file.
+        """
+        try:
+            chunks = Student.export(fmt)
+            first_chunk = next(chunks, b'')
+        except Exception as e:
+            logger.error(f"Controller error exporting students as {fmt}: {e}")
+            return None, str(e)
+        body = StudentController._prepend(first_chunk, chunks)
+        if gzip:
+            body = StudentController._gzip(body)
+        return body, None
+
+    @staticmethod
+    def _prepend(first_chunk, chunks):
+        try:
+            if first_chunk:
+                yield first_chunk
+            yield from chunks
+        finally:
+            chunks.close()
+
+    @staticmethod
+    def _gzip(chunks):
+        """Compress a byte stream into gzip members without buffering it."""
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        try:
+            for chunk in chunks:
+                compressed = compressor.compress(chunk)
+                if compressed:
+                    yield compressed
+        finally:
+            chunks.close()
+        yield compressor.flush()
+
     @staticmethod
     def get_student_by_id(student_id):
         """Get student by ID."""
@@ -28,18 +323,31 @@ class StudentController:
             logger.error(f"Controller error getting student {student_id}: {e}")
             return None, str(e)
     
+    @staticmethod
+    def get_student_version(student_id):
+        """Get a student's row version without loading the student."""
+        try:
+            version = Student.get_version(student_id)
+            if version is None:
+                return None, "Student not found"
+            return version, None
+        except Exception as e:
+            logger.error(f"Controller error getting version of student {student_id}: {e}")
+            return None, str(e)
+
+    @staticmethod
+    def get_students_version():
+        """Get the students table's change counter."""
+        try:
+            return Student.table_version(), None
+        except Exception as e:
+            logger.error(f"Controller error getting students table version: {e}")
+            return None, str(e)
+
     @staticmethod
     def create_student(student_data):
-        """Create a new student."""
-        try:
-            # Validate required fields
-            if not student_data.get('name') or not student_data.get('email'):
-                return None, "Name and Email are required"
-            
-            # Additional validation can be added here
-            if not StudentController._is_valid_email(student_data.get('email')):
-                return None, "Invalid email format"
-            
+        """Create a new student from values returned by validate_student_data."""
+        try:
             student = Student.create(
                 name=student_data['name'],
                 email=student_data['email'],
@@ -51,75 +359,109 @@ class StudentController:
             return None, str(e)
     
     @staticmethod
-    def update_student(student_id, student_data):
-        """Update an existing student."""
+    def bulk_create_students(records, atomic=True):
+        """Validate and insert many students, reporting a result per record.
+
+        Every record is validated up front by the same schema as single
+        creates. In atomic mode a single invalid record (or database error)
+        means nothing is inserted; otherwise valid records are inserted and
+        invalid ones reported alongside them.
+        """
         try:
-            student = Student.get_by_id(student_id)
-            if not student:
+            results = []
+            rows = []
+            for index, (values, errors) in enumerate(Student.SCHEMA.validate_many(records)):
+                if errors:
+                    results.append({'index': index, 'status': 'error', 'errors': errors})
+                    continue
+                rows.append((values['name'], values['email'], values.get('age')))
+                results.append({'index': index, 'status': 'pending'})
+
+            if rows and not (atomic and len(rows) < len(records)):
+                inserted = iter(Student.bulk_create(rows, atomic=atomic))
+                for result in results:
+                    if result['status'] != 'pending':
+                        continue
+                    student_id, error = next(inserted)
+                    if error:
+                        result.update(status='error', errors=[error])
+                    else:
+                        result.update(status='created', id=student_id)
+            for result in results:
+                if result['status'] == 'pending':
+                    result['status'] = 'skipped'
+
+            return {
+                'mode': 'atomic' if atomic else 'partial',
+                'created': sum(1 for result in results if result['status'] == 'created'),
+                'failed': sum(1 for result in results if result['status'] == 'error'),
+                'results': results
+            }, None
+        except Exception as e:
+            logger.error(f"Controller error bulk creating students: {e}")
+            return None, str(e)
+    
+    @staticmethod
+    def update_student(student_id, student_data, expected_version=None):
+        """Update an existing student (PUT): fields that are missing or null are kept.
+
+        ``student_data`` comes from validate_student_data. With
+        ``expected_version`` (from If-Match) the update only applies if
+        nobody changed the student since that version was read.
+        """
+        try:
+            fields = {
+                column: student_data[column]
+                for column in Student.UPDATABLE_COLUMNS
+                if student_data.get(column) is not None
+            }
+            updated_student = Student.update_by_id(student_id, expected_version, **fields)
+            if not updated_student:
                 return None, "Student not found"
-            
-            # Validate email if provided
-            if student_data.get('email') and not StudentController._is_valid_email(student_data.get('email')):
-                return None, "Invalid email format"
-            
-            updated_student = student.update(
-                name=student_data.get('name'),
-                email=student_data.get('email'),
-                age=student_data.get('age')
-            )
             return updated_student.to_dict(), None
+        except VersionConflict:
+            return None, "Version mismatch"
         except Exception as e:
             logger.error(f"Controller error updating student {student_id}: {e}")
             return None, str(e)
     
     @staticmethod
-    def delete_student(student_id):
-        """Delete a student."""
+    def patch_student(student_id, student_data, expected_version=None):
+        """Partially update a student (PATCH): only the columns sent are written.
+
+        Unlike PUT, an explicit null clears a nullable column such as age.
+        """
         try:
-            student = Student.get_by_id(student_id)
-            if not student:
+            fields = {column: student_data[column] for column in Student.UPDATABLE_COLUMNS if column in student_data}
+            updated_student = Student.update_by_id(student_id, expected_version, **fields)
+            if not updated_student:
+                return None, "Student not found"
+            return updated_student.to_dict(), None
+        except VersionConflict:
+            return None, "Version mismatch"
+        except Exception as e:
+            logger.error(f"Controller error patching student {student_id}: {e}")
+            return None, str(e)
+    
+    @staticmethod
+    def delete_student(student_id, expected_version=None):
+        """Delete a student, optionally only while it is at ``expected_version``."""
+        try:
+            if not Student.delete_by_id(student_id, expected_version):
                 return False, "Student not found"
-            
-            success = student.delete()
-            if success:
-                return True, "Student deleted successfully"
-            else:
-                return False, "Failed to delete student"
+            return True, "Student deleted successfully"
+        except VersionConflict:
+            return False, "Version mismatch"
         except Exception as e:
             logger.error(f"Controller error deleting student {student_id}: {e}")
             return False, str(e)
     
     @staticmethod
-    def _is_valid_email(email):
-        """Basic email validation."""
-        import re
-        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return re.match(email_pattern, email) is not None
-    
-    @staticmethod
-    def validate_student_data(data, required_fields=None):
-        """Validate student data."""
-        if required_fields is None:
-            required_fields = ['name', 'email']
-        
-        errors = []
-        
-        # Check required fields
-        for field in required_fields:
-            if not data.get(field):
-                errors.append(f"{field.capitalize()} is required")
-        
-        # Validate email format
-        if data.get('email') and not StudentController._is_valid_email(data['email']):
-            errors.append("Invalid email format")
-        
-        # Validate age if provided
-        if data.get('age') is not None:
-            try:
-                age = int(data['age'])
-                if age < 0 or age > 150:
-                    errors.append("Age must be between 0 and 150")
-            except (ValueError, TypeError):
-                errors.append("Age must be a valid number")
-        
-        return errors
+    def validate_student_data(data, required_fields=None, partial=False, reject_unknown=False):
+        """Validate and normalize student input in one pass over Student.SCHEMA.
+
+        Returns (values, errors): ``values`` holds the sent fields with age as
+        an int, ``errors`` every problem found. ``required_fields`` defaults
+        to name and email; ``partial`` only requires them when sent.
+        """
+        return Student.SCHEMA.validate(data, required_fields, partial, reject_unknown)
@@ -1,56 +1,363 @@
+from app.models.student_query import StudentQuery
+from app.utils.batching import BatchLoader, BatchWriter
+from app.utils.cache import MISS, cache_manager
 from app.utils.database import db_manager
+from app.utils.idempotency import bound_key, mark_applied
+from app.utils.logs import log_sampled
+from app.utils.metrics import metrics, stats_collector
+from app.utils.replicas import mark_write, reads_use_primary
+from app.utils.validation import Field, Schema
+import csv
+import io
 import logging
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+from psycopg2.extras import execute_values
 
 logger = logging.getLogger(__name__)
 
+
+class VersionConflict(Exception):
+    """Raised when a conditional write finds the row at a different version."""
+
+    def __init__(self, student_id, expected, actual):
+        super().__init__(f"Student {student_id} is at version {actual}, not {expected}")
+        self.student_id = student_id
+        self.expected = expected
+        self.actual = actual
+
+
 class Student:
     """Student model for database operations."""
+
+    # Explicit column list so row positions stay stable for from_row()
+    COLUMNS = "id, name, email, age"
+    # Single-row reads and writes also return the row version (for ETags)
+    ROW_COLUMNS = COLUMNS + ", version"
+
+    # Columns clients may write; used to whitelist partial updates
+    UPDATABLE_COLUMNS = ("name", "email", "age")
+
+    # Input rules for writes, compiled once; limits mirror the table definition
+    SCHEMA = Schema(
+        Field('name', str, required=True, nullable=False, max_length=100),
+        Field('email', str, required=True, nullable=False, max_length=100,
+              pattern=r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', pattern_error="Invalid email format"),
+        Field('age', int, min_value=0, max_value=150),
+    )
+
+    # Cache key for the full listing; single rows use _cache_key()
+    ALL_CACHE_KEY = "students:all"
+
+    # Rows per multi-row INSERT statement in bulk loads
+    BULK_BATCH_SIZE = 500
+    # All-or-nothing loads at least this large go through COPY instead
+    BULK_COPY_THRESHOLD = 5000
+
+    # COPY statements for bulk export. NDJSON uses CSV mode with quote and
+    # delimiter bytes that never occur in JSON text, so Postgres writes each
+    # row_to_json() document verbatim (text mode would escape backslashes).
+    EXPORT_FORMATS = {
+        'csv': (
+            f"COPY (SELECT {COLUMNS} FROM students ORDER BY id) "
+            "TO STDOUT WITH (FORMAT csv, HEADER)"
+        ),
+        'ndjson': (
+            f"COPY (SELECT row_to_json(s) FROM (SELECT {COLUMNS} FROM students ORDER BY id) s) "
+            "TO STDOUT WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')"
+        ),
+    }
     
-    def __init__(self, id=None, name=None, email=None, age=None):
+    def __init__(self, id=None, name=None, email=None, age=None, version=None):
         self.id = id
         self.name = name
         self.email = email
         self.age = age
+        self.version = version
     
     def to_dict(self):
-        """Convert Student object to dictionary."""
-        return {
+        """Convert Student object to dictionary (with the version when it was read)."""
+        data = {
             'id': self.id,
             'name': self.name,
             'email': self.email,
             'age': self.age
         }
+        if self.version is not None:
+            data['version'] = self.version
+        return data
     
     @classmethod
     def from_row(cls, row):
-        """Create Student object from database row."""
+        """Create Student object from a COLUMNS or ROW_COLUMNS database row."""
         if not row:
             return None
-        return cls(id=row[0], name=row[1], email=row[2], age=row[3])
+        version = row[4] if len(row) > 4 else None
+        return cls(id=row[0], name=row[1], email=row[2], age=row[3], version=version)
     
+    @staticmethod
+    def _cache_key(student_id):
+        return f"student:{student_id}"
+
+    def _invalidation_keys(self):
+        return (self._cache_key(self.id), self.ALL_CACHE_KEY)
+
     @classmethod
     def get_all(cls):
-        """Retrieve all students from database."""
+        """Retrieve all students from database (read through the cache)."""
         try:
-            with db_manager.get_db_cursor() as (conn, cur):
-                cur.execute("SELECT * FROM students")
-                rows = cur.fetchall()
-                return [cls.from_row(row) for row in rows]
+            rows = cache_manager.get(cls.ALL_CACHE_KEY)
+            if rows is MISS:
+                with db_manager.get_db_cursor(readonly=True) as (conn, cur):
+                    cur.execute(f"SELECT {cls.COLUMNS} FROM students ORDER BY id")
+                    rows = cur.fetchall()
+                    # A lagging replica could fill the cache with rows a write already invalidated
+                    cacheable = not db_manager.is_replica_connection(conn)
+                if cacheable:
+                    cache_manager.set(cls.ALL_CACHE_KEY, rows)
+            return [cls.from_row(row) for row in rows]
         except Exception as e:
             logger.error(f"Error retrieving all students: {e}")
             raise
     
     @classmethod
-    def get_by_id(cls, student_id):
-        """Retrieve a student by ID."""
+    def get_page(cls, query=None, after=None, limit=100):
+        """Retrieve one keyset page of raw rows for a StudentQuery.
+
+        ``after`` is the (sort value, id) key of the previous page's last row.
+        Returns a tuple of (rows, has_more). One extra row is fetched so the
+        caller knows whether a next page exists without a second query.
+        """
+        query = query or StudentQuery()
+        sql, params = query.select(after, limit + 1)
         try:
-            with db_manager.get_db_cursor() as (conn, cur):
-                cur.execute("SELECT * FROM students WHERE id = %s", (student_id,))
+            with db_manager.get_db_cursor(readonly=True) as (conn, cur):
+                cur.execute(sql, params)
+                rows = cur.fetchall()
+                return rows[:limit], len(rows) > limit
+        except Exception as e:
+            logger.error(f"Error retrieving students after {after}: {e}")
+            raise
+
+    @classmethod
+    def get_page_json(cls, query=None, after=None, limit=100):
+        """Like get_page(), but Postgres renders the page as a JSON array.
+
+        Returns (json_bytes, next_key) where next_key is the (sort value, id)
+        of the last row when another page exists, else None. The array
+        arrives as raw bytes and is never decoded or turned into Python objects.
+        """
+        query = query or StudentQuery()
+        where, params = query.where(after)
+        sort = query.sort_column
+        try:
+            with db_manager.get_db_cursor(readonly=True) as (conn, cur):
+                psycopg2.extensions.register_type(psycopg2.extensions.BYTES, cur)
+                cur.execute(
+                    f"SELECT coalesce(json_agg({query.json_object('s.')} ORDER BY n) "
+                    "FILTER (WHERE n <= %s), '[]')::text, "
+                    f"max(CASE WHEN n = %s THEN s.{sort} END), max(CASE WHEN n = %s THEN s.id END), count(*) > %s "
+                    f"FROM (SELECT {', '.join(query.select_columns)}, row_number() OVER ({query.order_by()}) AS n "
+                    f"FROM students {where} {query.order_by()} LIMIT %s) s",
+                    [limit, limit, limit, limit] + params + [limit + 1]
+                )
+                data, sort_value, last_id, has_more = cur.fetchone()
+                if isinstance(sort_value, bytes):
+                    sort_value = sort_value.decode()
+                return bytes(data), (sort_value, last_id) if has_more else None
+        except Exception as e:
+            logger.error(f"Error retrieving JSON page of students after {after}: {e}")
+            raise
+
+    @classmethod
+    def iter_json(cls, query=None):
+        """Yield NDJSON byte chunks of the matching students, rendered by Postgres.
+
+        Each chunk holds whole rows, i.e. it always ends with a newline.
+        """
+        query = query or StudentQuery()
+        where, params = query.where()
+        return db_manager.stream_copy(
+            f"COPY (SELECT {query.json_object()} FROM students {where} {query.order_by()}) "
+            f"TO STDOUT WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')",
+            params,
+            readonly=True
+        )
+
+    @classmethod
+    def iter_rows(cls, query=None, chunk_size=1000):
+        """Yield lists of raw rows for a StudentQuery read through a server-side cursor.
+
+        Only ``chunk_size`` rows are held in memory at a time, whatever the
+        size of the table. The pooled connection stays checked out until the
+        generator is exhausted or closed.
+        """
+        query = query or StudentQuery()
+        sql, params = query.select()
+        try:
+            with db_manager.get_db_cursor(name="students_stream", readonly=True) as (conn, cur):
+                cur.itersize = chunk_size
+                cur.execute(sql, params)
+                while True:
+                    rows = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+        except Exception as e:
+            logger.error(f"Error streaming students: {e}")
+            raise
+
+    @classmethod
+    def export(cls, fmt):
+        """Stream every student as CSV or NDJSON bytes produced by Postgres.
+
+        Rows are rendered by ``COPY (SELECT ...) TO STDOUT`` and passed through
+        untouched, so no per-row Python objects are created.
+        """
+        if fmt not in cls.EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        return db_manager.stream_copy(cls.EXPORT_FORMATS[fmt], readonly=True)
+
+    @classmethod
+    def search_sql(cls, term, limit=20, prefix=False):
+        """Build the (sql, params) for a ranked name/email search.
+
+        The default mode matches substrings (``ILIKE``) and near-misses
+        (trigram ``%``), both served by the pg_trgm GIN indexes. Prefix mode
+        only matches the start of name or email via the lower(...)
+        text_pattern_ops indexes. Results are ranked by trigram similarity.
+        """
+        escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        score = "greatest(similarity(name, %(term)s), similarity(email, %(term)s))"
+        if prefix:
+            condition = "lower(name) LIKE %(pattern)s OR lower(email) LIKE %(pattern)s"
+            pattern = escaped.lower() + '%'
+        else:
+            condition = ("name ILIKE %(pattern)s OR email ILIKE %(pattern)s "
+                         "OR name %% %(term)s OR email %% %(term)s")
+            pattern = '%' + escaped + '%'
+        sql = (
+            f"SELECT {cls.COLUMNS}, {score} AS score FROM students "
+            f"WHERE {condition} ORDER BY score DESC, id LIMIT %(limit)s"
+        )
+        return sql, {'term': term, 'pattern': pattern, 'limit': limit}
+
+    @classmethod
+    def search(cls, term, limit=20, prefix=False):
+        """Search students by partial name or email, best matches first.
+
+        Returns a list of (Student, score) tuples.
+        """
+        sql, params = cls.search_sql(term, limit, prefix)
+        try:
+            with db_manager.get_db_cursor(readonly=True) as (conn, cur):
+                cur.execute(sql, params)
+                return [(cls.from_row(row[:4]), row[4]) for row in cur.fetchall()]
+        except Exception as e:
+            logger.error(f"Error searching students for {term!r}: {e}")
+            raise
+
+    @classmethod
+    def get_version(cls, student_id):
+        """Return a student's row version, or None if no such student exists.
+
+        One indexed lookup that reads no other columns; enough to answer
+        ``If-None-Match`` without loading the student.
+        """
+        try:
+            with db_manager.get_db_cursor(readonly=True) as (conn, cur):
+                db_manager.execute_prepared(cur, "student_get_version", (student_id,))
                 row = cur.fetchone()
-                return cls.from_row(row)
+                return row[0] if row else None
+        except Exception as e:
+            logger.error(f"Error retrieving version of student {student_id}: {e}")
+            raise
+
+    @classmethod
+    def table_version(cls):
+        """Return the students table's change counter.
+
+        Bumped by trigger in the same transaction as every INSERT, UPDATE,
+        DELETE or TRUNCATE, so a listing read after it is never older than it.
+        """
+        try:
+            with db_manager.get_db_cursor(readonly=True) as (conn, cur):
+                db_manager.execute_prepared(cur, "students_table_version", ())
+                return cur.fetchone()[0]
+        except Exception as e:
+            logger.error(f"Error retrieving students table version: {e}")
+            raise
+
+    @classmethod
+    def get_by_id(cls, student_id):
+        """Retrieve a student by ID (read through the cache).
+
+        Cache misses go through student_loader, so concurrent lookups are
+        served by one ``WHERE id = ANY(...)`` query.
+        """
+        try:
+            key = cls._cache_key(student_id)
+            row = cache_manager.get(key)
+            if row is MISS:
+                row, cacheable = cls._load_rows([student_id])[0]
+                if row and cacheable:
+                    cache_manager.set(key, row)
+            return cls.from_row(row)
         except Exception as e:
             logger.error(f"Error retrieving student {student_id}: {e}")
             raise
+
+    @classmethod
+    def get_many(cls, student_ids):
+        """Retrieve several students by ID, returning None for missing ones.
+
+        Results keep the order of ``student_ids``.
+        """
+        try:
+            rows = {}
+            misses = []
+            for student_id in student_ids:
+                row = cache_manager.get(cls._cache_key(student_id))
+                if row is MISS:
+                    misses.append(student_id)
+                else:
+                    rows[student_id] = row
+            for student_id, (row, cacheable) in zip(misses, cls._load_rows(misses)):
+                rows[student_id] = row
+                if row and cacheable:
+                    cache_manager.set(cls._cache_key(student_id), row)
+            return [cls.from_row(rows[student_id]) for student_id in student_ids]
+        except Exception as e:
+            logger.error(f"Error retrieving students {student_ids}: {e}")
+            raise
+
+    @classmethod
+    def _load_rows(cls, student_ids):
+        """Return (row, cacheable) per ID, batched with concurrent lookups.
+
+        A request that has written reads its own writes from the primary
+        instead of joining a batch that may run on a replica.
+        """
+        if reads_use_primary():
+            results = cls._fetch_rows(student_ids)
+        else:
+            results = dict(zip(student_ids, student_loader.load_many(student_ids)))
+        return [results.get(student_id) or (None, True) for student_id in student_ids]
+
+    @classmethod
+    def _fetch_rows(cls, student_ids):
+        """Batch function for student_loader: one query for many IDs.
+
+        Values are (row, cacheable); rows read from a replica are not cached.
+        """
+        with db_manager.get_db_cursor(readonly=True) as (conn, cur):
+            if len(student_ids) == 1:
+                db_manager.execute_prepared(cur, "student_get_by_id", (student_ids[0],))
+            else:
+                db_manager.execute_prepared(cur, "student_get_many", (list(student_ids),))
+            cacheable = not db_manager.is_replica_connection(conn)
+            return {row[0]: (row, cacheable) for row in cur.fetchall()}
     
     def save(self):
         """Save student to database (create or update)."""
@@ -58,20 +365,21 @@ class Student:
             if self.id is None:
                 # Create new student
                 with db_manager.get_db_cursor() as (conn, cur):
-                    cur.execute(
-                        "INSERT INTO students (name, email, age) VALUES (%s, %s, %s) RETURNING id",
-                        (self.name, self.email, self.age)
-                    )
+                    db_manager.execute_prepared(cur, "student_insert", (self.name, self.email, self.age))
                     self.id = cur.fetchone()[0]
-                logger.info(f"Created new student with ID: {self.id}")
+                    mark_applied(cur)
+                    cache_manager.publish(cur, (self.ALL_CACHE_KEY,))
+                cache_manager.invalidate((self.ALL_CACHE_KEY,))
+                log_sampled(logger, "Created new student with ID: %s", self.id)
             else:
                 # Update existing student
                 with db_manager.get_db_cursor() as (conn, cur):
-                    cur.execute(
-                        "UPDATE students SET name = %s, email = %s, age = %s WHERE id = %s",
-                        (self.name, self.email, self.age, self.id)
-                    )
-                logger.info(f"Updated student with ID: {self.id}")
+                    db_manager.execute_prepared(cur, "student_update", (self.name, self.email, self.age, self.id))
+                    if cur.rowcount:
+                        mark_applied(cur)
+                    cache_manager.publish(cur, self._invalidation_keys())
+                cache_manager.invalidate(self._invalidation_keys())
+                log_sampled(logger, "Updated student with ID: %s", self.id)
             return self
         except Exception as e:
             logger.error(f"Error saving student: {e}")
@@ -79,9 +387,121 @@ class Student:
     
     @classmethod
     def create(cls, name, email, age=None):
-        """Create a new student."""
+        """Create a new student.
+
+        With write coalescing enabled, concurrent creates are merged by
+        student_writer into one multi-row INSERT transaction.
+        """
         student = cls(name=name, email=email, age=age)
-        return student.save()
+        # A keyed create must mark its key applied in its own transaction, not a shared one
+        if not student_writer.enabled or bound_key() is not None:
+            return student.save()
+        mark_write()
+        student.id = student_writer.submit((name, email, age))
+        log_sampled(logger, "Created new student with ID: %s (coalesced)", student.id)
+        return student
+
+    @classmethod
+    def _create_batch(cls, rows):
+        """Batch function for student_writer.
+
+        Runs as a partial bulk insert, so a failing row is retried on its own
+        under a savepoint and only that create fails.
+        """
+        return cls.bulk_create(rows, atomic=False)
+    
+    @classmethod
+    def bulk_create(cls, rows, atomic=True):
+        """Insert many (name, email, age) tuples in a single transaction.
+
+        Returns a list of (id, error) pairs aligned with ``rows``. When
+        ``atomic`` is true any failure rolls back the whole load; otherwise
+        each batch runs under a savepoint and a failing batch is retried row
+        by row so only the offending rows are rejected.
+        """
+        try:
+            with db_manager.get_db_cursor() as (conn, cur):
+                if atomic:
+                    if len(rows) >= cls.BULK_COPY_THRESHOLD:
+                        ids = cls._copy_insert(cur, rows)
+                    else:
+                        ids = cls._values_insert(cur, rows)
+                    results = [(student_id, None) for student_id in ids]
+                else:
+                    results = []
+                    for start in range(0, len(rows), cls.BULK_BATCH_SIZE):
+                        batch = rows[start:start + cls.BULK_BATCH_SIZE]
+                        cur.execute("SAVEPOINT bulk_batch")
+                        try:
+                            ids = cls._values_insert(cur, batch)
+                        except psycopg2.errors.QueryCanceled:
+                            # Out of time (statement_timeout), not a bad row
+                            raise
+                        except psycopg2.Error:
+                            cur.execute("ROLLBACK TO SAVEPOINT bulk_batch")
+                            results.extend(cls._insert_each(cur, batch))
+                        else:
+                            cur.execute("RELEASE SAVEPOINT bulk_batch")
+                            results.extend((student_id, None) for student_id in ids)
+                if any(error is None for _, error in results):
+                    mark_applied(cur)
+                cache_manager.publish(cur, (cls.ALL_CACHE_KEY,))
+            cache_manager.invalidate((cls.ALL_CACHE_KEY,))
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Bulk inserted %d of %d students", sum(1 for _, error in results if error is None), len(rows))
+            return results
+        except Exception as e:
+            logger.error(f"Error bulk inserting students: {e}")
+            raise
+
+    @classmethod
+    def _values_insert(cls, cur, rows):
+        """Insert rows with batched multi-row INSERT ... RETURNING id."""
+        returned = execute_values(
+            cur,
+            "INSERT INTO students (name, email, age) VALUES %s RETURNING id",
+            rows,
+            page_size=cls.BULK_BATCH_SIZE,
+            fetch=True
+        )
+        # SERIAL values are assigned in row order, so sorting restores input order
+        return sorted(row[0] for row in returned)
+
+    @classmethod
+    def _copy_insert(cls, cur, rows):
+        """Insert rows by COPYing them into a temp table, then INSERT ... SELECT."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for seq, (name, email, age) in enumerate(rows):
+            writer.writerow((seq, name, email, age))
+        buffer.seek(0)
+        cur.execute(
+            "CREATE TEMP TABLE students_bulk_load "
+            "(seq INTEGER, name VARCHAR(100), email VARCHAR(100), age INTEGER) ON COMMIT DROP"
+        )
+        cur.copy_expert("COPY students_bulk_load (seq, name, email, age) FROM STDIN WITH (FORMAT csv)", buffer)
+        cur.execute(
+            "INSERT INTO students (name, email, age) "
+            "SELECT name, email, age FROM students_bulk_load ORDER BY seq RETURNING id"
+        )
+        return sorted(row[0] for row in cur.fetchall())
+
+    @staticmethod
+    def _insert_each(cur, rows):
+        """Insert rows one at a time, each under its own savepoint."""
+        results = []
+        for row in rows:
+            cur.execute("SAVEPOINT bulk_row")
+            try:
+                cur.execute("INSERT INTO students (name, email, age) VALUES (%s, %s, %s) RETURNING id", row)
+                results.append((cur.fetchone()[0], None))
+                cur.execute("RELEASE SAVEPOINT bulk_row")
+            except psycopg2.errors.QueryCanceled:
+                raise
+            except psycopg2.Error as e:
+                cur.execute("ROLLBACK TO SAVEPOINT bulk_row")
+                results.append((None, (e.pgerror or str(e)).strip().splitlines()[0]))
+        return results
     
     def update(self, name=None, email=None, age=None):
         """Update student attributes."""
@@ -100,26 +520,150 @@ class Student:
         
         try:
             with db_manager.get_db_cursor() as (conn, cur):
-                cur.execute("DELETE FROM students WHERE id = %s", (self.id,))
+                db_manager.execute_prepared(cur, "student_delete", (self.id,))
                 deleted_rows = cur.rowcount
-                if deleted_rows == 0:
-                    return False
-                logger.info(f"Deleted student with ID: {self.id}")
-                return True
+                if deleted_rows:
+                    cache_manager.publish(cur, self._invalidation_keys())
+            if deleted_rows == 0:
+                return False
+            cache_manager.invalidate(self._invalidation_keys())
+            log_sampled(logger, "Deleted student with ID: %s", self.id)
+            return True
         except Exception as e:
             logger.error(f"Error deleting student {self.id}: {e}")
             raise
     
     @classmethod
-    def delete_by_id(cls, student_id):
-        """Delete student by ID."""
-        student = cls.get_by_id(student_id)
-        if student:
-            return student.delete()
-        return False
+    def update_by_id(cls, student_id, expected_version=None, **fields):
+        """Update only the given columns with a single UPDATE ... RETURNING.
+
+        Existence check, mutation and the updated row come back in one round
+        trip. Returns the updated Student, or None if no such student exists.
+        With ``expected_version`` the row is only updated while it is still
+        at that version; otherwise VersionConflict is raised.
+        """
+        columns = [column for column in cls.UPDATABLE_COLUMNS if column in fields]
+        if not columns:
+            student = cls.get_by_id(student_id)
+            if student and expected_version is not None and student.version != expected_version:
+                raise VersionConflict(student_id, expected_version, student.version)
+            return student
+        # One prepared statement per column combination and condition (at most fourteen)
+        statement = "student_update_" + "_".join(columns)
+        condition = "id = %s"
+        params = [fields[column] for column in columns] + [student_id]
+        if expected_version is not None:
+            statement += "_if_version"
+            condition += " AND version = %s"
+            params.append(expected_version)
+        if not db_manager.prepared.is_registered(statement):
+            assignments = ", ".join(f"{column} = %s" for column in columns)
+            db_manager.register_statement(
+                statement, f"UPDATE students SET {assignments} WHERE {condition} RETURNING {cls.ROW_COLUMNS}"
+            )
+        keys = (cls._cache_key(student_id), cls.ALL_CACHE_KEY)
+        try:
+            with db_manager.get_db_cursor() as (conn, cur):
+                db_manager.execute_prepared(cur, statement, params)
+                row = cur.fetchone()
+                if row:
+                    mark_applied(cur)
+                    cache_manager.publish(cur, keys)
+                elif expected_version is not None:
+                    cls._check_version(cur, student_id, expected_version)
+            if not row:
+                return None
+            cache_manager.invalidate(keys)
+            log_sampled(logger, "Updated student with ID: %s (%s)", student_id, ', '.join(columns))
+            return cls.from_row(row)
+        except Exception as e:
+            logger.error(f"Error updating student {student_id}: {e}")
+            raise
+
+    @classmethod
+    def delete_by_id(cls, student_id, expected_version=None):
+        """Delete student by ID with a single DELETE ... RETURNING.
+
+        With ``expected_version`` the row is only deleted while it is still
+        at that version; otherwise VersionConflict is raised.
+        """
+        keys = (cls._cache_key(student_id), cls.ALL_CACHE_KEY)
+        try:
+            with db_manager.get_db_cursor() as (conn, cur):
+                if expected_version is None:
+                    db_manager.execute_prepared(cur, "student_delete", (student_id,))
+                else:
+                    db_manager.execute_prepared(cur, "student_delete_if_version", (student_id, expected_version))
+                deleted = cur.fetchone() is not None
+                if deleted:
+                    mark_applied(cur)
+                    cache_manager.publish(cur, keys)
+                elif expected_version is not None:
+                    cls._check_version(cur, student_id, expected_version)
+            if deleted:
+                cache_manager.invalidate(keys)
+                log_sampled(logger, "Deleted student with ID: %s", student_id)
+            return deleted
+        except Exception as e:
+            logger.error(f"Error deleting student {student_id}: {e}")
+            raise
     
+    @staticmethod
+    def _check_version(cur, student_id, expected_version):
+        """After a conditional write matched nothing, tell a missing row from a stale version."""
+        db_manager.execute_prepared(cur, "student_get_version", (student_id,))
+        row = cur.fetchone()
+        if row:
+            raise VersionConflict(student_id, expected_version, row[0])
+
     def exists(self):
         """Check if student exists in database."""
         if self.id is None:
             return False
         return self.get_by_id(self.id) is not None
+
+
+# Hot statements run as server-side prepared statements on each pooled connection
+db_manager.register_statement(
+    "student_get_by_id", f"SELECT {Student.ROW_COLUMNS} FROM students WHERE id = %s", ("integer",))
+db_manager.register_statement(
+    "student_get_many", f"SELECT {Student.ROW_COLUMNS} FROM students WHERE id = ANY(%s)", ("integer[]",))
+db_manager.register_statement(
+    "student_get_version", "SELECT version FROM students WHERE id = %s", ("integer",))
+db_manager.register_statement(
+    "students_table_version", "SELECT version FROM table_versions WHERE table_name = 'students'")
+db_manager.register_statement(
+    "student_insert", "INSERT INTO students (name, email, age) VALUES (%s, %s, %s) RETURNING id")
+db_manager.register_statement(
+    "student_update", "UPDATE students SET name = %s, email = %s, age = %s WHERE id = %s")
+db_manager.register_statement(
+    "student_delete", "DELETE FROM students WHERE id = %s RETURNING id", ("integer",))
+db_manager.register_statement(
+    "student_delete_if_version", "DELETE FROM students WHERE id = %s AND version = %s RETURNING id",
+    ("integer", "bigint"))
+
+# Coalesces concurrent get_by_id/get_many lookups into batched queries
+student_loader = BatchLoader(Student._fetch_rows)
+metrics.register_collector(stats_collector('student_loader', 'Batched student lookups', student_loader.stats, {
+    'loads': 'counter', 'coalesced': 'counter', 'batches': 'counter', 'keys_fetched': 'counter', 'retries': 'counter',
+}))
+
+# Opt-in group commit: concurrent creates share one INSERT ... RETURNING transaction
+student_writer = BatchWriter(Student._create_batch)
+
+
+def _writer_metrics():
+    stats = student_writer.stats()
+    samples = [
+        ('student_create_batch_size_bucket', {'le': bound}, count)
+        for bound, count in stats['batch_size_histogram'].items()
+    ]
+    samples.append(('student_create_batch_size_sum', {}, stats['items']))
+    samples.append(('student_create_batch_size_count', {}, stats['batches']))
+    yield 'student_create_batch_size', 'histogram', 'Creates per coalesced INSERT transaction.', samples
+    yield from stats_collector('student_create', 'Coalesced creates', lambda: stats, {
+        'failed': 'counter', 'retries': 'counter', 'wait_seconds_sum': 'counter',
+    })()
+
+
+metrics.register_collector(_writer_metrics)
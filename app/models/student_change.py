@@ -0,0 +1,135 @@
+from app.models.student import Student
+from app.utils.changefeed import ChangeNotifier
+from app.utils.database import db_manager
+from app.utils.metrics import metrics, stats_collector
+from app.utils.tasks import PeriodicTask
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CursorExpired(Exception):
+    """Raised when a change feed cursor points into entries removed by retention."""
+
+
+class StudentChangeLog:
+    """The students change log (``student_changes``), written by triggers.
+
+    Every insert, update and delete of a student appends its ID under an
+    increasing ``seq``; the seq of the last entry a consumer has seen is its
+    cursor. Entries only name the student, the current row is joined in when
+    the log is read, so a student's newest entry is all a consumer needs.
+    Compaction therefore drops every older entry per student, and retention
+    removes entries older than ``RETENTION_SECONDS``, after which cursors
+    from before the removed entries must resynchronize.
+    """
+
+    CHANNEL = 'student_changes'
+    RETENTION_SECONDS = 7 * 24 * 3600
+    COMPACT = True
+    # Only one worker maintains the log at a time
+    MAINTENANCE_LOCK_KEY = 'student_changes_maintenance'
+
+    @classmethod
+    def configure(cls, retention_seconds=None, compact=None):
+        if retention_seconds is not None:
+            cls.RETENTION_SECONDS = retention_seconds
+        if compact is not None:
+            cls.COMPACT = compact
+
+    @classmethod
+    def latest(cls):
+        """Return the newest seq, i.e. a cursor from which only future changes are read."""
+        try:
+            # Read from the primary: notifications come from there, a replica may not have caught up
+            with db_manager.get_db_cursor() as (conn, cur):
+                db_manager.execute_prepared(cur, "student_changes_latest", ())
+                return cur.fetchone()[0]
+        except Exception as e:
+            logger.error(f"Error retrieving latest student change: {e}")
+            raise
+
+    @classmethod
+    def read(cls, since, limit=500):
+        """Read up to ``limit`` log entries after ``since``, oldest first.
+
+        Returns (entries, has_more) where each entry is (seq, student_id, row)
+        and row holds the student's current ROW_COLUMNS, or None if it no
+        longer exists. A TRUNCATE appears with student_id None. Raises
+        CursorExpired when retention already removed entries after ``since``.
+        """
+        try:
+            with db_manager.get_db_cursor() as (conn, cur):
+                db_manager.execute_prepared(cur, "student_changes_purged_through", ())
+                row = cur.fetchone()
+                if row and since < row[0]:
+                    raise CursorExpired(f"Changes up to {row[0]} were removed by retention")
+                db_manager.execute_prepared(cur, "student_changes_since", (since, limit + 1))
+                rows = cur.fetchall()
+        except CursorExpired:
+            raise
+        except Exception as e:
+            logger.error(f"Error reading student changes after {since}: {e}")
+            raise
+        entries = [(row[0], row[1], row[2:] if row[2] is not None else None) for row in rows[:limit]]
+        return entries, len(rows) > limit
+
+    @classmethod
+    def maintain(cls):
+        """Compact and purge the log; returns counts, or None if another worker is at it."""
+        try:
+            with db_manager.get_db_cursor() as (conn, cur):
+                cur.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s))", (cls.MAINTENANCE_LOCK_KEY,))
+                if not cur.fetchone()[0]:
+                    return None
+                compacted = purged = 0
+                if cls.COMPACT:
+                    cur.execute(
+                        "DELETE FROM student_changes c USING student_changes n "
+                        "WHERE n.student_id = c.student_id AND n.seq > c.seq"
+                    )
+                    compacted = cur.rowcount
+                if cls.RETENTION_SECONDS > 0:
+                    cur.execute(
+                        "WITH purged AS (DELETE FROM student_changes "
+                        "WHERE changed_at < now() - %s * interval '1 second' RETURNING seq) "
+                        "UPDATE change_log_state SET purged_through = "
+                        "greatest(purged_through, (SELECT max(seq) FROM purged)) "
+                        "WHERE log_name = 'student_changes' RETURNING (SELECT count(*) FROM purged)",
+                        (cls.RETENTION_SECONDS,)
+                    )
+                    row = cur.fetchone()
+                    purged = row[0] if row else 0
+            if compacted or purged:
+                logger.info("Student change log maintenance: %d compacted, %d purged", compacted, purged)
+            return {'compacted': compacted, 'purged': purged}
+        except Exception as e:
+            logger.error(f"Error maintaining student change log: {e}")
+            raise
+
+
+db_manager.register_statement(
+    "student_changes_latest", "SELECT coalesce(max(seq), 0) FROM student_changes")
+db_manager.register_statement(
+    "student_changes_purged_through",
+    "SELECT purged_through FROM change_log_state WHERE log_name = 'student_changes'")
+db_manager.register_statement(
+    "student_changes_since",
+    "SELECT c.seq, c.student_id, "
+    + ", ".join(f"s.{column.strip()}" for column in Student.ROW_COLUMNS.split(","))
+    + " FROM student_changes c LEFT JOIN students s ON s.id = c.student_id "
+    "WHERE c.seq > %s ORDER BY c.seq LIMIT %s",
+    ("bigint", "integer"))
+
+# Wakes long-polling GET /students/changes requests
+change_notifier = ChangeNotifier(StudentChangeLog.CHANNEL)
+# Compaction and retention, run by whichever worker takes the advisory lock
+change_log_maintenance = PeriodicTask('student-change-log-maintenance', StudentChangeLog.maintain)
+
+metrics.register_collector(stats_collector('change_feed', 'Student change feed', change_notifier.stats, {
+    'latest_seq': 'gauge', 'waiting': 'gauge', 'wakeups': 'counter', 'timeouts': 'counter',
+}))
+metrics.register_collector(stats_collector(
+    'change_log_maintenance', 'Student change log maintenance', change_log_maintenance.stats, {
+        'runs': 'counter', 'failures': 'counter',
+    }))
@@ -0,0 +1,174 @@
+import base64
+import json
+
+
+class QueryError(ValueError):
+    """Raised when list query parameters are invalid."""
+
+
+class StudentQuery:
+    """Compiles list parameters into parameterized SQL on the students table.
+
+    Column names only ever come from the whitelists below and every value is
+    a bound parameter. Results are ordered by the sort column with ``id`` as
+    tie-breaker, so pages can be continued with a keyset cursor holding the
+    last row's (sort value, id).
+    """
+
+    FIELDS = ('id', 'name', 'email', 'age')
+    SORTABLE = ('id', 'name', 'email', 'age')
+    NULLABLE = ('age',)
+    # Type of a sort column's value in a cursor
+    SORT_TYPES = {'id': int, 'name': str, 'email': str, 'age': int}
+
+    def __init__(self, fields=None, age_min=None, age_max=None, email=None, name_prefix=None, sort='id'):
+        fields = list(fields or self.FIELDS)
+        unknown = [field for field in fields if field not in self.FIELDS]
+        if unknown:
+            raise QueryError(f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(self.FIELDS)}")
+        sort = sort or 'id'
+        descending = sort.startswith('-')
+        sort_column = sort.lstrip('-')
+        if sort_column not in self.SORTABLE:
+            raise QueryError(f"Cannot sort by {sort_column}. Allowed: {', '.join(self.SORTABLE)}")
+        if age_min is not None and age_max is not None and age_min > age_max:
+            raise QueryError("age_min must not be greater than age_max")
+
+        # id is always returned; it identifies rows and anchors the cursor
+        self.output_columns = [column for column in self.FIELDS if column == 'id' or column in fields]
+        self.select_columns = self.output_columns + (
+            [sort_column] if sort_column not in self.output_columns else []
+        )
+        self.sort_column = sort_column
+        self.descending = descending
+        self.age_min = age_min
+        self.age_max = age_max
+        self.email = email
+        self.name_prefix = name_prefix
+
+    @classmethod
+    def from_args(cls, args):
+        """Build a query from request arguments (``fields``, filters, ``sort``)."""
+        def int_arg(name):
+            raw = args.get(name)
+            if raw is None or raw == '':
+                return None
+            try:
+                return int(raw)
+            except ValueError:
+                raise QueryError(f"{name} must be an integer")
+
+        fields = args.get('fields')
+        return cls(
+            fields=[field.strip() for field in fields.split(',') if field.strip()] if fields else None,
+            age_min=int_arg('age_min'),
+            age_max=int_arg('age_max'),
+            email=args.get('email') or None,
+            name_prefix=args.get('name_prefix') or None,
+            sort=args.get('sort') or 'id'
+        )
+
+    @property
+    def is_full(self):
+        """True when every column is returned, so rows map onto Student."""
+        return self.output_columns == list(self.FIELDS)
+
+    @property
+    def is_default_order(self):
+        return self.sort_column == 'id' and not self.descending
+
+    def filters(self):
+        """Return (conditions, params) for the WHERE clause filters."""
+        conditions = []
+        params = []
+        if self.age_min is not None:
+            conditions.append("age >= %s")
+            params.append(self.age_min)
+        if self.age_max is not None:
+            conditions.append("age <= %s")
+            params.append(self.age_max)
+        if self.email is not None:
+            conditions.append("email = %s")
+            params.append(self.email)
+        if self.name_prefix is not None:
+            conditions.append("name LIKE %s")
+            escaped = self.name_prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.append(escaped + '%')
+        return conditions, params
+
+    def keyset(self, after):
+        """Return (condition, params) selecting rows after the (sort value, id) key."""
+        value, last_id = after
+        column = self.sort_column
+        op = '<' if self.descending else '>'
+        if column == 'id':
+            return f"id {op} %s", [last_id]
+        if column not in self.NULLABLE:
+            return f"({column}, id) {op} (%s, %s)", [value, last_id]
+        # NULLs sort last ascending and first descending
+        if value is None:
+            if self.descending:
+                return f"(({column} IS NULL AND id < %s) OR {column} IS NOT NULL)", [last_id]
+            return f"({column} IS NULL AND id > %s)", [last_id]
+        if self.descending:
+            return f"({column} < %s OR ({column} = %s AND id < %s))", [value, value, last_id]
+        return f"({column} > %s OR ({column} = %s AND id > %s) OR {column} IS NULL)", [value, value, last_id]
+
+    def where(self, after=None):
+        """Return (where_sql, params), where_sql being empty without conditions."""
+        conditions, params = self.filters()
+        if after is not None:
+            condition, keyset_params = self.keyset(after)
+            conditions.append(condition)
+            params.extend(keyset_params)
+        if not conditions:
+            return "", params
+        return "WHERE " + " AND ".join(conditions), params
+
+    def order_by(self):
+        direction = " DESC" if self.descending else ""
+        if self.sort_column == 'id':
+            return f"ORDER BY id{direction}"
+        return f"ORDER BY {self.sort_column}{direction}, id{direction}"
+
+    def select(self, after=None, limit=None):
+        """Return (sql, params) for the rows of this query."""
+        where, params = self.where(after)
+        sql = f"SELECT {', '.join(self.select_columns)} FROM students {where} {self.order_by()}"
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(limit)
+        return sql, params
+
+    def json_object(self, prefix=""):
+        """SQL building one row's JSON object from the output columns."""
+        return "json_build_object(" + ", ".join(
+            f"'{column}', {prefix}{column}" for column in self.output_columns
+        ) + ")"
+
+    def to_dict(self, row):
+        """Map a row of ``select_columns`` onto the output fields."""
+        return {column: row[index] for index, column in enumerate(self.output_columns)}
+
+    def key_of(self, row):
+        """The (sort value, id) key of a row of ``select_columns``."""
+        return row[self.select_columns.index(self.sort_column)], row[0]
+
+    def encode_cursor(self, key):
+        """Opaque cursor token for a non-default sort order."""
+        return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (ValueError, TypeError):
+            raise QueryError("Invalid cursor")
+        if not self._is_sort_value(value) or isinstance(last_id, bool) or not isinstance(last_id, int):
+            raise QueryError("Invalid cursor")
+        return value, last_id
+
+    def _is_sort_value(self, value):
+        if value is None:
+            return self.sort_column in self.NULLABLE
+        return isinstance(value, self.SORT_TYPES[self.sort_column]) and not isinstance(value, bool)
@@ -0,0 +1,134 @@
+from app.utils.database import db_manager
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RebuildThrottled(Exception):
+    """Raised when the statistics were rebuilt too recently, or a rebuild is running."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Statistics rebuild throttled, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class StudentStats:
+    """Roster statistics from the summary tables kept by triggers (migration 006).
+
+    ``student_age_counts`` holds the number of students per exact age and
+    ``student_email_domains`` per email domain; ``student_stats_totals`` the
+    overall count. Reading them costs O(distinct ages + top domains) whatever
+    the size of ``students``.
+    """
+
+    # A full rebuild blocks writers, so it runs at most this often across all workers
+    REBUILD_MIN_INTERVAL = 300
+    REBUILD_LOCK_KEY = 'student_stats_rebuild'
+
+    @classmethod
+    def configure(cls, rebuild_min_interval=None):
+        if rebuild_min_interval is not None:
+            cls.REBUILD_MIN_INTERVAL = rebuild_min_interval
+
+    @classmethod
+    def summary(cls, domain_limit=10):
+        """Return (total, refreshed_at, [(age, count)], [(domain, count)]) in one query.
+
+        Ages come in ascending order, domains by descending count, at most
+        ``domain_limit`` of them.
+        """
+        try:
+            with db_manager.get_db_cursor(readonly=True) as (conn, cur):
+                return cls._read_summary(cur, domain_limit)
+        except Exception as e:
+            logger.error(f"Error retrieving student statistics: {e}")
+            raise
+
+    @staticmethod
+    def _read_summary(cur, domain_limit):
+        db_manager.execute_prepared(cur, "student_stats_summary", (domain_limit,))
+        total, refreshed_at, ages, domains = 0, None, [], []
+        for kind, key, count, refreshed in cur.fetchall():
+            if kind == 't':
+                total, refreshed_at = count, refreshed
+            elif kind == 'a':
+                ages.append((int(key), count))
+            else:
+                domains.append((key, count))
+        # UNION ALL does not promise to keep each branch's order
+        ages.sort()
+        domains.sort(key=lambda domain: (-domain[1], domain[0]))
+        return total, refreshed_at, ages, domains
+
+    @classmethod
+    def rebuild(cls, domain_limit=10):
+        """Recompute the summary from ``students`` and report how far it had drifted.
+
+        Takes the ``table_versions`` row lock that every writer's statement
+        trigger takes, so writes wait for the rebuild (reads do not) and none
+        is lost or counted twice. When the summary was off, the table version
+        is bumped so cached ETags of the stale figures stop matching.
+
+        Raises RebuildThrottled while another rebuild runs or within
+        ``REBUILD_MIN_INTERVAL`` seconds of the last one. Returns (drift,
+        summary): drift is {'students', 'ages', 'email_domains'}, the
+        difference in the total and the number of age and domain counts that
+        were wrong; the summary (as ``summary``) is read in the same
+        transaction on the primary, so it is the rebuilt one.
+        """
+        try:
+            with db_manager.get_db_cursor() as (conn, cur):
+                cur.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s))", (cls.REBUILD_LOCK_KEY,))
+                if not cur.fetchone()[0]:
+                    raise RebuildThrottled(cls.REBUILD_MIN_INTERVAL)
+                cur.execute(
+                    "SELECT ceil(extract(epoch FROM refreshed_at + make_interval(secs => %s) - now())) "
+                    "FROM student_stats_totals",
+                    (cls.REBUILD_MIN_INTERVAL,)
+                )
+                row = cur.fetchone()
+                if row and row[0] is not None and row[0] > 0:
+                    raise RebuildThrottled(int(row[0]))
+                cur.execute("SELECT version FROM table_versions WHERE table_name = 'students' FOR UPDATE")
+                before = cls._snapshot(cur)
+                cur.execute("SELECT rebuild_student_stats()")
+                after = cls._snapshot(cur)
+                drift = {
+                    'students': after[0] - before[0],
+                    'ages': cls._mismatched(before[1], after[1]),
+                    'email_domains': cls._mismatched(before[2], after[2]),
+                }
+                if any(drift.values()):
+                    cur.execute("UPDATE table_versions SET version = version + 1 WHERE table_name = 'students'")
+                summary = cls._read_summary(cur, domain_limit)
+            if any(drift.values()):
+                logger.warning(f"Student statistics had drifted and were rebuilt: {drift}")
+            return drift, summary
+        except RebuildThrottled:
+            raise
+        except Exception as e:
+            logger.error(f"Error rebuilding student statistics: {e}")
+            raise
+
+    @staticmethod
+    def _snapshot(cur):
+        cur.execute("SELECT students FROM student_stats_totals")
+        row = cur.fetchone()
+        cur.execute("SELECT age, students FROM student_age_counts")
+        ages = dict(cur.fetchall())
+        cur.execute("SELECT email_domain, students FROM student_email_domains")
+        return (row[0] if row else 0), ages, dict(cur.fetchall())
+
+    @staticmethod
+    def _mismatched(summary, actual):
+        return sum(1 for key in summary.keys() | actual.keys() if summary.get(key) != actual.get(key))
+
+
+# Totals, every age and the top domains as one snapshot: (kind, key, count, refreshed_at)
+db_manager.register_statement(
+    "student_stats_summary",
+    "SELECT 't', NULL, students, refreshed_at FROM student_stats_totals "
+    "UNION ALL SELECT 'a', age::text, students, NULL FROM student_age_counts "
+    "UNION ALL (SELECT 'd', email_domain, students, NULL FROM student_email_domains "
+    "ORDER BY students DESC, email_domain LIMIT %s)",
+    ("integer",))
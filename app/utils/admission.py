@@ -0,0 +1,154 @@
+import collections
+import threading
+import time
+
+from app.utils.metrics import metrics, stats_collector
+
+
+class AdmissionController:
+    """Bounds the number of requests working against the database at once.
+
+    Up to ``limit`` requests run concurrently. Up to ``max_queue`` more wait
+    at most ``queue_timeout`` seconds for a slot; everything beyond that is
+    shed immediately, so an overloaded worker answers fast instead of
+    letting requests stack up behind the connection pool.
+    """
+
+    def __init__(self, limit=20, max_queue=40, queue_timeout=0.5):
+        self.enabled = True
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._slot_free = threading.Condition(self._lock)
+        self._active = 0
+        self._queued = 0
+        self.admitted = 0
+        self.queued_total = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+
+    def configure(self, enabled=None, limit=None, max_queue=None, queue_timeout=None):
+        with self._lock:
+            if enabled is not None:
+                self.enabled = enabled
+            if limit is not None:
+                self.limit = limit
+            if max_queue is not None:
+                self.max_queue = max_queue
+            if queue_timeout is not None:
+                self.queue_timeout = queue_timeout
+            self._slot_free.notify_all()
+
+    def acquire(self):
+        """Take a slot, returning False when the request should be shed."""
+        with self._lock:
+            if self._active < self.limit and not self._queued:
+                self._active += 1
+                self.admitted += 1
+                return True
+            if self._queued >= self.max_queue:
+                self.shed_queue_full += 1
+                return False
+            self._queued += 1
+            self.queued_total += 1
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while self._active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed_timeout += 1
+                        return False
+                    self._slot_free.wait(remaining)
+            finally:
+                self._queued -= 1
+            self._active += 1
+            self.admitted += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+            self._slot_free.notify()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'limit': self.limit,
+                'max_queue': self.max_queue,
+                'queue_timeout': self.queue_timeout,
+                'active': self._active,
+                'queued': self._queued,
+                'admitted': self.admitted,
+                'queued_total': self.queued_total,
+                'shed_queue_full': self.shed_queue_full,
+                'shed_timeout': self.shed_timeout,
+                'shed': self.shed_queue_full + self.shed_timeout,
+            }
+
+
+class TokenBucketLimiter:
+    """Per-client token buckets refilled at ``rate`` tokens/second up to ``burst``.
+
+    Buckets are kept for the ``max_clients`` most recently seen clients; a
+    client that was evicted simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate=0.0, burst=20, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._buckets = collections.OrderedDict()
+        self.limited = 0
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def configure(self, rate=None, burst=None):
+        with self._lock:
+            if rate is not None:
+                self.rate = rate
+            if burst is not None:
+                self.burst = burst
+            self._buckets.clear()
+
+    def allow(self, client):
+        """Spend a token for ``client``; returns (allowed, seconds until one is available)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            else:
+                self.limited += 1
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        if allowed:
+            return True, 0.0
+        return False, (1 - tokens) / self.rate
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'burst': self.burst,
+                'clients': len(self._buckets),
+                'limited': self.limited,
+            }
+
+
+admission_controller = AdmissionController()
+rate_limiter = TokenBucketLimiter()
+metrics.register_collector(stats_collector('admission', 'Admission control', admission_controller.stats, {
+    'limit': 'gauge', 'active': 'gauge', 'queued': 'gauge', 'admitted': 'counter',
+    'queued_total': 'counter', 'shed_queue_full': 'counter', 'shed_timeout': 'counter',
+}))
+metrics.register_collector(stats_collector('rate_limit', 'Per-client rate limiting', rate_limiter.stats, {
+    'limited': 'counter',
+}))
@@ -0,0 +1,308 @@
+import bisect
+import contextvars
+import threading
+import time
+
+from app.utils.deadline import DeadlineExceeded, current_deadline, start_deadline
+
+
+def _batch_context(deadlines):
+    """Fresh context for a batch, bounded by the loosest of its callers' deadlines."""
+    context = contextvars.Context()
+    if deadlines and None not in deadlines:
+        context.run(start_deadline, max(max(deadline.expires_at for deadline in deadlines) - time.monotonic(),
+                                        0.001))
+    return context
+
+
+class _Pending:
+    """Result slot shared by every caller waiting on the same key."""
+
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class BatchLoader:
+    """Coalesces concurrent key lookups into batched calls (a "dataloader").
+
+    The first caller to queue a key becomes the leader: it waits up to
+    ``window`` seconds (less if ``max_batch`` keys queue up first), then runs
+    ``batch_fn(keys)`` once for everything queued meanwhile. ``batch_fn``
+    returns a dict of key -> value; keys it omits resolve to None. Callers
+    asking for a key that is already queued or in flight share its result.
+
+    ``batch_fn`` runs in a fresh context, not the leader's: no request's
+    replica pin or timing counters apply, and its deadline is the loosest
+    of the callers in the batch. Each caller waits at most until its own
+    deadline; a caller that still has time when a batch runs out of it
+    retries its keys instead of failing with another request's timeout.
+    """
+
+    def __init__(self, batch_fn, window=0.001, max_batch=100):
+        self._batch_fn = batch_fn
+        self.window = window
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._queued = {}
+        self._inflight = {}
+        self._deadlines = []
+        self._leader_waiting = False
+        self._full = threading.Event()
+        self.loads = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.keys_fetched = 0
+        self.retries = 0
+
+    def configure(self, window=None, max_batch=None):
+        if window is not None:
+            self.window = window
+        if max_batch is not None:
+            self.max_batch = max_batch
+
+    def load(self, key):
+        """Return the value for ``key``, batched with concurrent lookups."""
+        return self.load_many((key,))[0]
+
+    def load_many(self, keys):
+        """Return values for ``keys`` in order, batched with concurrent lookups."""
+        deadline = current_deadline()
+        values = [None] * len(keys)
+        todo = list(range(len(keys)))
+        while todo:
+            retry = []
+            for index, pending in zip(todo, self._enqueue([keys[index] for index in todo], deadline)):
+                if not pending.event.wait(max(deadline.remaining(), 0) if deadline is not None else None):
+                    raise deadline.expire('batch')
+                if isinstance(pending.error, DeadlineExceeded):
+                    # The batch ran out of its budget, which is not necessarily this request's
+                    if deadline is not None and deadline.remaining() <= 0:
+                        raise deadline.expire('batch')
+                    retry.append(index)
+                elif pending.error is not None:
+                    raise pending.error
+                else:
+                    values[index] = pending.value
+            if retry:
+                with self._lock:
+                    self.retries += len(retry)
+            todo = retry
+        return values
+
+    def _enqueue(self, keys, deadline):
+        """Queue ``keys`` (sharing queued or in-flight lookups) and run the batch when leading."""
+        pendings = []
+        lead = False
+        with self._lock:
+            self._deadlines.append(deadline)
+            for key in keys:
+                self.loads += 1
+                pending = self._inflight.get(key) or self._queued.get(key)
+                if pending is None:
+                    pending = _Pending()
+                    self._queued[key] = pending
+                else:
+                    self.coalesced += 1
+                pendings.append(pending)
+            if self._queued and not self._leader_waiting:
+                self._leader_waiting = True
+                self._full.clear()
+                lead = True
+            if len(self._queued) >= self.max_batch:
+                self._full.set()
+
+        if lead:
+            if self.window > 0:
+                self._full.wait(self.window)
+            self._dispatch()
+        return pendings
+
+    def stats(self):
+        with self._lock:
+            return {
+                'loads': self.loads,
+                'coalesced': self.coalesced,
+                'batches': self.batches,
+                'keys_fetched': self.keys_fetched,
+                'retries': self.retries,
+                'window': self.window,
+                'max_batch': self.max_batch,
+            }
+
+    def _dispatch(self):
+        with self._lock:
+            queued = self._queued
+            deadlines = self._deadlines
+            self._queued = {}
+            self._deadlines = []
+            self._leader_waiting = False
+            self._inflight.update(queued)
+            self.batches += (len(queued) + self.max_batch - 1) // self.max_batch
+            self.keys_fetched += len(queued)
+
+        context = _batch_context(deadlines)
+        keys = list(queued)
+        for start in range(0, len(keys), self.max_batch):
+            chunk = keys[start:start + self.max_batch]
+            try:
+                results = context.run(self._batch_fn, chunk)
+                for key in chunk:
+                    queued[key].value = results.get(key)
+            except Exception as error:
+                for key in chunk:
+                    queued[key].error = error
+            finally:
+                with self._lock:
+                    for key in chunk:
+                        self._inflight.pop(key, None)
+                for key in chunk:
+                    queued[key].event.set()
+
+
+class BatchWriter:
+    """Coalesces concurrent writes into batched calls ("group commit").
+
+    Works like BatchLoader, but items are not keys: every submitted item is
+    written, even if an identical one is queued. ``batch_fn(items)`` returns
+    one (value, error) pair per item, in order; ``submit`` returns the value
+    or raises ``Exception(error)`` for its own item only. An exception from
+    ``batch_fn`` itself fails every item of that batch.
+
+    As with BatchLoader, ``batch_fn`` runs in a fresh context under the
+    loosest deadline of the batch and each caller waits at most until its
+    own deadline (its item may still be written after it gave up). A batch
+    that runs out of time wrote nothing, so callers that still have time
+    submit their items again.
+
+    Disabled by default, in which case ``submit`` runs a batch of one in the
+    caller's own context.
+    """
+
+    # Upper bounds of the batch size histogram buckets
+    SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+    def __init__(self, batch_fn, window=0.002, max_batch=100, enabled=False):
+        self._batch_fn = batch_fn
+        self.window = window
+        self.max_batch = max_batch
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._queued = []
+        self._leader_waiting = False
+        self._full = threading.Event()
+        self.items = 0
+        self.batches = 0
+        self.failed = 0
+        self.retries = 0
+        self.max_batch_seen = 0
+        self.wait_seconds_sum = 0.0
+        self._size_counts = [0] * (len(self.SIZE_BUCKETS) + 1)
+
+    def configure(self, enabled=None, window=None, max_batch=None):
+        if enabled is not None:
+            self.enabled = enabled
+        if window is not None:
+            self.window = window
+        if max_batch is not None:
+            self.max_batch = max_batch
+
+    def submit(self, item):
+        """Write ``item`` together with concurrent submissions and return its value."""
+        started = time.monotonic()
+        deadline = current_deadline()
+        try:
+            while True:
+                pending = self._enqueue(item, deadline)
+                if not pending.event.wait(max(deadline.remaining(), 0) if deadline is not None else None):
+                    raise deadline.expire('batch')
+                if not isinstance(pending.error, DeadlineExceeded) or not self.enabled:
+                    break
+                # The batch ran out of its budget, which is not necessarily this request's
+                if deadline is not None and deadline.remaining() <= 0:
+                    raise deadline.expire('batch')
+                with self._lock:
+                    self.retries += 1
+        finally:
+            with self._lock:
+                self.wait_seconds_sum += time.monotonic() - started
+        if pending.error is not None:
+            raise pending.error
+        return pending.value
+
+    def _enqueue(self, item, deadline):
+        """Queue ``item`` and run the batch when leading; a batch of one when disabled."""
+        pending = _Pending()
+        if not self.enabled:
+            self._run([(item, pending)])
+            return pending
+        lead = False
+        with self._lock:
+            self._queued.append((item, pending, deadline))
+            if not self._leader_waiting:
+                self._leader_waiting = True
+                self._full.clear()
+                lead = True
+            if len(self._queued) >= self.max_batch:
+                self._full.set()
+        if lead:
+            if self.window > 0:
+                self._full.wait(self.window)
+            self._dispatch()
+        return pending
+
+    def stats(self):
+        with self._lock:
+            cumulative = 0
+            histogram = {}
+            for bound, count in zip(self.SIZE_BUCKETS + (float('inf'),), self._size_counts):
+                cumulative += count
+                histogram['+Inf' if bound == float('inf') else str(bound)] = cumulative
+            return {
+                'enabled': self.enabled,
+                'window': self.window,
+                'max_batch': self.max_batch,
+                'items': self.items,
+                'batches': self.batches,
+                'failed': self.failed,
+                'retries': self.retries,
+                'mean_batch_size': round(self.items / self.batches, 2) if self.batches else None,
+                'max_batch_seen': self.max_batch_seen,
+                'wait_seconds_sum': round(self.wait_seconds_sum, 6),
+                'batch_size_histogram': histogram,
+            }
+
+    def _dispatch(self):
+        with self._lock:
+            queued = self._queued
+            self._queued = []
+            self._leader_waiting = False
+        context = _batch_context([deadline for _, _, deadline in queued])
+        batch = [(item, pending) for item, pending, _ in queued]
+        for start in range(0, len(batch), self.max_batch):
+            context.run(self._run, batch[start:start + self.max_batch])
+
+    def _run(self, batch):
+        with self._lock:
+            self.items += len(batch)
+            self.batches += 1
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            self._size_counts[bisect.bisect_left(self.SIZE_BUCKETS, len(batch))] += 1
+        try:
+            results = self._batch_fn([item for item, _ in batch])
+            for (_, pending), (value, error) in zip(batch, results):
+                pending.value = value
+                if error is not None:
+                    pending.error = Exception(error)
+        except Exception as error:
+            for _, pending in batch:
+                pending.error = error
+        finally:
+            failed = sum(1 for _, pending in batch if pending.error is not None)
+            with self._lock:
+                self.failed += failed
+            for _, pending in batch:
+                pending.event.set()
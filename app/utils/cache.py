@@ -0,0 +1,279 @@
+import collections
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from app.utils.metrics import metrics, stats_collector
+
+logger = logging.getLogger(__name__)
+
+# Returned by cache backends when a key is absent or expired
+MISS = object()
+
+
+class CacheBackend:
+    """Interface for cache stores used by CacheManager.
+
+    Values must be JSON-serializable so they can live outside the process.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+
+class LRUCache(CacheBackend):
+    """In-process cache with a bounded number of entries, LRU eviction and a TTL."""
+
+    def __init__(self, max_entries=10000, ttl=60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISS
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return MISS
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'size': len(self._data),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+class SQLiteCache(CacheBackend):
+    """Cache kept in a local SQLite file so all workers on a host share it.
+
+    Eviction is approximate LRU: once the store grows past ``max_entries`` the
+    least recently read entries are removed in one statement. Hit and miss
+    counters are per process.
+    """
+
+    EVICT_EVERY = 100
+
+    def __init__(self, path, max_entries=10000, ttl=60.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._db().execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+
+    def _db(self):
+        # sqlite3 connections cannot be shared across threads or forks
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=OFF")
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def get(self, key):
+        now = time.time()
+        row = self._db().execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count('misses')
+            return MISS
+        if row[1] <= now:
+            self._db().execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._count('expirations')
+            self._count('misses')
+            return MISS
+        self._db().execute("UPDATE cache SET last_access = ? WHERE key = ?", (now, key))
+        self._count('hits')
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        db = self._db()
+        db.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now + self.ttl, now)
+        )
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.EVICT_EVERY == 0
+        if evict:
+            db.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            cursor = db.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY last_access "
+                "LIMIT max((SELECT count(*) FROM cache) - ?, 0))",
+                (self.max_entries,)
+            )
+            self._count('evictions', max(cursor.rowcount, 0))
+
+    def delete(self, key):
+        cursor = self._db().execute("DELETE FROM cache WHERE key = ?", (key,))
+        if cursor.rowcount > 0:
+            self._count('invalidations')
+
+    def clear(self):
+        self._db().execute("DELETE FROM cache")
+
+    def stats(self):
+        size = self._db().execute("SELECT count(*) FROM cache").fetchone()[0]
+        with self._lock:
+            return {
+                'backend': 'sqlite',
+                'path': self.path,
+                'size': size,
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+class CacheManager:
+    """Read-through cache front for the models.
+
+    Disabled (every lookup misses) until ``init_cache`` is called. When a
+    notification channel is configured, writes publish the invalidated keys
+    with ``pg_notify`` inside their transaction and every worker drops them
+    from its local cache once the transaction commits. ``init_cache`` only
+    subscribes; each process starts the listener itself
+    (``notification_listener.ensure_started()``), so importing the app needs
+    no database.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.channel = None
+
+    def init_cache(self, config=None):
+        """Create the cache backend from config (CACHE_* settings)"""
+        kind = getattr(config, 'CACHE_BACKEND', 'memory')
+        max_entries = getattr(config, 'CACHE_MAX_ENTRIES', 10000)
+        ttl = getattr(config, 'CACHE_TTL', 60.0)
+        if kind == 'none':
+            self.backend = None
+        elif kind == 'memory':
+            self.backend = LRUCache(max_entries=max_entries, ttl=ttl)
+        elif kind == 'sqlite':
+            path = getattr(config, 'CACHE_SQLITE_PATH', '/tmp/student_api_cache.sqlite3')
+            self.backend = SQLiteCache(path, max_entries=max_entries, ttl=ttl)
+        else:
+            raise ValueError(f"Unknown cache backend: {kind}")
+
+        self.channel = getattr(config, 'CACHE_NOTIFY_CHANNEL', None) or None
+        if self.backend and self.channel:
+            from app.utils.notifications import notification_listener
+            notification_listener.subscribe(self.channel, self._on_notify)
+        elif kind == 'memory':
+            logger.warning("CACHE_NOTIFY_CHANNEL is not set: the memory cache is not invalidated "
+                           "across processes, run a single worker")
+
+    def get(self, key):
+        if not self.backend:
+            return MISS
+        return self.backend.get(key)
+
+    def set(self, key, value):
+        if self.backend:
+            self.backend.set(key, value)
+
+    def publish(self, cur, keys):
+        """Queue cross-worker invalidation of ``keys`` in the current transaction."""
+        if self.backend and self.channel:
+            for key in keys:
+                cur.execute("SELECT pg_notify(%s, %s)", (self.channel, key))
+
+    def invalidate(self, keys):
+        """Drop ``keys`` from this worker's cache; call after the write commits."""
+        if self.backend:
+            for key in keys:
+                self.backend.delete(key)
+
+    def stats(self):
+        if not self.backend:
+            return None
+        return self.backend.stats()
+
+    def _on_notify(self, key):
+        if key is None:
+            # Reconnected, invalidations may have been missed
+            self.backend.clear()
+        else:
+            self.backend.delete(key)
+
+
+cache_manager = CacheManager()
+metrics.register_collector(stats_collector('cache', 'Student cache', cache_manager.stats, {
+    'size': 'gauge', 'hits': 'counter', 'misses': 'counter', 'evictions': 'counter',
+    'expirations': 'counter', 'invalidations': 'counter',
+}))
@@ -0,0 +1,85 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeNotifier:
+    """Wakes long-polling requests when a ``LISTEN`` channel announces a newer sequence number.
+
+    The channel is subscribed on first use, in the process that waits (the
+    listener thread does not survive a fork). Payloads are the highest
+    sequence number a committed transaction wrote; a listener reconnect
+    wakes every waiter, since notifications may have been missed.
+    """
+
+    def __init__(self, channel, listener=None):
+        self.channel = channel
+        self._listener = listener
+        self._cond = threading.Condition()
+        self._latest = 0
+        self._reconnects = 0
+        self._subscribed_pid = None
+        self._waiting = 0
+        self.wakeups = 0
+        self.timeouts = 0
+
+    def _ensure_subscribed(self):
+        with self._cond:
+            if self._subscribed_pid == os.getpid():
+                return
+            if self._listener is None:
+                from app.utils.notifications import notification_listener
+                self._listener = notification_listener
+            if self._subscribed_pid is None:
+                self._listener.subscribe(self.channel, self._on_notify)
+            self._listener.ensure_started()
+            self._subscribed_pid = os.getpid()
+
+    def _on_notify(self, payload):
+        with self._cond:
+            if payload is None:
+                self._reconnects += 1
+            else:
+                try:
+                    self._latest = max(self._latest, int(payload))
+                except ValueError:
+                    logger.error(f"Ignoring malformed {self.channel} notification: {payload!r}")
+                    return
+            self._cond.notify_all()
+
+    def wait(self, after, timeout, interrupted=None):
+        """Block until something newer than ``after`` is announced, at most ``timeout`` seconds.
+
+        Returns True when woken by a notification (the caller should read
+        again) and False on timeout or once ``interrupted()`` turns true.
+        """
+        self._ensure_subscribed()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            reconnects = self._reconnects
+            self._waiting += 1
+            try:
+                while self._latest <= after and self._reconnects == reconnects:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or (interrupted and interrupted()):
+                        self.timeouts += 1
+                        return False
+                    # Wake up now and then to notice interruption (e.g. draining)
+                    self._cond.wait(min(remaining, 1.0))
+                self.wakeups += 1
+                return True
+            finally:
+                self._waiting -= 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                'channel': self.channel,
+                'latest_seq': self._latest,
+                'waiting': self._waiting,
+                'wakeups': self.wakeups,
+                'timeouts': self.timeouts,
+            }
@@ -1,11 +1,25 @@
+import logging
+import math
 import psycopg2
+import psycopg2.errors
 import os
+import queue
+import threading
 from psycopg2.extras import RealDictCursor
-from psycopg2 import pool
-import os
-from psycopg2.extras import RealDictCursor
+from app.utils.deadline import current_deadline
+from app.utils.metrics import TimedCursor, metrics, stats_collector
+from app.utils.pool import BoundedConnectionPool, PoolTimeoutError
+from app.utils.prepared import PreparedStatementRegistry
+from app.utils.replicas import (Replica, ReplicaRouter, mark_write, pin_replica, pinned_replica,
+                                reads_use_primary)
+from app.utils.tasks import PeriodicTask
+
+logger = logging.getLogger(__name__)
 
 class DatabaseManager:
+    # Marks a request pinned to the primary because no replica was usable
+    PRIMARY = object()
+
     def __init__(self):
         self.connection_pool = None
         self.connection = None
@@ -14,120 +28,511 @@ class DatabaseManager:
         self.database = os.getenv('DB_NAME', 'student_db')
         self.user = os.getenv('DB_USER', 'postgres')
         self.password = os.getenv('DB_PASSWORD', 'password')
+        self.prepared = PreparedStatementRegistry()
+        # Cursor class for pooled queries; TimedCursor records per-statement latency
+        self.cursor_factory = TimedCursor
+        self.config = None
+        self._pool_lock = threading.Lock()
+        self._pool_pid = None
+        self._inherited_pools = []
+        self.replica_router = None
+        # id(connection) -> replica pool, for connections checked out from a replica
+        self._replica_owners = {}
+    
+    def configure(self, config=None):
+        """Store pool settings from config; the pool itself is created lazily.
+
+        Nothing connects here, so the app can be imported by a preloading
+        server before it forks, and starts even if the database is briefly
+        unavailable. Each process creates its own pool on first use.
+        """
+        self.config = config
+        self.prepared.enabled = getattr(config, 'DB_PREPARED_STATEMENTS', True)
+        self.cursor_factory = TimedCursor if getattr(config, 'METRICS_ENABLED', True) else None
     
     def init_pool(self, config=None):
-        """Initialize connection pool"""
+        """Create this process's pool now and test it (pre-warming), instead of on first use"""
+        if config is not None:
+            self.configure(config)
         try:
-            print(f"Attempting to connect to database at {self.host}:{self.port}")
-            self.connection_pool = psycopg2.pool.SimpleConnectionPool(
-                1, 20,  # min and max connections
-                host=self.host,
-                port=self.port,
-                database=self.database,
-                user=self.user,
-                password=self.password
-            )
-            print(f"Connection pool created for database: {self.database}")
-            
+            pool = self._get_pool()
             # Test the connection
-            conn = self.connection_pool.getconn()
-            cur = conn.cursor()
-            cur.execute('SELECT 1')
-            print("Database connection test successful!")
-            cur.close()
-            self.connection_pool.putconn(conn)
+            conn = pool.getconn()
+            try:
+                cur = conn.cursor()
+                cur.execute('SELECT 1')
+                cur.close()
+                conn.rollback()
+                logger.info("Database connection test successful")
+            finally:
+                pool.putconn(conn)
         except Exception as error:
-            print(f"Error creating connection pool: {error}")
+            logger.error("Error creating connection pool: %s", error)
             raise error
     
-    def get_connection(self):
-        """Get connection from pool or create new connection"""
-        if self.connection_pool:
+    def _get_pool(self):
+        """Return this process's pool, creating it on first use and after fork.
+
+        A pool inherited from the parent process is never used or closed in
+        the child: closing would terminate sessions the parent still owns, so
+        it is only kept referenced. Returns None when ``configure`` was never
+        called (single unpooled connection mode).
+        """
+        pool = self.connection_pool
+        if pool is not None and self._pool_pid == os.getpid():
+            return pool
+        if self.config is None and pool is None:
+            return None
+        with self._pool_lock:
+            if self.connection_pool is not None and self._pool_pid != os.getpid():
+                self._inherited_pools.append(self.connection_pool)
+                self._inherited_pools.extend(
+                    replica.pool for replica in (self.replica_router.replicas if self.replica_router else ()))
+                self.connection_pool = None
+                self.replica_router = None
+                self._replica_owners = {}
+                self.prepared.forget_all()
+            if self.connection_pool is None:
+                config = self.config
+                minconn = getattr(config, 'DB_POOL_MIN', 1)
+                maxconn = getattr(config, 'DB_POOL_MAX', 20)
+                logger.info("Attempting to connect to database at %s:%s", self.host, self.port)
+                self.connection_pool = BoundedConnectionPool(
+                    minconn, maxconn,
+                    connect=self._open_connection,
+                    acquire_timeout=getattr(config, 'DB_POOL_TIMEOUT', 5.0),
+                    max_lifetime=getattr(config, 'DB_POOL_MAX_LIFETIME', 1800.0),
+                    validate_after=getattr(config, 'DB_POOL_VALIDATE_AFTER', 30.0),
+                    on_close=self.prepared.forget
+                )
+                self.replica_router = self._create_replica_router(config)
+                self._pool_pid = os.getpid()
+                logger.info("Connection pool created for database: %s (pid=%s, min=%s, max=%s)",
+                            self.database, self._pool_pid, minconn, maxconn)
+            return self.connection_pool
+    
+    def _create_replica_router(self, config):
+        """Create replica pools from DB_REPLICA_HOSTS ("host[:port],..."), or return None.
+
+        Replica pools start empty so an unreachable replica cannot block
+        startup; it is simply kept out of rotation.
+        """
+        hosts = [host.strip() for host in (getattr(config, 'DB_REPLICA_HOSTS', '') or '').split(',') if host.strip()]
+        if not hosts:
+            return None
+        replicas = []
+        for entry in hosts:
+            host, _, port = entry.partition(':')
+            port = port or self.port
+            pool = BoundedConnectionPool(
+                0, getattr(config, 'DB_POOL_MAX', 20),
+                connect=lambda host=host, port=port: self._open_connection(host, port),
+                acquire_timeout=getattr(config, 'DB_POOL_TIMEOUT', 5.0),
+                max_lifetime=getattr(config, 'DB_POOL_MAX_LIFETIME', 1800.0),
+                validate_after=getattr(config, 'DB_POOL_VALIDATE_AFTER', 30.0),
+                on_close=self.prepared.forget
+            )
+            replicas.append(Replica(host, port, pool))
+        logger.info("Read replicas configured: %s", ', '.join(replica.name for replica in replicas))
+        return ReplicaRouter(
+            replicas,
+            max_lag=getattr(config, 'DB_REPLICA_MAX_LAG', 5.0),
+            check_interval=getattr(config, 'DB_REPLICA_CHECK_INTERVAL', 2.0),
+            selection=getattr(config, 'DB_REPLICA_SELECTION', 'least_loaded')
+        )
+    
+    def is_ready(self, timeout=1.0):
+        """Readiness check: a pooled connection can be checked out and answers SELECT 1"""
+        try:
+            pool = self._get_pool()
+            conn = pool.getconn(timeout) if pool else self.connect()
+            if not conn:
+                return False, "Failed to get database connection"
             try:
-                return self.connection_pool.getconn()
-            except Exception as error:
-                print(f"Error getting connection from pool: {error}")
-                return self.connect()
-        else:
+                cur = conn.cursor()
+                cur.execute('SELECT 1')
+                cur.close()
+                conn.rollback()
+            finally:
+                self.put_connection(conn)
+            return True, None
+        except Exception as error:
+            return False, str(error)
+    
+    def _connect_timeout(self):
+        # Whole seconds (libpq waits at least 2), so an unreachable host fails about as fast as a busy pool
+        return max(2, math.ceil(getattr(self.config, 'DB_POOL_TIMEOUT', 5.0)))
+
+    def _session_statement_timeout(self):
+        """statement_timeout (ms) pooled connections open with: the default request budget (0 = none)"""
+        return max(0, int(getattr(self.config, 'REQUEST_TIMEOUT_MS', 0) or 0))
+
+    def _open_connection(self, host=None, port=None):
+        """Open a raw connection for a pool (the primary by default); errors propagate to the caller"""
+        options = {}
+        session_timeout = self._session_statement_timeout()
+        if session_timeout:
+            # Sent with the startup packet, so it costs no round trip
+            options['options'] = f"-c statement_timeout={session_timeout}"
+        return psycopg2.connect(
+            host=host or self.host,
+            port=port or self.port,
+            database=self.database,
+            user=self.user,
+            password=self.password,
+            connect_timeout=self._connect_timeout(),
+            **options
+        )
+
+    def _set_statement_timeout(self, conn, timeout_ms):
+        """Override the session statement_timeout for the current transaction (0 = unbounded)"""
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SET LOCAL statement_timeout = %s", (timeout_ms,))
+        except Exception:
+            self.put_connection(conn, close=True)
+            raise
+    
+    def get_connection(self, timeout=None, readonly=False):
+        """Get connection from pool, waiting at most ``timeout`` seconds.
+
+        Raises PoolTimeoutError when the pool is exhausted rather than opening
+        unpooled connections. Without a pool a single connection is created.
+        ``readonly`` work goes to a replica when one is in rotation, unless
+        the current request has already written; every read of a request uses
+        the same replica. Everything else marks the request as having written
+        and uses the primary.
+        """
+        pool = self._get_pool()
+        if not pool:
             return self.connect()
+        if not readonly:
+            mark_write()
+        elif self.replica_router and not reads_use_primary():
+            replica = pinned_replica()
+            if replica is None:
+                replica = self.replica_router.choose()
+                pin_replica(replica or self.PRIMARY)
+            elif replica is self.PRIMARY or not replica.in_rotation:
+                # Another replica could be further behind than what this request already read
+                replica = None
+            if replica:
+                try:
+                    conn = replica.pool.getconn(timeout)
+                except PoolTimeoutError:
+                    pass
+                except Exception as error:
+                    self.replica_router.mark_failed(replica, error)
+                else:
+                    self._replica_owners[id(conn)] = replica.pool
+                    return conn
+                # Replica busy or unreachable: fall back to the primary
+                self.replica_router.fallbacks += 1
+        return pool.getconn(timeout)
+    
+    def check_replicas(self):
+        """Re-check replica lag in this process (run by ``replica_monitor``, off the request path)."""
+        if not getattr(self.config, 'DB_REPLICA_HOSTS', ''):
+            return None
+        self._get_pool()
+        router = self.replica_router
+        if router is None:
+            return None
+        router.check_lag()
+        return sum(1 for replica in router.replicas if replica.in_rotation)
+
+    def is_replica_connection(self, connection):
+        """True when ``connection`` was checked out from a read replica"""
+        return id(connection) in self._replica_owners
     
-    def put_connection(self, connection):
-        """Return connection to pool"""
-        if self.connection_pool and connection:
-            self.connection_pool.putconn(connection)
+    # How far a statement may outlive the request deadline before the
+    # session statement_timeout is tightened with an extra SET LOCAL
+    STATEMENT_TIMEOUT_SLACK_MS = 50
+
+    def get_connection_within_deadline(self, readonly=False):
+        """Get a connection and bound its statements by the request deadline.
+
+        The pool wait and every statement of the transaction are capped by
+        the time left, so a slow query is cancelled by Postgres and its
+        connection handed back. Pooled connections open with the default
+        budget as their session ``statement_timeout``; a request still
+        within ``STATEMENT_TIMEOUT_SLACK_MS`` of it needs no extra round
+        trip. Otherwise ``SET LOCAL statement_timeout`` (reset when the
+        transaction ends) applies the time left, or lifts the limit for work
+        without a deadline.
+        """
+        deadline = current_deadline()
+        pool = self._get_pool()
+        if deadline is None:
+            conn = self.get_connection(readonly=readonly)
+            timeout_ms = 0
+        else:
+            remaining = deadline.remaining()
+            if remaining <= 0:
+                raise deadline.expire('expired')
+            try:
+                pool_timeout = pool.acquire_timeout if pool else remaining
+                conn = self.get_connection(timeout=min(remaining, pool_timeout), readonly=readonly)
+            except PoolTimeoutError as error:
+                if deadline.remaining() > 0:
+                    raise
+                raise deadline.expire('pool') from error
+            timeout_ms = max(1, int(deadline.remaining() * 1000))
+        if not conn:
+            return conn, deadline
+        session_timeout = self._session_statement_timeout() if pool else 0
+        if timeout_ms == session_timeout or (
+                timeout_ms and timeout_ms <= session_timeout <= timeout_ms + self.STATEMENT_TIMEOUT_SLACK_MS):
+            return conn, deadline
+        self._set_statement_timeout(conn, timeout_ms)
+        return conn, deadline
+    
+    def put_connection(self, connection, close=False):
+        """Return connection to pool (closing it if it is broken or unpooled)"""
+        if not connection:
+            return
+        replica_pool = self._replica_owners.pop(id(connection), None)
+        if replica_pool:
+            replica_pool.putconn(connection, close=close)
+        elif self.connection_pool:
+            self.connection_pool.putconn(connection, close=close)
+        elif not connection.closed:
+            self.prepared.forget(connection)
+            connection.close()
+    
+    def register_statement(self, name, query, param_types=None):
+        """Register a hot statement to run as a server-side prepared statement"""
+        self.prepared.register(name, query, param_types)
+    
+    def execute_prepared(self, cur, name, params=()):
+        """Execute a registered statement on cur, preparing it on first use per connection"""
+        self.prepared.execute(cur, name, params)
+    
+    def prepared_stats(self):
+        """Return per-statement counts of prepared and unprepared executions"""
+        return self.prepared.stats()
+    
+    def pool_stats(self):
+        """Return connection pool statistics, or None before init_pool()"""
+        if not self.connection_pool or self._pool_pid != os.getpid():
+            return None
+        return self.connection_pool.stats()
+    
+    def replica_stats(self):
+        """Return replica rotation, lag and pool statistics, or None without replicas"""
+        if not self.replica_router or self._pool_pid != os.getpid():
+            return None
+        return self.replica_router.stats()
+    
+    def replica_metrics(self):
+        """Metrics collector for read replicas, labelled by replica"""
+        stats = self.replica_stats()
+        if stats is None:
+            return
+        replicas = stats['replicas']
+        yield 'db_replica_in_rotation', 'gauge', 'Whether the replica currently serves reads.', [
+            ('db_replica_in_rotation', {'replica': r['name']}, r['in_rotation']) for r in replicas]
+        yield 'db_replica_lag_seconds', 'gauge', 'Replay lag at the last check.', [
+            ('db_replica_lag_seconds', {'replica': r['name']}, r['lag_seconds'])
+            for r in replicas if r['lag_seconds'] is not None]
+        yield 'db_replica_reads_total', 'counter', 'Read-only checkouts routed to the replica.', [
+            ('db_replica_reads_total', {'replica': r['name']}, r['reads']) for r in replicas]
+        yield 'db_replica_in_use', 'gauge', 'Connections checked out from the replica pool.', [
+            ('db_replica_in_use', {'replica': r['name']}, r['pool']['in_use']) for r in replicas]
+        yield 'db_replica_primary_fallbacks_total', 'counter', 'Reads sent to the primary for lack of a replica.', [
+            ('db_replica_primary_fallbacks_total', {}, stats['primary_fallbacks'])]
+    
+    def pool_metrics(self):
+        """Metrics collector for the pool: saturation gauges and the acquire wait histogram"""
+        stats = self.pool_stats()
+        if stats is None:
+            return
+        yield from stats_collector('db_pool', 'Connection pool', lambda: stats, {
+            'size': 'gauge', 'max': 'gauge', 'in_use': 'gauge', 'idle': 'gauge', 'waiters': 'gauge',
+            'acquired': 'counter', 'created': 'counter', 'recycled': 'counter', 'timeouts': 'counter',
+        })()
+        samples = [
+            ('db_pool_acquire_wait_seconds_bucket', {'le': bound}, count)
+            for bound, count in stats['wait_seconds_histogram'].items()
+        ]
+        samples.append(('db_pool_acquire_wait_seconds_sum', {}, stats['wait_seconds_sum']))
+        samples.append(('db_pool_acquire_wait_seconds_count', {}, stats['acquired']))
+        yield 'db_pool_acquire_wait_seconds', 'histogram', 'Time spent waiting for a pooled connection.', samples
     
     def connect(self):
         """Create a single connection"""
         try:
-            print("Attempting to connect to database with settings:")
-            print(f"Host: {self.host}, Port: {self.port}, DB: {self.database}, User: {self.user}")
+            logger.info("Attempting to connect to database with settings: host=%s, port=%s, database=%s, user=%s",
+                        self.host, self.port, self.database, self.user)
             connection = psycopg2.connect(
                 host=self.host,
                 port=self.port,
                 database=self.database,
                 user=self.user,
                 password=self.password,
+                connect_timeout=self._connect_timeout(),
                 cursor_factory=RealDictCursor
             )
 
-            print(f"Successfully connected to database: {self.database}")
+            logger.info("Successfully connected to database: %s", self.database)
             return connection
         except Exception as error:
-            print(f"Error connecting to database: {error}")
-            print(f"Connection parameters: host={self.host}, port={self.port}, database={self.database}, user={self.user}")
+            logger.error("Error connecting to database: %s (host=%s, port=%s, database=%s, user=%s)",
+                         error, self.host, self.port, self.database, self.user)
             return None
     
-    def get_db_cursor(self):
-        """Get a database cursor from the connection pool with context management"""
+    def get_db_cursor(self, name=None, readonly=False):
+        """Get a database cursor from the connection pool with context management.
+
+        Passing ``name`` opens a server-side (named) cursor so large result sets
+        can be fetched in chunks instead of being buffered client-side.
+        ``readonly=True`` lets the work run on a read replica.
+        """
         class CursorContextManager:
-            def __init__(self, db_manager):
+            def __init__(self, db_manager, name, readonly):
                 self.db_manager = db_manager
+                self.name = name
+                self.readonly = readonly
                 self.conn = None
                 self.cur = None
+                self.deadline = None
 
             def __enter__(self):
-                self.conn = self.db_manager.get_connection()
+                self.conn, self.deadline = self.db_manager.get_connection_within_deadline(self.readonly)
                 if not self.conn:
                     raise Exception("Failed to get database connection")
-                self.cur = self.conn.cursor()
+                if self.name:
+                    self.cur = self.conn.cursor(name=self.name, cursor_factory=self.db_manager.cursor_factory)
+                else:
+                    self.cur = self.conn.cursor(cursor_factory=self.db_manager.cursor_factory)
                 return self.conn, self.cur
 
             def __exit__(self, exc_type, exc_val, exc_tb):
-                if exc_type is None:
-                    # No exception occurred, commit the transaction
-                    self.conn.commit()
-                else:
-                    # An exception occurred, rollback
-                    self.conn.rollback()
-                
-                if self.cur:
-                    self.cur.close()
-                if self.conn:
-                    self.db_manager.put_connection(self.conn)
-                    
-        return CursorContextManager(self)
+                try:
+                    # Named cursors must be closed before the transaction ends
+                    if self.cur:
+                        self.cur.close()
+                    if exc_type is None:
+                        # No exception occurred, commit the transaction
+                        self.conn.commit()
+                    else:
+                        # An exception occurred, rollback
+                        self.conn.rollback()
+                finally:
+                    if self.conn:
+                        # Drop connections that failed at the protocol level
+                        broken = exc_type is not None and issubclass(
+                            exc_type, (psycopg2.OperationalError, psycopg2.InterfaceError))
+                        self.db_manager.put_connection(self.conn, close=broken)
+                if self.deadline is not None and exc_type is not None and issubclass(
+                        exc_type, psycopg2.errors.QueryCanceled):
+                    raise self.deadline.expire('query') from exc_val
+
+        return CursorContextManager(self, name, readonly)
     
+    def stream_copy(self, copy_sql, params=None, chunk_size=65536, max_chunks=8, readonly=False):
+        """Yield the output of a ``COPY ... TO STDOUT`` statement as byte chunks.
+
+        psycopg2's ``copy_expert`` only writes into a file object, so it runs in
+        a helper thread that feeds a bounded queue; at most ``max_chunks``
+        chunks of ``chunk_size`` bytes are buffered whatever the table size.
+        Closing the generator early aborts the COPY and discards the connection.
+        COPY cannot take bind parameters, so ``params`` are interpolated
+        client-side with ``mogrify``. ``readonly`` exports may run on a replica.
+        """
+        conn = self.get_connection(readonly=readonly)
+        if not conn:
+            raise Exception("Failed to get database connection")
+        if self._session_statement_timeout() and self._get_pool():
+            # Exports are unbounded, unlike the pool's session default
+            self._set_statement_timeout(conn, 0)
+        chunks = queue.Queue(maxsize=max_chunks)
+        cancelled = threading.Event()
+        done = object()
+
+        class QueueWriter:
+            def __init__(self):
+                self.buffer = bytearray()
+
+            def write(self, data):
+                self.buffer += data
+                if len(self.buffer) >= chunk_size:
+                    self.flush()
+
+            def flush(self):
+                if self.buffer:
+                    put(bytes(self.buffer))
+                    self.buffer.clear()
+
+        def put(item):
+            while True:
+                if cancelled.is_set():
+                    raise Exception("COPY cancelled by consumer")
+                try:
+                    chunks.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def run():
+            failed = False
+            cur = None
+            try:
+                cur = conn.cursor(cursor_factory=self.cursor_factory)
+                writer = QueueWriter()
+                cur.copy_expert(cur.mogrify(copy_sql, params) if params else copy_sql, writer)
+                writer.flush()
+                conn.commit()
+                put(done)
+            except Exception as error:
+                failed = True
+                try:
+                    put(error)
+                except Exception:
+                    pass
+            finally:
+                if cur:
+                    try:
+                        cur.close()
+                    except Exception:
+                        failed = True
+                # An interrupted COPY leaves the protocol mid-stream, drop the connection
+                self.put_connection(conn, close=failed)
+
+        worker = threading.Thread(target=run, name="copy-to-stdout", daemon=True)
+        worker.start()
+        try:
+            while True:
+                item = chunks.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+            worker.join()
+
     def execute_query(self, query, params=None):
         """Execute a query and return results"""
         connection = None
         cursor = None
+        deadline = None
         try:
-            connection = self.get_connection()
+            connection, deadline = self.get_connection_within_deadline()
             if not connection:
                 raise Exception("Failed to establish database connection")
                 
-            cursor = connection.cursor()
-            print(f"Executing query: {query}")
-            if params:
-                print(f"With parameters: {params}")
-                
+            cursor = connection.cursor(cursor_factory=self.cursor_factory)
+            # Query text and parameters only at DEBUG; nothing is formatted otherwise
+            logger.debug("Executing query: %s with parameters: %s", query, params)
+
             cursor.execute(query, params)
             
             # If it's a SELECT query, fetch results
             if query.strip().upper().startswith('SELECT'):
                 results = cursor.fetchall()
                 if not results:
-                    print("Query returned no results")
                     return []  # Return empty list instead of None
                 return results
             else:
@@ -135,27 +540,37 @@ class DatabaseManager:
                 connection.commit()
                 return cursor.rowcount
                 
+        except psycopg2.errors.QueryCanceled as error:
+            if connection:
+                connection.rollback()
+            if deadline is not None:
+                raise deadline.expire('query') from error
+            raise
         except Exception as error:
             if connection:
                 connection.rollback()
-            print(f"Error executing query: {error}")
-            print(f"Query was: {query}")
-            if params:
-                print(f"Parameters were: {params}")
+            logger.error("Error executing query: %s", error)
+            logger.debug("Failed query: %s with parameters: %s", query, params)
             raise error
         finally:
             if cursor:
                 cursor.close()
-            if connection and self.connection_pool:
+            if connection:
                 self.put_connection(connection)
     
     def disconnect(self):
-        """Close connection pool"""
-        if self.connection_pool:
+        """Close this process's connection pool (an inherited one is left to its owner)"""
+        if self.connection_pool and self._pool_pid == os.getpid():
             self.connection_pool.closeall()
-            print("Connection pool closed")
+            for replica in (self.replica_router.replicas if self.replica_router else ()):
+                replica.pool.closeall()
+            logger.info("Connection pool closed")
         elif self.connection:
             self.connection.close()
-            print("Database connection closed")
+            logger.info("Database connection closed")
 
-db_manager = DatabaseManager()
\ No newline at end of file
+db_manager = DatabaseManager()
+# Replica lag checks; the thread starts in each worker (see gunicorn.conf.py)
+replica_monitor = PeriodicTask('replica-lag-check', db_manager.check_replicas)
+metrics.register_collector(db_manager.pool_metrics)
+metrics.register_collector(db_manager.replica_metrics)
@@ -0,0 +1,60 @@
+import contextvars
+import time
+
+from app.utils.metrics import metrics
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the current request ran out of time for database work."""
+
+
+deadline_exceeded = metrics.counter(
+    'request_deadline_exceeded_total',
+    'Requests that ran out of time, by where: pool (waiting for a connection), '
+    'query (statement_timeout cancelled it), batch (waiting for a batched lookup) '
+    'or expired (no time left to start).',
+    ('stage',)
+)
+
+
+class Deadline:
+    """Absolute point in time by which a request's database work must finish."""
+
+    __slots__ = ('timeout', 'expires_at', 'exceeded')
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+        self.exceeded = None
+
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+    def expire(self, stage):
+        """Record that the deadline was hit at ``stage`` and return the exception to raise."""
+        if self.exceeded is None:
+            self.exceeded = stage
+            deadline_exceeded.labels(stage).inc()
+        return DeadlineExceeded(f"Request deadline of {self.timeout:.3f}s exceeded ({stage})")
+
+
+_current = contextvars.ContextVar('request_deadline', default=None)
+
+
+def start_deadline(timeout):
+    """Set a deadline ``timeout`` seconds from now for the current context.
+
+    Returns a token for ``clear_deadline``. The deadline follows the request
+    through controllers and models to ``get_db_cursor`` without being passed
+    explicitly.
+    """
+    return _current.set(Deadline(timeout) if timeout else None)
+
+
+def clear_deadline(token):
+    _current.reset(token)
+
+
+def current_deadline():
+    """The deadline of the current request, or None when unbounded."""
+    return _current.get()
@@ -0,0 +1,313 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+
+from app.utils.cache import MISS, LRUCache
+from app.utils.database import db_manager
+from app.utils.deadline import clear_deadline, start_deadline
+from app.utils.metrics import metrics, stats_collector
+from app.utils.tasks import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyKeyReused(Exception):
+    """Raised when an Idempotency-Key comes back with a different request."""
+
+
+class IdempotencyKeyInProgress(Exception):
+    """Raised when the first request with a key is still running after the wait."""
+
+
+class IdempotencyOutcomeLost(Exception):
+    """Raised when the first request with a key committed its write but its response was never stored."""
+
+
+# The key claimed by the request running on this context, marked applied by its writes
+_bound_key = contextvars.ContextVar('idempotency_key', default=None)
+
+
+def bind_key(key):
+    """Mark every write transaction of the current request as applying ``key``; returns a token."""
+    return _bound_key.set(key)
+
+
+def unbind_key(token):
+    _bound_key.reset(token)
+
+
+def bound_key():
+    """The Idempotency-Key the current request holds, or None."""
+    return _bound_key.get()
+
+
+def mark_applied(cur):
+    """Record in the caller's transaction that the current request's key was applied.
+
+    Write paths call it once a statement actually changed a row (next to
+    ``cache_manager.publish``); a no-op for requests without a key.
+    """
+    key = _bound_key.get()
+    if key is not None:
+        db_manager.execute_prepared(cur, "idempotency_applied", (key,))
+
+
+class IdempotencyStore:
+    """Responses of requests sent with an ``Idempotency-Key``, replayed to retries.
+
+    Keys live in the ``idempotency_keys`` table for ``ttl`` seconds, shared by
+    all workers, with the most recent ones in an in-process LRU so a retry
+    usually costs no query. The first request claims its key with a row
+    holding no response yet; until it completes, or its ``lease`` runs out
+    because the worker died, duplicates wait for its result: on an event in
+    the same process, by polling the row across processes. Only successful
+    responses are kept; after a failure the key is released and a retry
+    runs the request again.
+
+    The claim, the write and the stored response are separate transactions,
+    so a write that changes rows for a request holding a key (``bind_key``)
+    also sets the row's ``applied_at`` in its own transaction
+    (``mark_applied``). A worker killed
+    between its write and ``complete`` thus leaves an applied claim that is
+    never taken over or released: retries get IdempotencyOutcomeLost instead
+    of writing a second time.
+    """
+
+    # Own time budget for recording an outcome, independent of the request deadline
+    STORE_TIMEOUT = 2.0
+    MAX_POLL_INTERVAL = 0.2
+
+    def __init__(self, ttl=24 * 3600, lease=90.0, wait=10.0, max_entries=10000):
+        self.ttl = ttl
+        self.lease = lease
+        self.wait = wait
+        self._recent = LRUCache(max_entries=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.claimed = 0
+        self.replayed = 0
+        self.waited = 0
+        self.in_progress = 0
+        self.reused = 0
+        self.stored = 0
+        self.released = 0
+        self.lost = 0
+
+    def configure(self, ttl=None, lease=None, wait=None, max_entries=None):
+        if ttl is not None:
+            self.ttl = ttl
+        if lease is not None:
+            self.lease = lease
+        if wait is not None:
+            self.wait = wait
+        if ttl is not None or max_entries is not None:
+            self._recent = LRUCache(max_entries=max_entries or self._recent.max_entries, ttl=self.ttl)
+
+    def begin(self, key, fingerprint):
+        """Claim ``key`` for this request or return the response stored under it.
+
+        Returns None when the caller owns the key and must run the request,
+        then call ``complete`` or ``release``. Otherwise returns the first
+        request's (status, body, headers), waiting up to ``wait`` seconds if
+        it is still running. Raises IdempotencyKeyReused when the key was
+        used for a different request, IdempotencyKeyInProgress when the
+        first one did not finish in time and IdempotencyOutcomeLost when it
+        wrote but ended without storing its response.
+        """
+        give_up_at = time.monotonic() + self.wait
+        poll_interval = 0.01
+        waited = False
+        while True:
+            stored = self._recent.get(key)
+            if stored is not MISS:
+                return self._replay(stored, fingerprint)
+            with self._lock:
+                event = self._in_flight.get(key)
+                if event is None:
+                    self._in_flight[key] = threading.Event()
+            remaining = give_up_at - time.monotonic()
+            if event is not None:
+                # A request in this process holds the key; its outcome lands in the LRU
+                if not waited:
+                    waited = True
+                    self._count('waited')
+                if remaining <= 0 or not event.wait(remaining):
+                    self._count('in_progress')
+                    raise IdempotencyKeyInProgress(f"Request with idempotency key {key!r} is still in progress")
+                continue
+            try:
+                claimed, row = self._claim(key, fingerprint)
+            except Exception:
+                self._finish(key)
+                raise
+            if claimed:
+                self._count('claimed')
+                return None
+            self._finish(key)
+            if row is None:
+                # Released between the claim and the read; try again
+                continue
+            stored_fingerprint, status, body, headers, abandoned = row
+            if status is not None:
+                stored = (stored_fingerprint, status, body, headers or {})
+                self._recent.set(key, stored)
+                return self._replay(stored, fingerprint)
+            if stored_fingerprint != fingerprint:
+                self._count('reused')
+                raise IdempotencyKeyReused(f"Idempotency key {key!r} was used for a different request")
+            if abandoned:
+                self._count('lost')
+                raise IdempotencyOutcomeLost(f"Request with idempotency key {key!r} was applied without a response")
+            # In flight in another worker
+            if not waited:
+                waited = True
+                self._count('waited')
+            if remaining <= 0:
+                self._count('in_progress')
+                raise IdempotencyKeyInProgress(f"Request with idempotency key {key!r} is still in progress")
+            time.sleep(min(poll_interval, remaining))
+            poll_interval = min(poll_interval * 2, self.MAX_POLL_INTERVAL)
+
+    def complete(self, key, fingerprint, status, body, headers):
+        """Store the response of the request that claimed ``key`` and wake its duplicates."""
+        token = start_deadline(self.STORE_TIMEOUT)
+        try:
+            with db_manager.get_db_cursor() as (conn, cur):
+                db_manager.execute_prepared(
+                    cur, "idempotency_complete", (status, body, json.dumps(headers), self.ttl, key))
+            self._recent.set(key, (fingerprint, status, body, headers))
+            self._count('stored')
+        except Exception as e:
+            # The claim's lease runs out and a retry will run the request again
+            logger.error(f"Error storing response for idempotency key {key!r}: {e}")
+        finally:
+            clear_deadline(token)
+            self._finish(key)
+
+    def release(self, key):
+        """Give up the claim on ``key`` after a failed request so a retry can run it.
+
+        A claim whose write was applied is kept (without a lease) so retries
+        do not write again.
+        """
+        token = start_deadline(self.STORE_TIMEOUT)
+        try:
+            with db_manager.get_db_cursor() as (conn, cur):
+                db_manager.execute_prepared(cur, "idempotency_release", (key,))
+                if not cur.rowcount:
+                    db_manager.execute_prepared(cur, "idempotency_abandon", (key,))
+            self._count('released')
+        except Exception as e:
+            logger.error(f"Error releasing idempotency key {key!r}: {e}")
+        finally:
+            clear_deadline(token)
+            self._finish(key)
+
+    def purge(self):
+        """Delete expired keys; returns how many were removed."""
+        try:
+            with db_manager.get_db_cursor() as (conn, cur):
+                cur.execute("DELETE FROM idempotency_keys WHERE expires_at <= now()")
+                return cur.rowcount
+        except Exception as e:
+            logger.error(f"Error purging idempotency keys: {e}")
+            raise
+
+    def _claim(self, key, fingerprint):
+        """Insert the claim row, or take over an expired or abandoned one; returns (claimed, row)."""
+        with db_manager.get_db_cursor() as (conn, cur):
+            db_manager.execute_prepared(cur, "idempotency_claim", (key, fingerprint, self.lease, self.ttl))
+            if cur.fetchone():
+                return True, None
+            db_manager.execute_prepared(cur, "idempotency_get", (key,))
+            return False, cur.fetchone()
+
+    def _replay(self, stored, fingerprint):
+        stored_fingerprint, status, body, headers = stored
+        if stored_fingerprint != fingerprint:
+            self._count('reused')
+            raise IdempotencyKeyReused("Idempotency key was used for a different request")
+        self._count('replayed')
+        return status, body, headers
+
+    def _finish(self, key):
+        with self._lock:
+            event = self._in_flight.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        recent = self._recent.stats()
+        with self._lock:
+            return {
+                'ttl': self.ttl,
+                'lease': self.lease,
+                'in_flight': len(self._in_flight),
+                'claimed': self.claimed,
+                'replayed': self.replayed,
+                'waited': self.waited,
+                'in_progress': self.in_progress,
+                'reused': self.reused,
+                'stored': self.stored,
+                'released': self.released,
+                'lost': self.lost,
+                'cached': recent['size'],
+                'cache_hits': recent['hits'],
+            }
+
+
+db_manager.register_statement(
+    "idempotency_claim",
+    "INSERT INTO idempotency_keys AS k (idempotency_key, fingerprint, locked_until, expires_at) "
+    "VALUES (%s, %s, now() + %s * interval '1 second', now() + %s * interval '1 second') "
+    "ON CONFLICT (idempotency_key) DO UPDATE SET fingerprint = EXCLUDED.fingerprint, "
+    "status_code = NULL, response_body = NULL, response_headers = NULL, applied_at = NULL, "
+    "locked_until = EXCLUDED.locked_until, expires_at = EXCLUDED.expires_at "
+    "WHERE k.expires_at <= now() "
+    "OR (k.status_code IS NULL AND k.applied_at IS NULL AND k.locked_until <= now()) "
+    "RETURNING 1",
+    ("text", "text", "double precision", "double precision"))
+db_manager.register_statement(
+    "idempotency_get",
+    "SELECT fingerprint, status_code, response_body, response_headers, "
+    "applied_at IS NOT NULL AND (locked_until IS NULL OR locked_until <= now()) FROM idempotency_keys "
+    "WHERE idempotency_key = %s",
+    ("text",))
+db_manager.register_statement(
+    "idempotency_complete",
+    "UPDATE idempotency_keys SET status_code = %s, response_body = %s, response_headers = %s, "
+    "locked_until = NULL, expires_at = now() + %s * interval '1 second' WHERE idempotency_key = %s",
+    ("integer", "text", "jsonb", "double precision", "text"))
+db_manager.register_statement(
+    "idempotency_release",
+    "DELETE FROM idempotency_keys WHERE idempotency_key = %s AND status_code IS NULL AND applied_at IS NULL",
+    ("text",))
+db_manager.register_statement(
+    "idempotency_applied",
+    "UPDATE idempotency_keys SET applied_at = now() WHERE idempotency_key = %s AND status_code IS NULL",
+    ("text",))
+db_manager.register_statement(
+    "idempotency_abandon",
+    "UPDATE idempotency_keys SET locked_until = now() WHERE idempotency_key = %s AND status_code IS NULL",
+    ("text",))
+
+# Replays POST/PUT responses to retried requests (see the idempotent view decorator)
+idempotency_store = IdempotencyStore()
+# Drops expired keys; safe to run in every worker at once
+idempotency_purge = PeriodicTask('idempotency-key-purge', idempotency_store.purge)
+
+metrics.register_collector(stats_collector('idempotency', 'Idempotency keys', idempotency_store.stats, {
+    'in_flight': 'gauge', 'claimed': 'counter', 'replayed': 'counter', 'waited': 'counter',
+    'in_progress': 'counter', 'reused': 'counter', 'stored': 'counter', 'released': 'counter', 'lost': 'counter',
+    'cached': 'gauge', 'cache_hits': 'counter',
+}))
+metrics.register_collector(stats_collector(
+    'idempotency_purge', 'Idempotency key purge', idempotency_purge.stats, {
+        'runs': 'counter', 'failures': 'counter',
+    }))
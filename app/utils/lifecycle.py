@@ -0,0 +1,23 @@
+import threading
+
+
+class Lifecycle:
+    """Process state reported by the readiness probe.
+
+    A worker starts draining when it is asked to shut down: it keeps serving
+    the requests it already accepted, but reports not-ready so the load
+    balancer stops sending new ones before the pool is closed.
+    """
+
+    def __init__(self):
+        self._draining = threading.Event()
+
+    @property
+    def draining(self):
+        return self._draining.is_set()
+
+    def start_draining(self):
+        self._draining.set()
+
+
+lifecycle = Lifecycle()
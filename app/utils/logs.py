@@ -0,0 +1,269 @@
+import atexit
+import contextvars
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+
+from app.utils.metrics import metrics, request_db_time, stats_collector
+
+log_records = metrics.counter(
+    'log_records_total',
+    'Log records by outcome: queued for the writer, dropped (queue full) or sampled_out.',
+    ('outcome',)
+)
+_queued = log_records.labels('queued')
+_dropped = log_records.labels('dropped')
+_sampled_out = log_records.labels('sampled_out')
+
+
+class _RequestContext:
+    __slots__ = ('request_id', 'method', 'route')
+
+    def __init__(self, request_id, method, route):
+        self.request_id = request_id
+        self.method = method
+        self.route = route
+
+
+_request_context = contextvars.ContextVar('log_request_context', default=None)
+
+
+class Sampler:
+    """Keeps a ``rate`` fraction of routine success logs (see ``log_sampled``)."""
+
+    def __init__(self, rate=1.0):
+        self.rate = rate
+
+    def keep(self):
+        if self.rate >= 1.0 or random.random() < self.rate:
+            return True
+        _sampled_out.inc()
+        return False
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request context and extra ``fields``."""
+
+    CONTEXT_FIELDS = ('request_id', 'method', 'route', 'db_queries', 'db_ms', 'sample_rate')
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(
+                timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for name in self.CONTEXT_FIELDS:
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Block instead of failing when the queue is full at shutdown
+        self.queue.put(self._sentinel, timeout=1.0)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the pipeline without formatting them on the calling thread."""
+
+    def __init__(self, pipeline):
+        super().__init__(None)
+        self.pipeline = pipeline
+
+    def prepare(self, record):
+        # The message is rendered by the writer thread; only what is bound to
+        # this thread is captured here: the request context and DB time so far.
+        # Arguments are formatted later, so log values rather than objects that
+        # keep changing after the call.
+        context = _request_context.get()
+        if context is not None:
+            record.request_id = context.request_id
+            record.method = context.method
+            record.route = context.route
+        totals = request_db_time.get()
+        if totals is not None and totals[0]:
+            record.db_queries = totals[0]
+            record.db_ms = round(totals[1] * 1000, 3)
+        if record.exc_info:
+            # Tracebacks reference live frames; render them now
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self.pipeline.put(record)
+
+
+class LogPipeline:
+    """Logging off the request thread: a bounded queue drained by one writer thread.
+
+    ``install`` points the root logger at a queue handler. Records that are
+    below the level are skipped before any formatting, routine ones are
+    sampled by ``log_sampled``, and the rest are queued without blocking;
+    when the queue is full they are dropped and counted. The writer thread
+    formats (JSON or plain text) and writes them. It is started per process,
+    lazily after a fork, like the connection pool.
+    """
+
+    def __init__(self):
+        self.queue_size = 10000
+        self.handler = _QueueHandler(self)
+        self.sampler = Sampler()
+        self.targets = []
+        self.queue = None
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._exit_registered = False
+
+    def install(self, level='INFO', json_format=True, queue_size=10000, sample_rate=1.0, stream=None):
+        """Route all logging through the pipeline, replacing the root logger's handlers."""
+        self.queue_size = queue_size
+        self.sampler.rate = sample_rate
+        target = logging.StreamHandler(stream or sys.stderr)
+        target.setFormatter(JsonFormatter() if json_format else logging.Formatter(logging.BASIC_FORMAT))
+        self.targets = [target]
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+        root.setLevel(level)
+        # Neither formatter prints caller, thread or process, so do not collect them
+        # per record (the optimizations listed in the logging HOWTO)
+        logging._srcfile = None
+        logging.logThreads = False
+        logging.logProcesses = False
+        logging.logMultiprocessing = False
+        self.stop()
+        self.start()
+        if not self._exit_registered:
+            # Write out what is still queued when the process exits normally
+            atexit.register(self.stop)
+            self._exit_registered = True
+
+    def start(self):
+        """Start the writer thread in this process with a fresh queue (an inherited one may hold a lock)."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(self.queue_size)
+            self._listener = _Listener(self.queue, *self.targets)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        """Write out what is queued and stop the writer thread."""
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                try:
+                    self._listener.stop()
+                except queue.Full:
+                    pass
+            self._listener = None
+            self._pid = None
+
+    def put(self, record):
+        if self._pid != os.getpid():
+            if not self.targets:
+                return
+            self.start()
+        try:
+            self.queue.put_nowait(record)
+            _queued.inc()
+        except queue.Full:
+            _dropped.inc()
+
+    def stats(self):
+        current = self.queue
+        return {
+            'queue_size': self.queue_size,
+            'queue_depth': current.qsize() if current is not None else 0,
+            'sample_rate': self.sampler.rate,
+        }
+
+
+log_pipeline = LogPipeline()
+
+
+def log_sampled(logger, msg, *args, fields=None):
+    """``logger.info`` for routine success messages, of which only LOG_SAMPLE_RATE are kept.
+
+    Level and sampling are decided before a LogRecord is built, so a
+    dropped message costs no formatting at all. ``fields`` are added to the
+    JSON output.
+    """
+    if logger.isEnabledFor(logging.INFO) and log_pipeline.sampler.keep():
+        extra = {'fields': fields}
+        if log_pipeline.sampler.rate < 1.0:
+            extra['sample_rate'] = log_pipeline.sampler.rate
+        logger.info(msg, *args, extra=extra, stacklevel=2)
+
+
+access_logger = logging.getLogger('app.access')
+
+
+def instrument_logging(app):
+    """Tag log records with the request ID and route, and log one sampled access line per request.
+
+    The request ID comes from ``X-Request-Id`` (e.g. set by nginx) or is
+    generated, and is echoed in the response. Database statements and time
+    are accumulated per request by the timed cursor.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_log():
+        rule = request.url_rule
+        request_id = request.headers.get('X-Request-Id') or uuid.uuid4().hex
+        g.log_started = time.perf_counter()
+        g.log_context_token = _request_context.set(
+            _RequestContext(request_id, request.method, rule.rule if rule is not None else 'unmatched'))
+        g.log_db_token = request_db_time.set([0, 0.0])
+
+    @app.after_request
+    def _log_request(response):
+        context = _request_context.get()
+        if context is not None:
+            response.headers['X-Request-Id'] = context.request_id
+        started = g.pop('log_started', None)
+        if started is not None:
+            status = response.status_code
+            fields = {'status': status, 'duration_ms': round((time.perf_counter() - started) * 1000, 3)}
+            if status < 400:
+                log_sampled(access_logger, "%s %s %s", request.method, request.path, status, fields=fields)
+            else:
+                access_logger.info("%s %s %s", request.method, request.path, status, extra={'fields': fields})
+        return response
+
+    @app.teardown_request
+    def _end_request_log(error):
+        token = g.pop('log_db_token', None)
+        if token is not None:
+            request_db_time.reset(token)
+        token = g.pop('log_context_token', None)
+        if token is not None:
+            _request_context.reset(token)
+
+
+metrics.register_collector(stats_collector('log', 'Logging pipeline', log_pipeline.stats, {
+    'queue_depth': 'gauge', 'queue_size': 'gauge',
+}))
@@ -0,0 +1,465 @@
+import bisect
+import contextvars
+import glob
+import json
+import os
+import re
+import threading
+import time
+
+import psycopg2.extensions
+
+from app.utils.tasks import PeriodicTask
+
+
+class _ThreadCells:
+    """Per-thread arrays of numbers, summed when metrics are collected.
+
+    Each thread only ever writes its own array, so recording a value takes
+    no lock. Arrays of threads that have exited are folded into a base array
+    on collection so thread-per-request servers do not accumulate them.
+    """
+
+    __slots__ = ('_size', '_local', '_lock', '_cells', '_retired')
+
+    def __init__(self, size):
+        self._size = size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cells = []
+        self._retired = [0] * size
+
+    def cell(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = [0] * self._size
+            with self._lock:
+                self._cells.append((threading.current_thread(), cell))
+            self._local.cell = cell
+            return cell
+
+    def totals(self):
+        with self._lock:
+            live = []
+            for thread, cell in self._cells:
+                if thread.is_alive():
+                    live.append((thread, cell))
+                else:
+                    self._retired = [a + b for a, b in zip(self._retired, cell)]
+            self._cells = live
+            totals = list(self._retired)
+        for _, cell in live:
+            totals = [a + b for a, b in zip(totals, cell)]
+        return totals
+
+
+class Counter:
+    """Monotonic counter; one child per label-value tuple."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Return the child for ``values``; label strings are only rendered on scrape."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            yield self.name, dict(zip(self.labelnames, values)), child.value()
+
+
+class _CounterChild:
+    __slots__ = ('_cells',)
+
+    def __init__(self):
+        self._cells = _ThreadCells(1)
+
+    def inc(self, amount=1):
+        self._cells.cell()[0] += amount
+
+    def value(self):
+        return self._cells.totals()[0]
+
+
+class Histogram(Counter):
+    """Histogram with fixed upper bounds, rendered as cumulative buckets."""
+
+    kind = 'histogram'
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            labels = dict(zip(self.labelnames, values))
+            yield from histogram_samples(self.name, labels, self.buckets, child.totals())
+
+
+class _HistogramChild:
+    __slots__ = ('_bounds', '_cells')
+
+    def __init__(self, bounds):
+        self._bounds = bounds
+        # One slot per bucket plus +Inf, then sum and count
+        self._cells = _ThreadCells(len(bounds) + 3)
+
+    def observe(self, value):
+        cell = self._cells.cell()
+        cell[bisect.bisect_left(self._bounds, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    def totals(self):
+        return self._cells.totals()
+
+
+def histogram_samples(name, labels, bounds, totals):
+    """Samples of a histogram from per-bucket counts followed by sum and count."""
+    cumulative = 0
+    for bound, count in zip(bounds + (float('inf'),), totals):
+        cumulative += count
+        yield f"{name}_bucket", dict(labels, le='+Inf' if bound == float('inf') else repr(float(bound))), cumulative
+    yield f"{name}_sum", labels, totals[-2]
+    yield f"{name}_count", labels, totals[-1]
+
+
+class MetricsRegistry:
+    """Metrics recorded in-process plus collectors read at scrape time.
+
+    A collector is a callable returning ``(name, kind, help, samples)``
+    tuples, where samples are ``(sample_name, labels, value)``; it is used
+    for state other components already track (pool, cache, loader).
+
+    With a ``directory`` (several server processes), every process writes
+    its samples to ``metrics_<pid>_<token>.json`` there (``flush``) and a
+    scrape of any process renders all of them: counters and histograms are
+    summed and gauges of running processes get a ``pid`` label. When a
+    process exits its file is folded into ``metrics_dead.json``
+    (``fold_process``), so totals never go backwards and the directory does
+    not grow with every restarted worker.
+    """
+
+    DEAD_FILE = 'metrics_dead.json'
+    # Folded files stay listed this long, so a scrape that read one just
+    # before it was removed does not count it twice
+    FOLDED_RETENTION = 300
+
+    def __init__(self):
+        self.enabled = True
+        self.directory = None
+        self._metrics = []
+        self._collectors = []
+        self._file_pid = None
+        self._file_name = None
+
+    def configure(self, directory=None):
+        self.directory = directory or None
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=Histogram.DEFAULT_BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        self._collectors.append(collector)
+
+    def collect(self):
+        for metric in self._metrics:
+            yield metric.name, metric.kind, metric.help, metric.samples()
+        for collector in self._collectors:
+            yield from collector()
+
+    def flush(self):
+        """Write this process's samples to its file in ``directory``, if one is configured."""
+        if not self.directory:
+            return
+        families = [[name, kind, help, [list(sample) for sample in samples]]
+                    for name, kind, help, samples in self.collect()]
+        if self._file_pid != os.getpid():
+            # A random token, so a reused pid never writes over an exited process's file
+            self._file_pid = os.getpid()
+            self._file_name = f"metrics_{self._file_pid}_{os.urandom(4).hex()}.json"
+        _write_json(os.path.join(self.directory, self._file_name), families)
+
+    def fold_process(self, pid):
+        """Fold the files of exited process ``pid`` into the dead aggregate and remove them.
+
+        Call it from one process only (the server's master, once the worker
+        has been reaped). Gauges of the exited process are dropped.
+        """
+        if not self.directory:
+            return
+        paths = glob.glob(os.path.join(self.directory, f"metrics_{pid}_*.json"))
+        if not paths:
+            return
+        dead_path = os.path.join(self.directory, self.DEAD_FILE)
+        dead = _read_json(dead_path) or {'folded': {}, 'families': []}
+        merged = {}
+        _merge_families(merged, dead['families'])
+        now = time.time()
+        folded = {name: at for name, at in dead['folded'].items() if now - at < self.FOLDED_RETENTION}
+        for path in paths:
+            families = _read_json(path)
+            if families is not None:
+                _merge_families(merged, families)
+            folded[os.path.basename(path)] = now
+        _write_json(dead_path, {'folded': folded, 'families': [
+            [name, kind, help, [list(sample) for sample in samples]]
+            for name, kind, help, samples in _merged_families(merged)
+        ]})
+        # Only once the aggregate includes them, so no scrape misses their counts
+        for path in paths:
+            os.remove(path)
+
+    def clear_directory(self):
+        """Remove the files of an earlier server run (call before workers start)."""
+        if self.directory:
+            for path in glob.glob(os.path.join(self.directory, 'metrics_*.json*')):
+                os.remove(path)
+
+    def collect_all(self):
+        """``collect`` across every process sharing ``directory`` (just this one without it)."""
+        if not self.directory:
+            yield from self.collect()
+            return
+        self.flush()
+        processes = []
+        for path in glob.glob(os.path.join(self.directory, 'metrics_*_*.json')):
+            families = _read_json(path)
+            if families is not None:
+                processes.append((os.path.basename(path), families))
+        # Read after the process files: one folded and removed meanwhile is already in it
+        dead = _read_json(os.path.join(self.directory, self.DEAD_FILE)) or {'folded': {}, 'families': []}
+        merged = {}
+        _merge_families(merged, dead['families'])
+        for name, families in processes:
+            if name in dead['folded']:
+                continue
+            pid = int(name.split('_')[1])
+            _merge_families(merged, families, pid if _process_running(pid) else None)
+        yield from _merged_families(merged)
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for name, kind, help, samples in self.collect_all():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                if labels:
+                    rendered = ','.join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+                    lines.append(f"{sample_name}{{{rendered}}} {_format(value)}")
+                else:
+                    lines.append(f"{sample_name} {_format(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _merge_families(merged, families, pid=None):
+    """Sum ``families`` into ``merged``; gauges are kept only with the ``pid`` to label them with."""
+    for name, kind, help, samples in families:
+        if kind == 'gauge' and pid is None:
+            continue
+        merged_samples = merged.setdefault(name, (kind, help, {}))[2]
+        for sample_name, labels, value in samples:
+            if not isinstance(value, (int, float)):
+                continue
+            if kind == 'gauge':
+                labels = dict(labels, pid=str(pid))
+            key = (sample_name, tuple(labels.items()))
+            merged_samples[key] = merged_samples.get(key, 0) + value
+
+
+def _merged_families(merged):
+    for name, (kind, help, samples) in merged.items():
+        yield name, kind, help, [(sample_name, dict(labels), value)
+                                 for (sample_name, labels), value in samples.items()]
+
+
+def _read_json(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    with open(f"{path}.tmp", 'w') as file:
+        json.dump(data, file)
+    # Readers see the old or the new file, never a partial one
+    os.replace(f"{path}.tmp", path)
+
+
+def _process_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+metrics = MetricsRegistry()
+# Keeps this worker's file fresh for scrapes answered by other workers
+metrics_flush = PeriodicTask('metrics-flush', metrics.flush)
+
+http_request_duration = metrics.histogram(
+    'http_request_duration_seconds', 'Time to produce the response headers, per route and status.',
+    ('method', 'route', 'status')
+)
+db_query_duration = metrics.histogram(
+    'db_query_duration_seconds', 'Time spent in cursor.execute, per statement shape.', ('statement',)
+)
+db_query_errors = metrics.counter(
+    'db_query_errors_total', 'Statements that raised an error, per statement shape.', ('statement',)
+)
+
+
+class StatementShapes:
+    """Map SQL text to a low-cardinality label.
+
+    Whitespace is collapsed, literals become ``?`` and VALUES lists are
+    elided, so statements that only differ in their data share a label.
+    Prepared statements are labelled by name. Results are memoized per
+    query string, up to ``max_shapes`` distinct shapes.
+    """
+
+    _LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+    _VALUES = re.compile(r"\bVALUES\s.*?(?=\s+(?:RETURNING|ON\s+CONFLICT)\b|$)", re.IGNORECASE | re.DOTALL)
+    _PREPARED = re.compile(r"^\s*(PREPARE|EXECUTE)\s+(\w+)", re.IGNORECASE)
+    MAX_LABEL = 200
+
+    def __init__(self, max_shapes=1000):
+        self.max_shapes = max_shapes
+        self._cache = {}
+
+    def __call__(self, query):
+        shape = self._cache.get(query)
+        if shape is not None:
+            return shape
+        text = query.decode('utf-8', 'replace') if isinstance(query, bytes) else str(query)
+        prepared = self._PREPARED.match(text)
+        if prepared:
+            shape = f"{prepared.group(1).upper()} {prepared.group(2)}"
+        else:
+            shape = self._VALUES.sub('VALUES ...', text)
+            shape = ' '.join(self._LITERALS.sub('?', shape).split())[:self.MAX_LABEL]
+        # Statements with inline data (execute_values) are not worth remembering
+        if len(self._cache) < self.max_shapes and len(text) <= 4 * self.MAX_LABEL:
+            self._cache[query] = shape
+        return shape
+
+
+statement_shape = StatementShapes()
+
+# [statements, seconds] spent in the database by the current request, when one tracks it
+request_db_time = contextvars.ContextVar('request_db_time', default=None)
+
+
+def _record_db_time(elapsed):
+    totals = request_db_time.get()
+    if totals is not None:
+        totals[0] += 1
+        totals[1] += elapsed
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """Cursor recording execute/copy latency per statement shape."""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        except Exception:
+            db_query_errors.labels(statement_shape(query)).inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            db_query_duration.labels(statement_shape(query)).observe(elapsed)
+            _record_db_time(elapsed)
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        except Exception:
+            db_query_errors.labels(statement_shape(sql)).inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            db_query_duration.labels(statement_shape(sql)).observe(elapsed)
+            _record_db_time(elapsed)
+
+
+def instrument_app(app):
+    """Record request latency per route template, method and status."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None and metrics.enabled:
+            rule = request.url_rule
+            http_request_duration.labels(
+                request.method, rule.rule if rule is not None else 'unmatched', response.status_code
+            ).observe(time.perf_counter() - started)
+        return response
+
+
+def stats_collector(name, help, stats_fn, kinds):
+    """Collector exposing numeric fields of a ``stats()`` dict.
+
+    ``kinds`` maps each exported field to 'counter' or 'gauge'; the metric
+    is named ``<name>_<field>`` (counters get a ``_total`` suffix).
+    """
+    def collect():
+        stats = stats_fn()
+        if not stats:
+            return
+        for field, kind in kinds.items():
+            if field not in stats:
+                continue
+            metric = f"{name}_{field}_total" if kind == 'counter' else f"{name}_{field}"
+            yield metric, kind, f"{help} ({field})", [(metric, {}, stats[field])]
+    return collect
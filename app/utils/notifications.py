@@ -0,0 +1,115 @@
+import logging
+import os
+import select
+import threading
+import time
+
+from psycopg2 import sql
+from app.utils.database import db_manager
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationListener:
+    """Dispatches Postgres ``LISTEN/NOTIFY`` messages to in-process callbacks.
+
+    A single dedicated (unpooled, autocommit) connection is used per process
+    and read from a daemon thread. Callbacks receive the payload string, or
+    ``None`` after a reconnect to signal that notifications may have been
+    missed.
+
+    ``subscribe`` only registers a callback, so it is safe at import time in
+    a preloading master; ``ensure_started`` opens the connection and starts
+    the thread in the calling process (e.g. gunicorn's ``post_fork``).
+    """
+
+    RECONNECT_DELAY = 1.0
+    POLL_INTERVAL = 5.0
+
+    def __init__(self, connect):
+        self._connect = connect
+        self._lock = threading.Lock()
+        self._callbacks = {}
+        self._pending_listens = set()
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+
+    def subscribe(self, channel, callback):
+        """Call ``callback(payload)`` for every notification on ``channel`` once the listener runs.
+
+        Does not connect or start anything; a listener already running in
+        this process picks the channel up on its next poll.
+        """
+        with self._lock:
+            self._callbacks.setdefault(channel, []).append(callback)
+            self._pending_listens.add(channel)
+
+    def ensure_started(self):
+        """Start the listener thread in this process if it is not running; a no-op without subscribers."""
+        with self._lock:
+            if not self._callbacks:
+                return
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stopping.clear()
+            self._pending_listens = set(self._callbacks)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="pg-notify-listener", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _run(self):
+        conn = None
+        while not self._stopping.is_set():
+            try:
+                if conn is None or conn.closed:
+                    conn = self._connect()
+                    conn.autocommit = True
+                    with self._lock:
+                        self._pending_listens = set(self._callbacks)
+                    self._dispatch_all(None)
+                self._listen_pending(conn)
+                if select.select([conn], [], [], self.POLL_INTERVAL) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    self._dispatch(notify.channel, notify.payload)
+            except Exception as error:
+                logger.error(f"Notification listener error, reconnecting: {error}")
+                if conn is not None and not conn.closed:
+                    conn.close()
+                conn = None
+                time.sleep(self.RECONNECT_DELAY)
+        if conn is not None and not conn.closed:
+            conn.close()
+
+    def _listen_pending(self, conn):
+        with self._lock:
+            channels = list(self._pending_listens)
+            self._pending_listens.clear()
+        if channels:
+            with conn.cursor() as cur:
+                for channel in channels:
+                    cur.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+
+    def _dispatch(self, channel, payload):
+        with self._lock:
+            callbacks = list(self._callbacks.get(channel, ()))
+        for callback in callbacks:
+            try:
+                callback(payload)
+            except Exception as error:
+                logger.error(f"Notification callback for {channel} failed: {error}")
+
+    def _dispatch_all(self, payload):
+        with self._lock:
+            channels = list(self._callbacks)
+        for channel in channels:
+            self._dispatch(channel, payload)
+
+
+notification_listener = NotificationListener(db_manager._open_connection)
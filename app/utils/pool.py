@@ -0,0 +1,258 @@
+import bisect
+import collections
+import threading
+import time
+
+import psycopg2.extensions
+
+
+class PoolError(Exception):
+    """Base class for connection pool errors."""
+
+
+class PoolTimeoutError(PoolError):
+    """Raised when no connection became available before the acquire timeout."""
+
+
+class PoolClosedError(PoolError):
+    """Raised when a connection is requested from a closed pool."""
+
+
+class _PooledConnection:
+    """Bookkeeping for one connection owned by the pool."""
+
+    __slots__ = ('conn', 'created_at', 'last_used')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class BoundedConnectionPool:
+    """Thread-safe connection pool with a hard upper bound.
+
+    ``getconn`` blocks for at most ``acquire_timeout`` seconds when every
+    connection is checked out and raises ``PoolTimeoutError`` instead of
+    opening extra connections. Connections are validated before reuse once
+    they have been idle for ``validate_after`` seconds, and are replaced once
+    they are older than ``max_lifetime`` seconds.
+    """
+
+    # Upper bounds (seconds) of the acquire wait-time histogram buckets
+    WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+    def __init__(self, minconn, maxconn, connect, acquire_timeout=5.0,
+                 max_lifetime=1800.0, validate_after=30.0, on_close=None):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Pool sizes must satisfy 0 <= minconn <= maxconn and maxconn >= 1")
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.acquire_timeout = acquire_timeout
+        self.max_lifetime = max_lifetime
+        self.validate_after = validate_after
+        self._connect = connect
+        self._on_close = on_close
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = collections.deque()
+        self._in_use = {}
+        # Connections owned by the pool, including ones still being opened
+        self._size = 0
+        self._waiters = 0
+        self._closed = False
+
+        self._created = 0
+        self._recycled = 0
+        self._timeouts = 0
+        self._acquired = 0
+        self._wait_counts = [0] * (len(self.WAIT_BUCKETS) + 1)
+        self._wait_sum = 0.0
+
+        for _ in range(minconn):
+            with self._lock:
+                self._size += 1
+            entry = self._open()
+            with self._lock:
+                self._idle.append(entry)
+
+    def getconn(self, timeout=None):
+        """Check out a connection, waiting at most ``timeout`` seconds."""
+        if timeout is None:
+            timeout = self.acquire_timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            entry = None
+            with self._lock:
+                self._waiters += 1
+                try:
+                    while True:
+                        if self._closed:
+                            raise PoolClosedError("Connection pool is closed")
+                        if self._idle:
+                            entry = self._idle.pop()
+                            break
+                        if self._size < self.maxconn:
+                            # Reserve a slot, the connection is opened outside the lock
+                            self._size += 1
+                            break
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._timeouts += 1
+                            raise PoolTimeoutError(
+                                f"Timed out after {timeout:.3f}s waiting for a database connection "
+                                f"({self.maxconn} in use)"
+                            )
+                        self._available.wait(remaining)
+                finally:
+                    self._waiters -= 1
+
+            if entry is None:
+                entry = self._open()
+            elif not self._is_usable(entry):
+                self._discard(entry)
+                continue
+
+            now = time.monotonic()
+            entry.last_used = now
+            with self._lock:
+                self._in_use[id(entry.conn)] = entry
+                self._record_wait(now - started)
+            return entry.conn
+
+    def putconn(self, conn, close=False):
+        """Return a connection to the pool, discarding it if it is unusable."""
+        with self._lock:
+            entry = self._in_use.pop(id(conn), None)
+        if entry is None:
+            # Not one of ours (or returned twice); make sure it does not leak
+            if not conn.closed:
+                if self._on_close:
+                    self._on_close(conn)
+                conn.close()
+            return
+
+        if not close:
+            close = self._closed or not self._reset(conn) or self._expired(entry, time.monotonic())
+        if close:
+            self._discard(entry)
+            return
+
+        entry.last_used = time.monotonic()
+        with self._lock:
+            self._idle.append(entry)
+            self._available.notify()
+
+    def closeall(self):
+        """Close idle connections and refuse new checkouts.
+
+        Connections still checked out are closed when they are returned.
+        """
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._available.notify_all()
+        for entry in idle:
+            self._discard(entry)
+
+    def load(self):
+        """Connections checked out plus callers waiting; a cheap, lock-free estimate."""
+        return len(self._in_use) + self._waiters
+
+    def stats(self):
+        """Return a snapshot of pool usage and acquire wait times."""
+        with self._lock:
+            cumulative = 0
+            histogram = {}
+            for bound, count in zip(self.WAIT_BUCKETS + (float('inf'),), self._wait_counts):
+                cumulative += count
+                histogram['+Inf' if bound == float('inf') else str(bound)] = cumulative
+            return {
+                'min': self.minconn,
+                'max': self.maxconn,
+                'size': self._size,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'waiters': self._waiters,
+                'acquired': self._acquired,
+                'created': self._created,
+                'recycled': self._recycled,
+                'timeouts': self._timeouts,
+                'wait_seconds_sum': round(self._wait_sum, 6),
+                'wait_seconds_histogram': histogram,
+                'closed': self._closed,
+            }
+
+    def _open(self):
+        """Open a connection for a slot that has already been reserved."""
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._available.notify()
+            raise
+        with self._lock:
+            self._created += 1
+        return _PooledConnection(conn)
+
+    def _discard(self, entry):
+        """Close a connection and free its slot."""
+        try:
+            if self._on_close:
+                self._on_close(entry.conn)
+            if not entry.conn.closed:
+                entry.conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._size -= 1
+            self._recycled += 1
+            self._available.notify()
+
+    def _expired(self, entry, now):
+        return self.max_lifetime is not None and now - entry.created_at >= self.max_lifetime
+
+    def _is_usable(self, entry):
+        """Check a connection taken from the idle list before handing it out."""
+        now = time.monotonic()
+        if entry.conn.closed or self._expired(entry, now):
+            return False
+        if now - entry.last_used < self.validate_after:
+            return True
+        try:
+            cur = entry.conn.cursor()
+            try:
+                cur.execute('SELECT 1')
+            finally:
+                cur.close()
+            entry.conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _reset(conn):
+        """Leave a returned connection idle, returning False if it is broken."""
+        if conn.closed:
+            return False
+        status = conn.info.transaction_status
+        if status == psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return True
+        if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        try:
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _record_wait(self, waited):
+        """Record an acquire wait time; the pool lock must be held."""
+        self._acquired += 1
+        self._wait_sum += waited
+        self._wait_counts[bisect.bisect_left(self.WAIT_BUCKETS, waited)] += 1
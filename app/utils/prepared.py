@@ -0,0 +1,92 @@
+import re
+import threading
+
+import psycopg2.errors
+
+
+class PreparedStatementRegistry:
+    """Server-side prepared statements, prepared lazily per connection.
+
+    Statements are registered once with psycopg2-style ``%s`` placeholders.
+    The first time a statement runs on a connection it is ``PREPARE``d there;
+    later runs use ``EXECUTE`` so Postgres skips parsing and planning. The
+    set of prepared names is tracked per connection and dropped when the pool
+    closes or recycles that connection, so replacements prepare again.
+    """
+
+    _PLACEHOLDER = re.compile(r'%s')
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._statements = {}
+        self._prepared = {}
+        self._counts = {}
+
+    def register(self, name, query, param_types=None):
+        """Register ``query`` under ``name``; re-registering a name is a no-op."""
+        with self._lock:
+            if name in self._statements:
+                return
+            count = 0
+
+            def number(match):
+                nonlocal count
+                count += 1
+                return f"${count}"
+
+            body = self._PLACEHOLDER.sub(number, query)
+            types = f" ({', '.join(param_types)})" if param_types else ""
+            prepare = f"PREPARE {name}{types} AS {body}"
+            execute = f"EXECUTE {name} ({', '.join(['%s'] * count)})" if count else f"EXECUTE {name}"
+            self._statements[name] = (query, prepare, execute)
+            self._counts[name] = {'prepared': 0, 'unprepared': 0, 'prepares': 0}
+
+    def is_registered(self, name):
+        return name in self._statements
+
+    def execute(self, cur, name, params=()):
+        """Run a registered statement on ``cur``, preparing it on first use."""
+        query, prepare, execute = self._statements[name]
+        counts = self._counts[name]
+        if not self.enabled:
+            cur.execute(query, params)
+            with self._lock:
+                counts['unprepared'] += 1
+            return
+
+        key = id(cur.connection)
+        with self._lock:
+            prepared = self._prepared.setdefault(key, set())
+            needs_prepare = name not in prepared
+        if needs_prepare:
+            cur.execute(prepare)
+            with self._lock:
+                prepared.add(name)
+                counts['prepares'] += 1
+        try:
+            cur.execute(execute, params)
+        except psycopg2.errors.InvalidSqlStatementName:
+            # The session lost its statements (e.g. DISCARD ALL); prepare again next time
+            self.forget(cur.connection)
+            raise
+        with self._lock:
+            counts['prepared'] += 1
+
+    def forget(self, conn):
+        """Drop bookkeeping for a connection that is being closed or reset."""
+        with self._lock:
+            self._prepared.pop(id(conn), None)
+
+    def forget_all(self):
+        """Drop bookkeeping for every connection, e.g. in a freshly forked worker."""
+        with self._lock:
+            self._prepared.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'connections': len(self._prepared),
+                'statements': {name: dict(counts) for name, counts in self._counts.items()},
+            }
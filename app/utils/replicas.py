@@ -0,0 +1,189 @@
+import contextvars
+import itertools
+import threading
+
+
+class Replica:
+    """A streaming replica, its connection pool and its last lag check."""
+
+    def __init__(self, host, port, pool):
+        self.host = host
+        self.port = port
+        self.pool = pool
+        self.lag = None
+        # Until the first lag check says otherwise, reads go to the primary
+        self.in_rotation = False
+        self.error = None
+        self.reads = 0
+
+    @property
+    def name(self):
+        return f"{self.host}:{self.port}"
+
+
+class ReplicaRouter:
+    """Picks a replica pool for read-only work.
+
+    Replicas whose replay lag exceeds ``max_lag`` seconds, that cannot be
+    reached, that are no longer in recovery or whose WAL receiver is not
+    streaming from the primary are taken out of rotation
+    until a later check finds them healthy. Lag is checked every
+    ``check_interval`` seconds by a background task of each process
+    (``replica_monitor``), never on the request path: ``choose`` only reads
+    ``in_rotation``.
+    ``selection`` is 'least_loaded' (fewest checked-out connections) or
+    'round_robin'. ``choose`` returns None when no replica is usable and the
+    caller should read from the primary.
+    """
+
+    # An idle replica has replayed all it received and reports no lag, but so
+    # does one cut off from the primary, hence the WAL receiver status (which
+    # needs superuser or pg_read_all_stats; otherwise it reads as not streaming)
+    LAG_SQL = (
+        "SELECT pg_is_in_recovery(), "
+        "coalesce((SELECT status = 'streaming' FROM pg_stat_wal_receiver), false), CASE "
+        "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+    )
+    SELECTIONS = ('least_loaded', 'round_robin')
+
+    def __init__(self, replicas, max_lag=5.0, check_interval=2.0, selection='least_loaded'):
+        if selection not in self.SELECTIONS:
+            raise ValueError(f"Unknown replica selection: {selection}")
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.selection = selection
+        self._round_robin = itertools.count()
+        self._check_lock = threading.Lock()
+        self.fallbacks = 0
+
+    def choose(self):
+        candidates = [replica for replica in self.replicas if replica.in_rotation]
+        if not candidates:
+            self.fallbacks += 1
+            return None
+        if self.selection == 'round_robin':
+            replica = candidates[next(self._round_robin) % len(candidates)]
+        else:
+            replica = min(candidates, key=lambda candidate: candidate.pool.load())
+        replica.reads += 1
+        return replica
+
+    def check_lag(self):
+        """Re-check every replica's lag; concurrent callers skip instead of waiting."""
+        if not self._check_lock.acquire(blocking=False):
+            return
+        try:
+            for replica in self.replicas:
+                self._check(replica)
+        finally:
+            self._check_lock.release()
+
+    def mark_failed(self, replica, error):
+        """Take a replica out of rotation until the next successful check."""
+        replica.in_rotation = False
+        replica.error = str(error)
+
+    def _check(self, replica):
+        try:
+            conn = replica.pool.getconn(timeout=0.5)
+        except Exception as error:
+            self.mark_failed(replica, error)
+            return
+        close = False
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute(self.LAG_SQL)
+                in_recovery, streaming, lag = cur.fetchone()
+            finally:
+                cur.close()
+            conn.rollback()
+        except Exception as error:
+            close = True
+            self.mark_failed(replica, error)
+            return
+        finally:
+            replica.pool.putconn(conn, close=close)
+
+        replica.lag = float(lag) if lag is not None else None
+        if not in_recovery:
+            self.mark_failed(replica, "Not in recovery (promoted or not a replica)")
+        elif not streaming:
+            self.mark_failed(replica, "WAL receiver not streaming from the primary")
+        elif replica.lag is None or replica.lag > self.max_lag:
+            self.mark_failed(replica, f"Replay lag {replica.lag}s exceeds {self.max_lag}s")
+        else:
+            replica.in_rotation = True
+            replica.error = None
+
+    def stats(self):
+        return {
+            'selection': self.selection,
+            'max_lag': self.max_lag,
+            'primary_fallbacks': self.fallbacks,
+            'replicas': [
+                {
+                    'name': replica.name,
+                    'in_rotation': replica.in_rotation,
+                    'lag_seconds': replica.lag,
+                    'error': replica.error,
+                    'reads': replica.reads,
+                    'pool': replica.pool.stats(),
+                }
+                for replica in self.replicas
+            ],
+        }
+
+
+class _RequestRouting:
+    """Routing state of one request: whether it wrote, and the replica it reads from."""
+
+    __slots__ = ('wrote', 'replica')
+
+    def __init__(self):
+        self.wrote = False
+        self.replica = None
+
+
+_routing = contextvars.ContextVar('request_routing', default=None)
+
+
+def begin_request():
+    """Start tracking routing for the current request; returns a token for ``end_request``.
+
+    Within a request every read goes to the same replica, so values read
+    early (such as a version used for an ETag) are never newer than the
+    data read after them. Once the request has written, reads go to the
+    primary.
+    """
+    return _routing.set(_RequestRouting())
+
+
+def end_request(token):
+    _routing.reset(token)
+
+
+def mark_write():
+    routing = _routing.get()
+    if routing is not None:
+        routing.wrote = True
+
+
+def reads_use_primary():
+    """True when the current request has written and must read its own writes."""
+    routing = _routing.get()
+    return routing is not None and routing.wrote
+
+
+def pinned_replica():
+    """The replica this request already read from, or None."""
+    routing = _routing.get()
+    return routing.replica if routing is not None else None
+
+
+def pin_replica(replica):
+    routing = _routing.get()
+    if routing is not None:
+        routing.replica = replica
@@ -0,0 +1,71 @@
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """Runs ``task()`` every ``interval`` seconds on a daemon thread of the current process.
+
+    ``start`` is fork-aware, like the notification listener: call it again
+    in a forked worker and the thread is started there. Failures are logged
+    and retried on the next tick.
+    """
+
+    def __init__(self, name, task, interval=0.0):
+        self.name = name
+        self.task = task
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+        self.runs = 0
+        self.failures = 0
+        self.last_result = None
+        self.last_error = None
+
+    def configure(self, interval=None):
+        if interval is not None:
+            self.interval = interval
+
+    def start(self):
+        """Start the thread in this process; a no-op when disabled or already running."""
+        with self._lock:
+            if self.interval <= 0:
+                return
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stopping.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self.run_once()
+
+    def run_once(self):
+        try:
+            self.last_result = self.task()
+            self.last_error = None
+        except Exception as error:
+            self.failures += 1
+            self.last_error = str(error)
+            logger.error(f"{self.name} failed: {error}")
+        finally:
+            self.runs += 1
+        return self.last_result
+
+    def stats(self):
+        return {
+            'interval': self.interval,
+            'runs': self.runs,
+            'failures': self.failures,
+            'last_result': self.last_result,
+            'last_error': self.last_error,
+        }
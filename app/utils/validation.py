@@ -0,0 +1,134 @@
+import re
+
+
+class Field:
+    """Declarative rules for one input field.
+
+    ``type`` is ``str`` or ``int``; integers also accept numeric strings and
+    whole floats and are normalized to ``int``. ``pattern`` is a regular
+    expression the whole value must match, reported as ``pattern_error``.
+    """
+
+    def __init__(self, name, type, required=False, nullable=True, max_length=None,
+                 min_value=None, max_value=None, pattern=None, pattern_error=None, range_error=None):
+        self.name = name
+        self.type = type
+        self.required = required
+        self.nullable = nullable
+        self.max_length = max_length
+        self.min_value = min_value
+        self.max_value = max_value
+        self.pattern = re.compile(pattern) if isinstance(pattern, str) else pattern
+        self.label = name.capitalize()
+        self.pattern_error = pattern_error or f"Invalid {name} format"
+        self.range_error = range_error or f"{self.label} must be between {min_value} and {max_value}"
+
+    def compile(self):
+        """Return ``check(value) -> (value, error)`` with every rule bound up front."""
+        if self.type is str:
+            return self._compile_str()
+        if self.type is int:
+            return self._compile_int()
+        raise ValueError(f"Unsupported field type for {self.name}: {self.type!r}")
+
+    def _compile_str(self):
+        label, max_length = self.label, self.max_length
+        match = self.pattern.fullmatch if self.pattern else None
+        type_error = f"{label} must be a string"
+        length_error = f"{label} must be at most {max_length} characters"
+        pattern_error = self.pattern_error
+
+        def check(value):
+            if type(value) is not str:
+                return None, type_error
+            if max_length is not None and len(value) > max_length:
+                return None, length_error
+            if match is not None and match(value) is None:
+                return None, pattern_error
+            return value, None
+        return check
+
+    def _compile_int(self):
+        low = self.min_value if self.min_value is not None else float('-inf')
+        high = self.max_value if self.max_value is not None else float('inf')
+        type_error = f"{self.label} must be a valid number"
+        range_error = self.range_error
+
+        def check(value):
+            if type(value) is not int:
+                if isinstance(value, float) and value.is_integer():
+                    value = int(value)
+                elif isinstance(value, str):
+                    try:
+                        value = int(value.strip())
+                    except ValueError:
+                        return None, type_error
+                else:
+                    # bool is an int subclass but never a valid number here
+                    return None, type_error
+            if not low <= value <= high:
+                return None, range_error
+            return value, None
+        return check
+
+
+class Schema:
+    """A set of Fields compiled once into a single-pass validator.
+
+    ``validate`` walks the fields once, normalizing values and collecting
+    every error instead of stopping at the first. Only declared fields are
+    returned; unknown ones are ignored or, with ``reject_unknown``, reported.
+    """
+
+    def __init__(self, *fields):
+        self.fields = fields
+        self.names = tuple(field.name for field in fields)
+        self._known = frozenset(self.names)
+        self._default_required = frozenset(field.name for field in fields if field.required)
+        self._steps = tuple(
+            (field.name, field.nullable, f"{field.label} is required", field.compile()) for field in fields
+        )
+
+    def validate(self, data, required=None, partial=False, reject_unknown=False):
+        """Validate one record, returning (values, errors).
+
+        ``required`` overrides which fields must be present and non-empty
+        (default: those declared required). With ``partial`` they are only
+        required when the key is sent, i.e. they may be changed but not
+        cleared. Absent fields are left out of ``values``.
+        """
+        if not isinstance(data, dict):
+            return None, ["Record must be a JSON object"]
+        required = self._default_required if required is None else required
+        values = {}
+        errors = []
+        if reject_unknown:
+            unknown = data.keys() - self._known
+            if unknown:
+                errors.extend(f"Unknown field: {name}" for name in sorted(unknown))
+        for name, nullable, required_error, check in self._steps:
+            if name not in data:
+                if name in required and not partial:
+                    errors.append(required_error)
+                continue
+            value = data[name]
+            if value is None or value == '':
+                if name in required:
+                    errors.append(required_error)
+                    continue
+                if value is None:
+                    # null clears a nullable field; otherwise it counts as not sent
+                    if nullable:
+                        values[name] = None
+                    continue
+            value, error = check(value)
+            if error:
+                errors.append(error)
+            else:
+                values[name] = value
+        return values, errors
+
+    def validate_many(self, records, required=None, partial=False, reject_unknown=False):
+        """Validate a batch of records; returns a list of (values, errors) aligned with ``records``."""
+        validate = self.validate
+        return [validate(record, required, partial, reject_unknown) for record in records]
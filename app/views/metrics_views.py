@@ -0,0 +1,19 @@
+from flask import Blueprint, Response
+from app.utils.metrics import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Served at the root so Prometheus can scrape the default /metrics path
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition of request, query, pool and cache metrics."""
+    if not metrics.enabled:
+        return {'error': 'Metrics disabled'}, 404
+    try:
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+    except Exception as e:
+        logger.error(f"Unexpected error rendering metrics: {e}")
+        return {'error': 'Internal server error'}, 500
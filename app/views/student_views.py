@@ -1,44 +1,665 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, g, make_response, request, jsonify, url_for
 from app.controllers.student_controller import StudentController
+from app.models.student import student_writer
+from app.utils.admission import admission_controller, rate_limiter
+from app.utils.cache import cache_manager
+from app.utils.database import db_manager
+from app.utils.deadline import clear_deadline, current_deadline, start_deadline
+from app.utils.idempotency import (IdempotencyKeyInProgress, IdempotencyKeyReused, IdempotencyOutcomeLost,
+                                   bind_key, idempotency_store, unbind_key)
+from app.utils.lifecycle import lifecycle
+from app.utils.replicas import begin_request, end_request
+import functools
+import hashlib
+import ipaddress
+import json
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
 # Create blueprint for student routes
 student_bp = Blueprint('students', __name__, url_prefix='/api/v1')
 
+# Endpoints that answer even when the API is shedding load
+ADMISSION_EXEMPT = {
+    'students.healthcheck', 'students.liveness', 'students.readiness',
+    'students.pool_stats', 'students.prepared_stats', 'students.cache_stats',
+    'students.admission_stats', 'students.replica_stats', 'students.write_stats'
+}
+RETRY_AFTER_SECONDS = 1
+
+# Database time budget per request; the X-Request-Timeout-Ms header may lower it.
+# Exports stream the whole table from a helper thread and are not bounded.
+DEFAULT_TIMEOUT_MS = 5000
+MAX_TIMEOUT_MS = 30000
+ROUTE_TIMEOUTS_MS = {
+    'students.export_students': None,
+    'students.bulk_create_students': 60000,
+    # Rescans the table; the regular stats path reads a few summary rows
+    'students.rebuild_student_stats': 60000,
+}
+
+# Networks of the reverse proxies whose X-Real-IP header is believed
+TRUSTED_PROXIES = ()
+
+def configure_trusted_proxies(proxies):
+    """Set the trusted proxies from addresses or CIDR networks (e.g. "10.0.0.5,172.18.0.0/16")."""
+    global TRUSTED_PROXIES
+    TRUSTED_PROXIES = tuple(ipaddress.ip_network(proxy.strip(), strict=False)
+                            for proxy in proxies.split(',') if proxy.strip())
+
+def configure_timeouts(default_ms=None, max_ms=None):
+    global DEFAULT_TIMEOUT_MS, MAX_TIMEOUT_MS
+    if default_ms is not None:
+        DEFAULT_TIMEOUT_MS = default_ms
+    if max_ms is not None:
+        MAX_TIMEOUT_MS = max_ms
+
+@student_bp.before_request
+def start_request_deadline():
+    """Start the request deadline from the header or the route's default."""
+    if request.endpoint in ADMISSION_EXEMPT:
+        return None
+    timeout_ms = ROUTE_TIMEOUTS_MS.get(request.endpoint, DEFAULT_TIMEOUT_MS)
+    header = request.headers.get('X-Request-Timeout-Ms')
+    if header is not None:
+        try:
+            requested = int(header)
+        except ValueError:
+            return jsonify({'error': 'X-Request-Timeout-Ms must be an integer'}), 400
+        if requested <= 0:
+            return jsonify({'error': 'X-Request-Timeout-Ms must be positive'}), 400
+        timeout_ms = min(requested, timeout_ms or MAX_TIMEOUT_MS, MAX_TIMEOUT_MS)
+    g.deadline_timeout = timeout_ms / 1000 if timeout_ms else None
+    g.deadline_token = start_deadline(g.deadline_timeout)
+    # Reads after a write in this request go to the primary
+    g.routing_token = begin_request()
+    return None
+
+def _client_key():
+    """Client identity for rate limiting.
+
+    nginx passes the peer address as X-Real-IP; it is only believed from a
+    trusted proxy, or any client could pick a fresh bucket per request.
+    """
+    remote = request.remote_addr
+    if TRUSTED_PROXIES and remote:
+        try:
+            address = ipaddress.ip_address(remote)
+        except ValueError:
+            return remote
+        if any(address in network for network in TRUSTED_PROXIES):
+            return request.headers.get('X-Real-IP') or remote
+    return remote
+
+@student_bp.before_request
+def admit_request():
+    """Rate-limit per client, then wait briefly for a slot or shed with 503."""
+    if request.endpoint in ADMISSION_EXEMPT:
+        return None
+    if rate_limiter.enabled:
+        allowed, retry_after = rate_limiter.allow(_client_key())
+        if not allowed:
+            response = jsonify({'error': 'Rate limit exceeded'})
+            response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+            return response, 429
+    if not admission_controller.enabled:
+        return None
+    if not admission_controller.acquire():
+        response = jsonify({'error': 'Server busy, retry later'})
+        response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+        return response, 503
+    g.admission_slot = True
+    return None
+
+@student_bp.after_request
+def release_on_close(response):
+    """Hold the slot until the response is fully sent (streams keep a DB connection)."""
+    if g.pop('admission_slot', False):
+        response.call_on_close(admission_controller.release)
+    return response
+
+@student_bp.after_request
+def deadline_response(response):
+    """Answer 504 when the deadline cancelled database work, whatever the view made of it.
+
+    Registered after release_on_close so it runs first (after_request
+    functions run in reverse) and the slot is attached to the final response.
+    """
+    deadline = current_deadline()
+    if deadline is not None and deadline.exceeded:
+        logger.error(f"Request deadline exceeded ({deadline.exceeded}): {request.method} {request.path}")
+        timeout_response = jsonify({'error': 'Request deadline exceeded', 'stage': deadline.exceeded})
+        timeout_response.status_code = 504
+        return timeout_response
+    return response
+
+@student_bp.teardown_request
+def release_on_error(error):
+    # after_request does not run when a view raises, release the slot here instead
+    if g.pop('admission_slot', False):
+        admission_controller.release()
+    token = g.pop('deadline_token', None)
+    if token is not None:
+        clear_deadline(token)
+    token = g.pop('routing_token', None)
+    if token is not None:
+        end_request(token)
+
 @student_bp.route('/healthcheck', methods=['GET'])
 def healthcheck():
     """Health check endpoint."""
     return jsonify({'status': 'ok'}), 200
 
+@student_bp.route('/health/live', methods=['GET'])
+def liveness():
+    """Liveness probe: the worker is up and serving; never touches the database."""
+    return jsonify({'status': 'ok'}), 200
+
+@student_bp.route('/health/ready', methods=['GET'])
+def readiness():
+    """Readiness probe: not shutting down and the connection pool can reach Postgres."""
+    if lifecycle.draining:
+        return jsonify({'status': 'draining'}), 503
+    ready, error = db_manager.is_ready()
+    if not ready:
+        logger.error(f"Readiness check failed: {error}")
+        return jsonify({'status': 'unavailable', 'error': error}), 503
+    return jsonify({'status': 'ready', 'pool': db_manager.pool_stats()}), 200
+
+@student_bp.route('/pool/stats', methods=['GET'])
+def pool_stats():
+    """Connection pool statistics (in use, idle, waiters, acquire wait times)."""
+    stats = db_manager.pool_stats()
+    if stats is None:
+        return jsonify({'error': 'Connection pool not initialized'}), 503
+    return jsonify(stats), 200
+
+@student_bp.route('/replicas/stats', methods=['GET'])
+def replica_stats():
+    """Read replica rotation, replay lag and pool statistics."""
+    stats = db_manager.replica_stats()
+    if stats is None:
+        return jsonify({'error': 'No read replicas configured'}), 404
+    return jsonify(stats), 200
+
+@student_bp.route('/writes/stats', methods=['GET'])
+def write_stats():
+    """Write coalescing statistics (batches, batch sizes, time spent waiting)."""
+    return jsonify(student_writer.stats()), 200
+
+@student_bp.route('/prepared/stats', methods=['GET'])
+def prepared_stats():
+    """Which statements ran as server-side prepared statements, and how often."""
+    return jsonify(db_manager.prepared_stats()), 200
+
+@student_bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Student cache statistics (hits, misses, evictions, size)."""
+    stats = cache_manager.stats()
+    if stats is None:
+        return jsonify({'error': 'Cache disabled'}), 404
+    return jsonify(stats), 200
+
+@student_bp.route('/admission/stats', methods=['GET'])
+def admission_stats():
+    """Admission control (active, queued, shed) and rate limiter statistics."""
+    return jsonify(dict(admission_controller.stats(), rate_limit=rate_limiter.stats())), 200
+
+def _int_arg(name, minimum=None, maximum=None):
+    """Parse an optional integer query argument, returning (value, error)."""
+    raw = request.args.get(name)
+    if raw is None or raw == '':
+        return None, None
+    try:
+        value = int(raw)
+    except ValueError:
+        return None, f"{name} must be an integer"
+    if minimum is not None and value < minimum:
+        return None, f"{name} must be at least {minimum}"
+    if maximum is not None and value > maximum:
+        return None, f"{name} must be at most {maximum}"
+    return value, None
+
+_ROW_ETAG = re.compile(r'^s(\d+)-v(\d+)$')
+
+def _row_etag(student_id, version):
+    """Strong ETag of one student: its ID and row version, no body hashing needed."""
+    return f"s{student_id}-v{version}"
+
+def _collection_etag(table_version):
+    """Strong ETag of a listing: the table's change counter plus a digest of the query string."""
+    digest = hashlib.sha1(repr(sorted(request.args.items(multi=True))).encode()).hexdigest()[:16]
+    return f"t{table_version}-{digest}"
+
+def _rows_etag(students):
+    """Strong ETag of a set of students: a digest of the returned rows' IDs and versions and the missing IDs."""
+    rows = [(student['id'], student.get('version')) for student in students['data']]
+    digest = hashlib.sha1(repr((rows, students['missing'])).encode()).hexdigest()[:16]
+    return f"r{digest}"
+
+def _not_modified(etag):
+    """304 response when If-None-Match already holds ``etag``, else None."""
+    if etag is None or not request.if_none_match.contains_weak(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+def _expected_version(student_id):
+    """Row version required by If-Match, returning (version, error).
+
+    The version is None without the header or with ``If-Match: *``. Tags
+    that do not name this student can never match and are an error (412).
+    """
+    if_match = request.if_match
+    if not if_match or if_match.star_tag:
+        return None, None
+    for tag in if_match:
+        match = _ROW_ETAG.match(tag)
+        if match and int(match.group(1)) == student_id:
+            return int(match.group(2)), None
+    return None, "Version mismatch"
+
+def _with_row_etag(student, status):
+    response = jsonify(student)
+    if student.get('version') is not None:
+        response.set_etag(_row_etag(student['id'], student['version']))
+    return response, status
+
+def _decode_cursor(query, token):
+    """Decode a page cursor for ``query``, returning (key, error)."""
+    try:
+        return query.decode_cursor(token), None
+    except ValueError as e:
+        return None, str(e)
+
 @student_bp.route('/students', methods=['GET'])
 def get_students():
-    """Get all students."""
+    """Get students.
+
+    With ``ids=1,2,3`` the given students are fetched in one batched query.
+    With ``after_id`` and/or ``limit`` a keyset page is returned together with
+    a link to the next page. Without them the whole table is streamed as a
+    JSON array, read from the database in chunks. ``serialize=db`` has
+    Postgres render the JSON, which is passed through as bytes.
+
+    ``fields``, ``age_min``, ``age_max``, ``email``, ``name_prefix`` and
+    ``sort`` (e.g. ``-age``) are compiled into the SQL query itself.
+
+    Every listing carries an ETag derived from the table's change counter,
+    read before the data; a matching If-None-Match gets 304 after that one
+    query. ``ids`` responses are partly served from the per-worker cache, so
+    their ETag is derived from the versions of the rows actually returned.
+    """
     try:
-        students, error = StudentController.get_all_students()
+        if 'ids' in request.args:
+            try:
+                student_ids = list(dict.fromkeys(int(part) for part in request.args['ids'].split(',') if part.strip()))
+            except ValueError:
+                return jsonify({'error': 'ids must be a comma-separated list of integers'}), 400
+            if not student_ids or len(student_ids) > StudentController.MAX_BATCH_IDS:
+                return jsonify({'error': f'ids must contain between 1 and {StudentController.MAX_BATCH_IDS} IDs'}), 400
+            students, error = StudentController.get_students_by_ids(student_ids)
+            if error:
+                return jsonify({'error': error}), 500
+            etag = _rows_etag(students)
+            not_modified = _not_modified(etag)
+            if not_modified:
+                return not_modified
+            response = jsonify(students)
+            response.set_etag(etag)
+            return response, 200
+
+        etag = None
+        table_version, error = StudentController.get_students_version()
+        if not error:
+            etag = _collection_etag(table_version)
+            not_modified = _not_modified(etag)
+            if not_modified:
+                return not_modified
+
+        serialize = request.args.get('serialize', 'python')
+        if serialize not in StudentController.SERIALIZATION_MODES:
+            return jsonify({'error': "serialize must be 'python' or 'db'"}), 400
+        query, error = StudentController.build_query(request.args)
+        if error:
+            return jsonify({'error': error}), 400
+
+        if not any(arg in request.args for arg in ('after_id', 'cursor', 'limit')):
+            chunks, error = StudentController.stream_all_students(query, serialize)
+            if error:
+                return jsonify({'error': error}), 500
+            response = Response(chunks, status=200, mimetype='application/json')
+            if etag:
+                response.set_etag(etag)
+            return response
+
+        after = None
+        after_id, error = _int_arg('after_id', minimum=0)
+        if not error:
+            limit, error = _int_arg('limit', minimum=1, maximum=StudentController.MAX_PAGE_SIZE)
+        if not error and after_id is not None:
+            if query.sort_column != 'id':
+                error = 'after_id only applies when sorting by id; use cursor'
+            after = (after_id, after_id)
+        if not error and request.args.get('cursor'):
+            after, error = _decode_cursor(query, request.args['cursor'])
+        if error:
+            return jsonify({'error': error}), 400
+
+        limit = limit or StudentController.DEFAULT_PAGE_SIZE
+        page, error = StudentController.get_students_page(query, after, limit, serialize)
         if error:
             return jsonify({'error': error}), 500
-        return jsonify(students), 200
+
+        # Default ordering keeps the plain after_id cursor, other sorts get an opaque token
+        next_key = page.pop('next_key')
+        next_args = {k: v for k, v in request.args.items() if k not in ('after_id', 'cursor')}
+        next_args['limit'] = limit
+        if query.sort_column == 'id':
+            page['next_after_id'] = next_key[1] if next_key else None
+            next_args['after_id'] = page['next_after_id']
+        else:
+            page['next_cursor'] = query.encode_cursor(next_key) if next_key else None
+            next_args['cursor'] = page['next_cursor']
+        page['next'] = url_for('students.get_students', **next_args) if next_key else None
+
+        if 'data_json' in page:
+            # Splice the database-rendered array in without decoding it
+            data_json = page.pop('data_json')
+            body = b''.join((b'{"data":', data_json, b',', json.dumps(page).encode()[1:]))
+            response = Response(body, status=200, mimetype='application/json')
+        else:
+            response = jsonify(page)
+        if page['next']:
+            response.headers['Link'] = f'<{page["next"]}>; rel="next"'
+        if etag:
+            response.set_etag(etag)
+        return response, 200
     except Exception as e:
         logger.error(f"Unexpected error in get_students: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@student_bp.route('/students/search', methods=['GET'])
+def search_students():
+    """Search students by partial name or email.
+
+    ``q`` is required; ``limit`` caps the results and ``mode=prefix`` only
+    matches the beginning of name or email.
+    """
+    try:
+        term = (request.args.get('q') or '').strip()
+        if not term or len(term) > 100:
+            return jsonify({'error': 'q must be between 1 and 100 characters'}), 400
+        mode = request.args.get('mode', 'fuzzy')
+        if mode not in ('fuzzy', 'prefix'):
+            return jsonify({'error': "mode must be 'fuzzy' or 'prefix'"}), 400
+        limit, error = _int_arg('limit', minimum=1, maximum=StudentController.MAX_SEARCH_LIMIT)
+        if error:
+            return jsonify({'error': error}), 400
+
+        results, error = StudentController.search_students(term, limit, prefix=(mode == 'prefix'))
+        if error:
+            return jsonify({'error': error}), 500
+        return jsonify(results), 200
+    except Exception as e:
+        logger.error(f"Unexpected error in search_students: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@student_bp.route('/students/changes', methods=['GET'])
+def get_student_changes():
+    """Students changed since a cursor, for incremental sync.
+
+    Without ``since`` only the current ``cursor`` is returned. With it, up
+    to ``limit`` log entries after the cursor come back compacted to one
+    upsert or delete per student, with the cursor to resume from and
+    ``has_more``. ``wait=<seconds>`` long-polls: when nothing has changed yet
+    the request waits for a ``NOTIFY`` from the change log triggers instead
+    of returning an empty delta. A cursor older than the log's retention
+    answers 410 and the consumer must resynchronize from a full listing.
+    """
+    try:
+        since, error = _int_arg('since', minimum=0)
+        if not error:
+            limit, error = _int_arg('limit', minimum=1, maximum=StudentController.MAX_CHANGES_LIMIT)
+        if not error:
+            wait, error = _int_arg('wait', minimum=0, maximum=StudentController.MAX_CHANGES_WAIT)
+        if error:
+            return jsonify({'error': error}), 400
+
+        feed, error = StudentController.get_changes(since, limit)
+        if not error and since is not None and wait and not feed['changes']:
+            feed, error = _long_poll_changes(since, limit, wait)
+        if error:
+            if error == "Cursor expired":
+                return jsonify({'error': 'Cursor expired, resynchronize from a full listing'}), 410
+            return jsonify({'error': error}), 500
+        return jsonify(feed), 200
+    except Exception as e:
+        logger.error(f"Unexpected error in get_student_changes: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+def _long_poll_changes(since, limit, wait):
+    """Wait for a change after ``since``, then read again; returns (feed, error).
+
+    The admission slot is given back while waiting, so idle long-polls do not
+    shed other requests, and the request deadline restarts for the second
+    read since it bounds database work, not the wait.
+    """
+    empty = {'changes': [], 'cursor': since, 'has_more': False}
+    holds_slot = g.pop('admission_slot', False)
+    if holds_slot:
+        admission_controller.release()
+    woken = StudentController.wait_for_changes(since, wait, interrupted=lambda: lifecycle.draining)
+    if holds_slot:
+        if not admission_controller.acquire():
+            # Too busy to read now; the consumer simply polls again from the same cursor
+            return empty, None
+        g.admission_slot = True
+    if not woken:
+        return empty, None
+    clear_deadline(g.pop('deadline_token'))
+    g.deadline_token = start_deadline(g.deadline_timeout)
+    return StudentController.get_changes(since, limit)
+
+def _stats_args():
+    """Parse ``age_buckets`` and ``domains``; returns (age_buckets, domain_limit, error)."""
+    age_buckets = None
+    if request.args.get('age_buckets'):
+        try:
+            age_buckets = [int(part) for part in request.args['age_buckets'].split(',') if part.strip()]
+        except ValueError:
+            return None, None, 'age_buckets must be a comma-separated list of integers'
+        if not age_buckets or len(age_buckets) > StudentController.MAX_AGE_BUCKETS:
+            return None, None, f'age_buckets must contain between 1 and {StudentController.MAX_AGE_BUCKETS} edges'
+        if any(low >= high for low, high in zip(age_buckets, age_buckets[1:])):
+            return None, None, 'age_buckets must be strictly increasing'
+    domain_limit, error = _int_arg('domains', minimum=1, maximum=StudentController.MAX_STATS_DOMAINS)
+    return age_buckets, domain_limit, error
+
+@student_bp.route('/students/stats', methods=['GET'])
+def student_stats():
+    """Roster statistics: total, age histogram, min/max/avg age and top email domains.
+
+    Served from summary counts that triggers keep current, so the cost does
+    not grow with the table. ``age_buckets=18,25,35`` sets the histogram's
+    bucket edges and ``domains`` how many email domains to list. Responses
+    carry the listing ETag.
+    """
+    try:
+        if 'refresh' in request.args:
+            return jsonify({'error': 'refresh moved to POST /api/v1/students/stats/rebuild'}), 400
+        age_buckets, domain_limit, error = _stats_args()
+        if error:
+            return jsonify({'error': error}), 400
+
+        etag = None
+        table_version, error = StudentController.get_students_version()
+        if not error:
+            etag = _collection_etag(table_version)
+            not_modified = _not_modified(etag)
+            if not_modified:
+                return not_modified
+
+        stats, error = StudentController.get_student_stats(age_buckets, domain_limit)
+        if error:
+            return jsonify({'error': error}), 500
+        response = jsonify(stats)
+        if etag:
+            response.set_etag(etag)
+        return response, 200
+    except Exception as e:
+        logger.error(f"Unexpected error in student_stats: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@student_bp.route('/students/stats/rebuild', methods=['POST'])
+def rebuild_student_stats():
+    """Recompute the statistics summary from the students table and report any drift.
+
+    Writers wait while it runs, so rebuilds are throttled across all workers
+    (STATS_REBUILD_MIN_INTERVAL): a request arriving too soon, or while
+    another rebuild runs, gets 429 with Retry-After. Accepts the same
+    ``age_buckets`` and ``domains`` as GET /students/stats.
+    """
+    try:
+        age_buckets, domain_limit, error = _stats_args()
+        if error:
+            return jsonify({'error': error}), 400
+        stats, error = StudentController.rebuild_student_stats(age_buckets, domain_limit)
+        if error:
+            if error == "Rebuild throttled":
+                response = jsonify({'error': 'Statistics were rebuilt recently or a rebuild is running'})
+                response.headers['Retry-After'] = str(stats['retry_after'])
+                return response, 429
+            return jsonify({'error': error}), 500
+        return jsonify(stats), 200
+    except Exception as e:
+        logger.error(f"Unexpected error in rebuild_student_stats: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+EXPORT_MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+@student_bp.route('/students/export', methods=['GET'])
+def export_students():
+    """Export all students as CSV or NDJSON, streamed straight from COPY.
+
+    The body is gzip-compressed when the client sends ``Accept-Encoding: gzip``.
+    """
+    try:
+        fmt = request.args.get('format', 'csv')
+        if fmt not in EXPORT_MIMETYPES:
+            return jsonify({'error': "format must be 'csv' or 'ndjson'"}), 400
+
+        gzip = 'gzip' in request.accept_encodings
+        chunks, error = StudentController.export_students(fmt, gzip=gzip)
+        if error:
+            return jsonify({'error': error}), 500
+
+        response = Response(chunks, status=200, mimetype=EXPORT_MIMETYPES[fmt])
+        response.headers['Content-Disposition'] = f'attachment; filename=students.{fmt}'
+        response.headers['Vary'] = 'Accept-Encoding'
+        if gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+        return response
+    except Exception as e:
+        logger.error(f"Unexpected error in export_students: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @student_bp.route('/students/<int:student_id>', methods=['GET'])
 def get_student(student_id):
-    """Get student by ID."""
+    """Get student by ID.
+
+    With If-None-Match only the row version is read; a match answers 304.
+    """
     try:
+        if request.if_none_match:
+            version, error = StudentController.get_student_version(student_id)
+            if not error:
+                not_modified = _not_modified(_row_etag(student_id, version))
+                if not_modified:
+                    return not_modified
         student, error = StudentController.get_student_by_id(student_id)
         if error:
             if error == "Student not found":
                 return jsonify({'error': error}), 404
             return jsonify({'error': error}), 500
-        return jsonify(student), 200
+        return _with_row_etag(student, 200)
     except Exception as e:
         logger.error(f"Unexpected error in get_student: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# Response headers replayed along with the stored status and body
+REPLAYED_HEADERS = ('Content-Type', 'ETag', 'Location')
+
+def _request_fingerprint():
+    """Digest of what makes a request the same request: method, path, If-Match and body."""
+    digest = hashlib.sha256()
+    for part in (request.method, request.full_path, request.headers.get('If-Match', '')):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+def idempotent(view):
+    """Make a write view safe to retry with an ``Idempotency-Key`` header.
+
+    The first request with a key runs the view; a successful response is
+    stored and every retry gets it back (with ``Idempotent-Replayed: true``)
+    without touching ``students``. Concurrent duplicates wait for the first
+    one's result, up to 409 if it takes too long. Reusing a key for another
+    request is 422. Failed requests are not stored, so a retry runs again,
+    unless the request had already committed its write: then retries get
+    409 rather than writing twice.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return view(*args, **kwargs)
+        if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return jsonify({'error': f'Idempotency-Key must be 1 to {IDEMPOTENCY_KEY_MAX_LENGTH} characters'}), 400
+        fingerprint = _request_fingerprint()
+        try:
+            stored = idempotency_store.begin(key, fingerprint)
+        except IdempotencyKeyReused:
+            return jsonify({'error': 'Idempotency-Key was already used for a different request'}), 422
+        except IdempotencyKeyInProgress:
+            response = jsonify({'error': 'A request with this Idempotency-Key is still in progress'})
+            response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+            return response, 409
+        except IdempotencyOutcomeLost:
+            return jsonify({'error': 'The request with this Idempotency-Key was applied but its response was '
+                                     'lost; fetch the current state instead of retrying'}), 409
+        except Exception as e:
+            logger.error(f"Unexpected error claiming idempotency key: {e}")
+            return jsonify({'error': 'Internal server error'}), 500
+        if stored is not None:
+            status, body, headers = stored
+            response = Response(body, status=status, headers=headers)
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+        response = None
+        token = bind_key(key)
+        try:
+            response = make_response(view(*args, **kwargs))
+        finally:
+            unbind_key(token)
+            deadline = current_deadline()
+            if response is not None and response.status_code < 400 and not (deadline and deadline.exceeded):
+                headers = {name: response.headers[name] for name in REPLAYED_HEADERS if name in response.headers}
+                idempotency_store.complete(key, fingerprint, response.status_code,
+                                           response.get_data(as_text=True), headers)
+            else:
+                idempotency_store.release(key)
+        return response
+    return wrapper
+
 @student_bp.route('/students', methods=['POST'])
+@idempotent
 def create_student():
     """Create a new student."""
     try:
@@ -47,13 +668,13 @@ def create_student():
         if not data:
             return jsonify({'error': 'No JSON data provided'}), 400
         
-        # Validate data
-        errors = StudentController.validate_student_data(data)
+        # Validate and normalize once; the controller trusts the values
+        values, errors = StudentController.validate_student_data(data)
         if errors:
             return jsonify({'errors': errors}), 400
         
         # Create student
-        student, error = StudentController.create_student(data)
+        student, error = StudentController.create_student(values)
         if error:
             return jsonify({'error': error}), 400
         
@@ -62,40 +683,146 @@ def create_student():
         logger.error(f"Unexpected error in create_student: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+MAX_BULK_RECORDS = 50000
+
+def _bulk_records():
+    """Read a bulk body as a JSON array or NDJSON, returning (records, error).
+
+    Unparseable NDJSON lines are kept as ``None`` so they are reported
+    against their line index instead of failing the whole request.
+    """
+    if 'ndjson' in (request.mimetype or '') or 'jsonl' in (request.mimetype or ''):
+        records = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                records.append(None)
+    else:
+        records = request.get_json(silent=True)
+        if not isinstance(records, list):
+            return None, 'Body must be a JSON array or NDJSON (application/x-ndjson)'
+    if not records:
+        return None, 'No records provided'
+    if len(records) > MAX_BULK_RECORDS:
+        return None, f'At most {MAX_BULK_RECORDS} records can be created per request'
+    return records, None
+
+@student_bp.route('/students/bulk', methods=['POST'])
+@idempotent
+def bulk_create_students():
+    """Create many students in one request.
+
+    ``?mode=atomic`` (default) inserts all records or none of them;
+    ``?mode=partial`` inserts every valid record and reports the rest.
+    """
+    try:
+        mode = request.args.get('mode', 'atomic')
+        if mode not in ('atomic', 'partial'):
+            return jsonify({'error': "mode must be 'atomic' or 'partial'"}), 400
+
+        records, error = _bulk_records()
+        if error:
+            return jsonify({'error': error}), 400
+
+        summary, error = StudentController.bulk_create_students(records, atomic=(mode == 'atomic'))
+        if error:
+            return jsonify({'error': error}), 400
+
+        if summary['failed'] == 0:
+            return jsonify(summary), 201
+        if mode == 'atomic':
+            return jsonify(summary), 400
+        return jsonify(summary), 207
+    except Exception as e:
+        logger.error(f"Unexpected error in bulk_create_students: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @student_bp.route('/students/<int:student_id>', methods=['PUT'])
+@idempotent
 def update_student(student_id):
-    """Update an existing student."""
+    """Update an existing student.
+
+    With ``If-Match: "<etag>"`` the update only applies if the student is
+    still at that version, otherwise 412.
+    """
     try:
+        expected_version, error = _expected_version(student_id)
+        if error:
+            return jsonify({'error': error}), 412
+
         # Get JSON data from request
         data = request.get_json()
         if not data:
             return jsonify({'error': 'No JSON data provided'}), 400
         
         # Validate data (not all fields required for update)
-        errors = StudentController.validate_student_data(data, required_fields=[])
+        values, errors = StudentController.validate_student_data(data, required_fields=())
         if errors:
             return jsonify({'errors': errors}), 400
         
         # Update student
-        student, error = StudentController.update_student(student_id, data)
+        student, error = StudentController.update_student(student_id, values, expected_version)
         if error:
             if error == "Student not found":
                 return jsonify({'error': error}), 404
+            if error == "Version mismatch":
+                return jsonify({'error': error}), 412
             return jsonify({'error': error}), 400
         
-        return jsonify(student), 200
+        return _with_row_etag(student, 200)
     except Exception as e:
         logger.error(f"Unexpected error in update_student: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@student_bp.route('/students/<int:student_id>', methods=['PATCH'])
+def patch_student(student_id):
+    """Partially update a student; only the fields present in the body are written.
+
+    Honours If-Match like PUT.
+    """
+    try:
+        expected_version, error = _expected_version(student_id)
+        if error:
+            return jsonify({'error': error}), 412
+
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not data:
+            return jsonify({'error': 'No JSON data provided'}), 400
+
+        # Name and email may be changed but not cleared; unknown fields are rejected
+        values, errors = StudentController.validate_student_data(data, partial=True, reject_unknown=True)
+        if errors:
+            return jsonify({'errors': errors}), 400
+
+        student, error = StudentController.patch_student(student_id, values, expected_version)
+        if error:
+            if error == "Student not found":
+                return jsonify({'error': error}), 404
+            if error == "Version mismatch":
+                return jsonify({'error': error}), 412
+            return jsonify({'error': error}), 400
+
+        return _with_row_etag(student, 200)
+    except Exception as e:
+        logger.error(f"Unexpected error in patch_student: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @student_bp.route('/students/<int:student_id>', methods=['DELETE'])
 def delete_student(student_id):
-    """Delete a student."""
+    """Delete a student; with If-Match only while it is still at that version."""
     try:
-        success, message = StudentController.delete_student(student_id)
+        expected_version, error = _expected_version(student_id)
+        if error:
+            return jsonify({'error': error}), 412
+        success, message = StudentController.delete_student(student_id, expected_version)
         if not success:
             if message == "Student not found":
                 return jsonify({'error': message}), 404
+            if message == "Version mismatch":
+                return jsonify({'error': message}), 412
             return jsonify({'error': message}), 500
         
         return jsonify({'message': message}), 200
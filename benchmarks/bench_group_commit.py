@@ -0,0 +1,95 @@
+"""Throughput and latency of concurrent creates with and without group commit.
+
+Runs the app in-process and fires ``--requests`` POST /api/v1/students from
+``--concurrency`` threads, first with one INSERT/COMMIT per request, then
+with write coalescing for each ``--windows`` value (milliseconds):
+
+    python benchmarks/bench_group_commit.py --concurrency 64 --requests 4000 --windows 1 2 5
+
+Connection settings come from the usual DB_* environment variables; the
+benchmark rows are deleted afterwards.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(app, requests, concurrency, tag):
+    client = app.test_client()
+    latencies = []
+    errors = []
+    counter = iter(range(requests))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            started = time.perf_counter()
+            response = client.post('/api/v1/students', json={
+                'name': f'Group Commit {index}', 'email': f'gc-{tag}-{index}@bench.example.com', 'age': 20
+            })
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code != 201:
+                    errors.append(response.status_code)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--windows', type=float, nargs='+', default=[1.0, 2.0, 5.0])
+    parser.add_argument('--max-batch', type=int, default=100)
+    args = parser.parse_args()
+
+    from main import app
+    from app.models.student import student_writer
+    from app.utils.admission import admission_controller
+    from app.utils.database import db_manager
+    # Measure the write path, not load shedding
+    admission_controller.configure(enabled=False)
+
+    modes = [('per-request', None)] + [(f'coalesced {window:g}ms', window) for window in args.windows]
+    print(f"{'mode':<18} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'batch':>6} {'errors':>7}")
+    try:
+        for label, window in modes:
+            student_writer.configure(enabled=window is not None, window=(window or 0) / 1000,
+                                     max_batch=args.max_batch)
+            before = student_writer.stats()
+            elapsed, latencies, errors = run(app, args.requests, args.concurrency, uuid.uuid4().hex[:8])
+            after = student_writer.stats()
+            batches = after['batches'] - before['batches']
+            mean_batch = (after['items'] - before['items']) / batches if batches else 1
+            print(f"{label:<18} {len(latencies) / elapsed:>9.0f} {percentile(latencies, 50) * 1000:>8.2f} "
+                  f"{percentile(latencies, 95) * 1000:>8.2f} {percentile(latencies, 99) * 1000:>8.2f} "
+                  f"{mean_batch:>6.1f} {len(errors):>7}")
+    finally:
+        with db_manager.get_db_cursor() as (conn, cur):
+            cur.execute("DELETE FROM students WHERE email LIKE 'gc-%%@bench.example.com'")
+
+
+if __name__ == '__main__':
+    main()
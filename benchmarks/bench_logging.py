@@ -0,0 +1,114 @@
+"""Per-request logging overhead on the request thread: print()/synchronous logging vs the log pipeline.
+
+Each simulated write request logs what the request path used to log
+(``execute_query`` printing the query and its parameters, an f-string
+``logger.info`` per write through a synchronous stream handler) or what it
+logs now (query text at DEBUG, skipped before formatting; the write and
+access lines sampled and queued for the writer thread). ``--threads``
+workers send ``--requests`` requests each, with output to a real file:
+
+    python benchmarks/bench_logging.py --threads 16 --requests 20000 --sample-rate 0.1
+
+Reports microseconds of logging per request as seen by the request thread
+(p50/p99) and requests per second; the pipeline's drain time and dropped
+records are listed separately. Needs no database.
+"""
+import argparse
+import contextlib
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+QUERY = "INSERT INTO students (name, email, age) VALUES (%s, %s, %s) RETURNING id"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def legacy_request(index, logger):
+    params = (f"Student {index}", f"student{index}@example.com", 20)
+    print(f"Executing query: {QUERY}")
+    print(f"With parameters: {params}")
+    logger.info(f"Created new student with ID: {index}")
+
+
+def pipeline_request(index, logger, db_logger, access_logger, log_sampled):
+    params = (f"Student {index}", f"student{index}@example.com", 20)
+    db_logger.debug("Executing query: %s with parameters: %s", QUERY, params)
+    log_sampled(logger, "Created new student with ID: %s", index)
+    log_sampled(access_logger, "%s %s %s", 'POST', '/api/v1/students', 201,
+                fields={'status': 201, 'duration_ms': 1.0})
+
+
+def run(label, send, threads, requests):
+    latencies = [[] for _ in range(threads)]
+
+    def worker(slot):
+        record = latencies[slot].append
+        for index in range(requests):
+            started = time.perf_counter()
+            send(slot * requests + index)
+            record(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=worker, args=(slot,)) for slot in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    samples = [latency for per_thread in latencies for latency in per_thread]
+    print(f"{label:<10} {len(samples) / elapsed:>12,.0f} req/s   "
+          f"p50 {percentile(samples, 50) * 1e6:>7.1f} us   p99 {percentile(samples, 99) * 1e6:>8.1f} us",
+          file=sys.__stdout__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=10000, help='requests per thread')
+    parser.add_argument('--sample-rate', type=float, default=0.1, help='LOG_SAMPLE_RATE for the pipeline')
+    parser.add_argument('--queue-size', type=int, default=10000, help='LOG_QUEUE_SIZE for the pipeline')
+    parser.add_argument('--log-file', help='where log output goes (default: a temporary file)')
+    args = parser.parse_args()
+
+    from app.utils.logs import log_pipeline, log_sampled
+    path = args.log_file or tempfile.mkstemp(prefix='bench_logging_', suffix='.log')[1]
+    logger = logging.getLogger('app.models.student')
+    root = logging.getLogger()
+
+    with open(path, 'a', buffering=1) as output:
+        handler = logging.StreamHandler(output)
+        handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+        with contextlib.redirect_stdout(output):
+            run('print+sync', lambda index: legacy_request(index, logger), args.threads, args.requests)
+        root.removeHandler(handler)
+
+        log_pipeline.install(level='INFO', queue_size=args.queue_size, sample_rate=args.sample_rate, stream=output)
+        db_logger = logging.getLogger('app.utils.database')
+        access_logger = logging.getLogger('app.access')
+        run('pipeline', lambda index: pipeline_request(index, logger, db_logger, access_logger, log_sampled),
+            args.threads, args.requests)
+        started = time.perf_counter()
+        log_pipeline.stop()
+        drained = time.perf_counter() - started
+
+    from app.utils.logs import log_records
+    outcomes = {labels['outcome']: value for _, labels, value in log_records.samples()}
+    print(f"pipeline drain after the run: {drained * 1000:.1f} ms; records queued {outcomes.get('queued', 0)}, "
+          f"sampled out {outcomes.get('sampled_out', 0)}, dropped {outcomes.get('dropped', 0)}")
+    print(f"log output: {path}")
+
+
+if __name__ == '__main__':
+    main()
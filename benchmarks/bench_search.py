@@ -0,0 +1,103 @@
+"""Latency of the student search query on a generated table.
+
+Builds ``bench_search.students`` (same columns and indexes as the real
+table) with ``--rows`` generated students, then runs the exact SQL used by
+``Student.search`` for a set of terms in both modes:
+
+    python benchmarks/bench_search.py --rows 1000000 --runs 50
+
+Connection settings come from the usual DB_* environment variables. Exits
+non-zero when a p95 exceeds ``--max-p95-ms``.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.models.student import Student  # noqa: E402
+
+SCHEMA = 'bench_search'
+FIRST_NAMES = ['Alice', 'Bob', 'Chandra', 'Dmitri', 'Elena', 'Farid', 'Grace', 'Hiroshi', 'Ines', 'Jamal',
+               'Kavya', 'Liam', 'Mei', 'Nikolai', 'Olga', 'Priya', 'Quentin', 'Rosa', 'Sanjay', 'Tomasz']
+LAST_NAMES = ['Anderson', 'Borade', 'Castillo', 'Dubois', 'Eriksen', 'Fischer', 'Gupta', 'Haddad', 'Ivanova',
+              'Jensen', 'Kowalski', 'Lindqvist', 'Moreau', 'Nakamura', 'Okafor', 'Petrov', 'Quinn', 'Rossi']
+TERMS = {
+    'fuzzy': ['Nakamur', 'gupta4217', 'Dmitry Fisher', 'elena.k', '123456'],
+    'prefix': ['ali', 'tomasz', 'gra', 'sanjay.m', 'k'],
+}
+
+
+def connect():
+    return psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=os.getenv('DB_PORT', '5432'),
+        database=os.getenv('DB_NAME', 'student_db'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', 'password'),
+        options=f'-c search_path={SCHEMA},public'
+    )
+
+
+def build_table(conn, rows):
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}")
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {SCHEMA}.students (LIKE public.students INCLUDING ALL)")
+        cur.execute(f"SELECT count(*) FROM {SCHEMA}.students")
+        existing = cur.fetchone()[0]
+        if existing < rows:
+            print(f"Generating {rows - existing} rows...")
+            cur.execute(
+                f"INSERT INTO {SCHEMA}.students (name, email, age) "
+                "SELECT f.names[1 + g % array_length(f.names, 1)] || ' ' || l.names[1 + (g / 7) % array_length(l.names, 1)], "
+                "lower(f.names[1 + g % array_length(f.names, 1)]) || '.' || "
+                "lower(l.names[1 + (g / 7) % array_length(l.names, 1)]) || g || '@example.com', 18 + g % 50 "
+                "FROM generate_series(%s, %s) g, (SELECT %s::text[] AS names) f, (SELECT %s::text[] AS names) l",
+                (existing + 1, rows, FIRST_NAMES, LAST_NAMES)
+            )
+            cur.execute(f"ANALYZE {SCHEMA}.students")
+    conn.commit()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--runs', type=int, default=30, help='timed runs per term')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--max-p95-ms', type=float, default=None)
+    args = parser.parse_args()
+
+    conn = connect()
+    build_table(conn, args.rows)
+    failed = False
+    print(f"{'mode':<7} {'term':<16} {'hits':>5} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    with conn.cursor() as cur:
+        for mode, terms in TERMS.items():
+            for term in terms:
+                sql, params = Student.search_sql(term, args.limit, prefix=(mode == 'prefix'))
+                cur.execute(sql, params)  # warm up
+                samples = []
+                for _ in range(args.runs):
+                    started = time.perf_counter()
+                    cur.execute(sql, params)
+                    hits = len(cur.fetchall())
+                    samples.append((time.perf_counter() - started) * 1000)
+                p95 = percentile(samples, 95)
+                failed = failed or (args.max_p95_ms is not None and p95 > args.max_p95_ms)
+                print(f"{mode:<7} {term:<16} {hits:>5} {statistics.median(samples):>8.2f} {p95:>8.2f} "
+                      f"{max(samples):>8.2f}")
+    conn.rollback()
+    conn.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Compare Python and database-side JSON serialization for list endpoints.
+
+Each mode runs in its own subprocess (peak RSS only ever grows) against the
+database configured through the usual DB_* environment variables:
+
+    python benchmarks/bench_serialization.py --rows 200000 --requests 20
+
+For every mode and endpoint it reports CPU time per request (user + system,
+including helper threads) and the peak RSS of the worker process.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = {
+    'stream': '/api/v1/students?serialize={mode}',
+    'page': '/api/v1/students?limit=1000&serialize={mode}',
+}
+
+
+def seed(rows):
+    """Top the students table up to at least ``rows`` rows."""
+    sys.path.insert(0, ROOT)
+    import main  # noqa: F401 (configures db_manager)
+    from app.utils.database import db_manager
+    with db_manager.get_db_cursor() as (conn, cur):
+        cur.execute("SELECT count(*) FROM students")
+        missing = rows - cur.fetchone()[0]
+        if missing > 0:
+            cur.execute(
+                "INSERT INTO students (name, email, age) "
+                "SELECT 'bench ' || g, 'bench' || g || '@example.com', 18 + g % 40 "
+                "FROM generate_series(1, %s) g",
+                (missing,)
+            )
+
+
+def run_worker(mode, endpoint, requests):
+    sys.path.insert(0, ROOT)
+    from main import app
+    client = app.test_client()
+    url = ENDPOINTS[endpoint].format(mode=mode)
+
+    # Warm up the pool, prepared statements and import-time allocations
+    client.get(url).get_data()
+    started = os.times()
+    wall = time.perf_counter()
+    size = 0
+    for _ in range(requests):
+        response = client.get(url)
+        size = len(response.get_data())
+        assert response.status_code == 200, response.status_code
+    finished = os.times()
+    cpu = (finished.user - started.user) + (finished.system - started.system)
+    print(json.dumps({
+        'mode': mode,
+        'endpoint': endpoint,
+        'requests': requests,
+        'response_bytes': size,
+        'cpu_ms_per_request': round(cpu * 1000 / requests, 2),
+        'wall_ms_per_request': round((time.perf_counter() - wall) * 1000 / requests, 2),
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mib': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000, help='minimum number of rows in students')
+    parser.add_argument('--requests', type=int, default=10, help='timed requests per mode and endpoint')
+    parser.add_argument('--worker', nargs=2, metavar=('MODE', 'ENDPOINT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker[0], args.worker[1], args.requests)
+        return
+
+    seed(args.rows)
+    results = []
+    for endpoint in ENDPOINTS:
+        for mode in ('python', 'db'):
+            output = subprocess.run(
+                [sys.executable, __file__, '--requests', str(args.requests), '--worker', mode, endpoint],
+                check=True, capture_output=True, text=True, cwd=ROOT
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'endpoint':<8} {'mode':<7} {'bytes':>12} {'cpu ms/req':>11} {'wall ms/req':>12} {'peak RSS MiB':>13}")
+    for r in results:
+        print(f"{r['endpoint']:<8} {r['mode']:<7} {r['response_bytes']:>12} {r['cpu_ms_per_request']:>11} "
+              f"{r['wall_ms_per_request']:>12} {r['peak_rss_mib']:>13}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,394 @@
+"""Load and regression benchmark suite for the student API.
+
+Seeds the database with ``--rows`` students (10k to 1M), then runs each
+load profile in its own subprocess (so peak RSS is per profile) with the
+in-process load generator in ``loadgen.py``:
+
+    python benchmarks/bench_suite.py --rows 100000 --profiles read mixed write --duration 20
+    python benchmarks/bench_suite.py --rate 300 --output results.json       # open loop, 300 req/s
+    python benchmarks/bench_suite.py --baseline benchmarks/baselines/main.json --threshold 0.15
+
+Profiles: ``read`` (mostly lookups, lists and search), ``mixed`` (70/30
+reads/writes), ``write`` (creates, bulk loads, updates and deletes) and
+``routes``, which sends every route of ``student_bp`` (plus ``/metrics``) in
+equal shares and fails if a route has no scenario. Each profile reports
+throughput, p50/p95/p99 latency (overall and per route), database round
+trips per request (statements timed by ``db_query_duration_seconds``) and
+peak RSS. Model-layer microbenchmarks (``Student.from_row``, ``to_dict``,
+schema validation) run without a database.
+
+``--output`` writes the results as JSON; ``--baseline`` compares them with
+an earlier output and exits non-zero when a metric regressed by more than
+``--threshold`` (relative). Connection settings come from the usual DB_*
+environment variables. Rows created by the suite are deleted afterwards;
+seeded rows are kept for the next run.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import timeit
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadgen import LoadGenerator, Scenario  # noqa: E402
+
+API = '/api/v1'
+SUITE_EMAIL = 'suite-%@bench.example.com'
+
+
+class Context:
+    """State shared by the scenarios of one run."""
+
+    def __init__(self, min_id, max_id):
+        self.min_id = min_id
+        self.max_id = max_id
+        self.lock = threading.Lock()
+        self.created = []
+        self.etags = {}
+        self.cursor = None
+
+    def seeded_id(self, rng):
+        return rng.randint(self.min_id, self.max_id)
+
+    def add_created(self, student_id):
+        with self.lock:
+            self.created.append(student_id)
+
+    def pop_created(self):
+        with self.lock:
+            return self.created.pop() if self.created else None
+
+    def any_created(self, rng):
+        with self.lock:
+            return rng.choice(self.created) if self.created else None
+
+
+def _new_student(rng):
+    return {'name': f'Suite {rng.randrange(10 ** 6)}', 'email': f'suite-{uuid.uuid4().hex[:12]}@bench.example.com',
+            'age': rng.randint(18, 60)}
+
+
+def _get(path, **kwargs):
+    return lambda ctx, rng: ('GET', path, kwargs)
+
+
+def _remember_created(ctx, response):
+    ctx.add_created(response.get_json()['id'])
+
+
+def _remember_etag(ctx, response):
+    etag = response.headers.get('ETag')
+    if etag:
+        with ctx.lock:
+            if len(ctx.etags) < 10000:
+                ctx.etags[response.get_json()['id']] = etag
+
+
+def _conditional_get(ctx, rng):
+    with ctx.lock:
+        known = rng.choice(list(ctx.etags.items())) if ctx.etags else None
+    if known is None:
+        return 'GET', f'{API}/students/{ctx.seeded_id(rng)}', {}
+    return 'GET', f'{API}/students/{known[0]}', {'headers': {'If-None-Match': known[1]}}
+
+
+def _changes(ctx, rng):
+    if ctx.cursor is None:
+        return 'GET', f'{API}/students/changes', {}
+    return 'GET', f'{API}/students/changes?since={ctx.cursor}&limit=100', {}
+
+
+def _remember_cursor(ctx, response):
+    ctx.cursor = response.get_json()['cursor']
+
+
+def _write_target(ctx, rng):
+    """Prefer rows the suite created; fall back to seeded ones."""
+    return ctx.any_created(rng) or ctx.seeded_id(rng)
+
+
+def _delete(ctx, rng):
+    # Only ever delete rows the suite created; without one this is a 404
+    student_id = ctx.pop_created() or 0
+    return 'DELETE', f'{API}/students/{student_id}', {}
+
+
+SCENARIOS = {scenario.name: scenario for scenario in (
+    Scenario('healthcheck', 'students.healthcheck', _get(f'{API}/healthcheck')),
+    Scenario('liveness', 'students.liveness', _get(f'{API}/health/live')),
+    Scenario('readiness', 'students.readiness', _get(f'{API}/health/ready')),
+    Scenario('pool_stats', 'students.pool_stats', _get(f'{API}/pool/stats')),
+    Scenario('replica_stats', 'students.replica_stats', _get(f'{API}/replicas/stats'), expected=(200, 404)),
+    Scenario('write_stats', 'students.write_stats', _get(f'{API}/writes/stats')),
+    Scenario('prepared_stats', 'students.prepared_stats', _get(f'{API}/prepared/stats')),
+    Scenario('cache_stats', 'students.cache_stats', _get(f'{API}/cache/stats'), expected=(200, 404)),
+    Scenario('admission_stats', 'students.admission_stats', _get(f'{API}/admission/stats')),
+    Scenario('metrics', 'metrics.get_metrics', _get('/metrics')),
+    # A filter nothing matches keeps the full-table stream cheap at any table size
+    Scenario('list_stream', 'students.get_students', _get(f'{API}/students?name_prefix=no-such-student')),
+    Scenario('list_page', 'students.get_students',
+             lambda ctx, rng: ('GET', f'{API}/students?limit=50&after_id={ctx.seeded_id(rng)}', {})),
+    Scenario('list_page_db', 'students.get_students',
+             lambda ctx, rng: ('GET', f'{API}/students?limit=50&after_id={ctx.seeded_id(rng)}&serialize=db', {})),
+    Scenario('list_filtered', 'students.get_students',
+             lambda ctx, rng: ('GET', f'{API}/students?fields=id,name&age_min={rng.randint(18, 50)}'
+                                      f'&age_max=60&sort=-age&limit=50', {})),
+    Scenario('get_by_ids', 'students.get_students',
+             lambda ctx, rng: ('GET', f'{API}/students?ids=' + ','.join(
+                 str(ctx.seeded_id(rng)) for _ in range(20)), {})),
+    Scenario('search', 'students.search_students',
+             lambda ctx, rng: ('GET', f'{API}/students/search?q=seed{rng.randrange(1000)}&limit=10', {})),
+    Scenario('changes', 'students.get_student_changes', _changes, expected=(200, 410), after=_remember_cursor),
+    Scenario('stats', 'students.student_stats', _get(f'{API}/students/stats?domains=20')),
+    # Throttled after the first call, so it only blocks writers once per run
+    Scenario('stats_rebuild', 'students.rebuild_student_stats',
+             lambda ctx, rng: ('POST', f'{API}/students/stats/rebuild', {}), expected=(200, 429)),
+    Scenario('export', 'students.export_students', _get(f'{API}/students/export?format=ndjson')),
+    Scenario('get_one', 'students.get_student',
+             lambda ctx, rng: ('GET', f'{API}/students/{ctx.seeded_id(rng)}', {}),
+             expected=(200, 404), after=_remember_etag),
+    Scenario('conditional_get', 'students.get_student', _conditional_get, expected=(200, 304, 404)),
+    Scenario('create', 'students.create_student',
+             lambda ctx, rng: ('POST', f'{API}/students', {'json': _new_student(rng)}),
+             expected=(201,), after=_remember_created),
+    Scenario('bulk', 'students.bulk_create_students',
+             lambda ctx, rng: ('POST', f'{API}/students/bulk?mode=partial',
+                               {'json': [_new_student(rng) for _ in range(20)]}),
+             expected=(201,)),
+    Scenario('update', 'students.update_student',
+             lambda ctx, rng: ('PUT', f'{API}/students/{_write_target(ctx, rng)}',
+                               {'json': {'age': rng.randint(18, 60)}}),
+             expected=(200, 404)),
+    Scenario('patch', 'students.patch_student',
+             lambda ctx, rng: ('PATCH', f'{API}/students/{_write_target(ctx, rng)}',
+                               {'json': {'name': f'Suite {rng.randrange(10 ** 6)}'}}),
+             expected=(200, 404)),
+    Scenario('delete', 'students.delete_student', _delete, expected=(200, 404)),
+)}
+
+PROFILES = {
+    'read': {
+        'get_one': 30, 'conditional_get': 10, 'list_page': 15, 'list_page_db': 5, 'list_filtered': 10,
+        'get_by_ids': 10, 'search': 10, 'changes': 2, 'stats': 2, 'create': 4, 'patch': 3, 'update': 1,
+    },
+    'mixed': {
+        'get_one': 20, 'conditional_get': 5, 'list_page': 10, 'list_filtered': 5, 'get_by_ids': 5,
+        'search': 5, 'create': 20, 'bulk': 2, 'update': 10, 'patch': 10, 'delete': 8,
+    },
+    'write': {
+        'create': 40, 'bulk': 5, 'update': 20, 'patch': 20, 'delete': 10, 'get_one': 5,
+    },
+    'routes': {name: 1 for name in SCENARIOS},
+}
+
+
+def seed(rows):
+    """Top the students table up to at least ``rows`` rows; returns the (min, max) seeded id."""
+    import main  # noqa: F401 (configures db_manager)
+    from app.utils.database import db_manager
+    with db_manager.get_db_cursor() as (conn, cur):
+        cur.execute("SELECT count(*) FROM students")
+        missing = rows - cur.fetchone()[0]
+        if missing > 0:
+            cur.execute(
+                "INSERT INTO students (name, email, age) "
+                "SELECT 'seed' || g || ' student', 'seed' || g || '-' || md5(random()::text) || '@bench.example.com', "
+                "18 + g % 40 FROM generate_series(1, %s) g",
+                (missing,)
+            )
+        cur.execute("SELECT min(id), max(id) FROM students")
+        return cur.fetchone()
+
+
+def cleanup():
+    from app.utils.database import db_manager
+    with db_manager.get_db_cursor() as (conn, cur):
+        cur.execute("DELETE FROM students WHERE email LIKE %s", (SUITE_EMAIL,))
+
+
+def db_round_trips():
+    """Statements executed so far, as counted by the db_query_duration_seconds histogram."""
+    from app.utils.metrics import metrics
+    for name, kind, help, samples in metrics.collect():
+        if name == 'db_query_duration_seconds':
+            return sum(value for sample, labels, value in samples if sample.endswith('_count'))
+    return 0
+
+
+def uncovered_routes(app):
+    covered = {scenario.endpoint for scenario in SCENARIOS.values()}
+    return sorted(rule.endpoint for rule in app.url_map.iter_rules()
+                  if rule.endpoint != 'static' and rule.endpoint not in covered)
+
+
+def run_profile(profile, args, min_id, max_id):
+    from main import app
+    from app.utils.admission import admission_controller
+    if not args.admission:
+        # Measure the request path, not load shedding
+        admission_controller.configure(enabled=False)
+
+    ctx = Context(min_id, max_id)
+    # Warm up the pool, prepared statements and caches
+    LoadGenerator(app, SCENARIOS, PROFILES[profile], ctx, concurrency=args.concurrency,
+                  duration=args.warmup, seed=args.seed + 1).run()
+    trips_before = db_round_trips()
+    result = LoadGenerator(app, SCENARIOS, PROFILES[profile], ctx, concurrency=args.concurrency,
+                           rate=args.rate, duration=args.duration, seed=args.seed).run()
+    summary = result.summary()
+    trips = db_round_trips() - trips_before
+    summary.update(
+        profile=profile,
+        mode='open' if args.rate else 'closed',
+        concurrency=args.concurrency,
+        rate=args.rate,
+        db_round_trips_per_request=round(trips / summary['requests'], 3) if summary['requests'] else None,
+        # ru_maxrss is in KiB on Linux
+        peak_rss_mib=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    )
+    return summary
+
+
+def _ops_per_second(fn, number):
+    return round(number / min(timeit.repeat(fn, number=number, repeat=3)), 1)
+
+
+def run_micro():
+    """Model-layer microbenchmarks (no database); operations per second."""
+    from app.models.student import Student
+    row = (12345, 'Micro Student', 'micro.student@example.com', 21, 3)
+    student = Student.from_row(row)
+    valid = {'name': 'Micro Student', 'email': 'micro.student@example.com', 'age': '21'}
+    invalid = {'name': '', 'email': 'not-an-email', 'age': 'old'}
+    batch = [valid, invalid] * 500
+    return {
+        'from_row_ops': _ops_per_second(lambda: Student.from_row(row), 200000),
+        'to_dict_ops': _ops_per_second(student.to_dict, 200000),
+        'validate_valid_ops': _ops_per_second(lambda: Student.SCHEMA.validate(valid), 100000),
+        'validate_invalid_ops': _ops_per_second(lambda: Student.SCHEMA.validate(invalid), 100000),
+        'validate_many_records_per_s': round(
+            len(batch) * 20 / min(timeit.repeat(lambda: Student.SCHEMA.validate_many(batch), number=20, repeat=3)), 1),
+    }
+
+
+# Metric paths compared against a baseline, and whether higher is better
+COMPARED = (
+    (('throughput_rps',), True),
+    (('latency_ms', 'p50'), False),
+    (('latency_ms', 'p95'), False),
+    (('latency_ms', 'p99'), False),
+    (('db_round_trips_per_request',), False),
+    (('peak_rss_mib',), False),
+)
+
+
+def regressions(results, baseline, threshold):
+    """List human-readable regressions of ``results`` against ``baseline``."""
+    found = []
+    for profile, current in results['profiles'].items():
+        previous = baseline.get('profiles', {}).get(profile)
+        if not previous:
+            continue
+        for path, higher_is_better in COMPARED:
+            now, before = current, previous
+            for key in path:
+                now, before = (now or {}).get(key), (before or {}).get(key)
+            if not now or not before:
+                continue
+            change = (now - before) / before
+            if (-change if higher_is_better else change) > threshold:
+                found.append(f"{profile} {'.'.join(path)}: {before} -> {now} ({change:+.1%})")
+    for name, now in results.get('micro', {}).items():
+        before = baseline.get('micro', {}).get(name)
+        if before and (before - now) / before > threshold:
+            found.append(f"micro {name}: {before} -> {now} ({(now - before) / before:+.1%})")
+    return found
+
+
+def print_results(results):
+    print(f"{'profile':<8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'trips/req':>10} {'RSS MiB':>8} {'errors':>7}")
+    for name, r in results['profiles'].items():
+        latency = r['latency_ms']
+        print(f"{name:<8} {r['throughput_rps']:>9} {latency['p50']:>8} {latency['p95']:>8} {latency['p99']:>8} "
+              f"{r['db_round_trips_per_request']:>10} {r['peak_rss_mib']:>8} {r['errors']:>7}")
+    for name, value in results.get('micro', {}).items():
+        print(f"micro {name:<30} {value:>14,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000, help='minimum number of rows in students')
+    parser.add_argument('--profiles', nargs='+', choices=sorted(PROFILES), default=['read', 'mixed', 'write'])
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per profile')
+    parser.add_argument('--warmup', type=float, default=2.0, help='untimed seconds before each profile')
+    parser.add_argument('--concurrency', type=int, default=16, help='threads (max in flight with --rate)')
+    parser.add_argument('--rate', type=float, help='open loop: arrivals per second instead of a closed loop')
+    parser.add_argument('--admission', action='store_true', help='keep admission control enabled')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for request mixes')
+    parser.add_argument('--no-micro', action='store_true', help='skip the model-layer microbenchmarks')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--baseline', help='JSON from an earlier --output to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15, help='allowed relative regression')
+    parser.add_argument('--worker', nargs=3, metavar=('PROFILE', 'MIN_ID', 'MAX_ID'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        profile, min_id, max_id = args.worker[0], int(args.worker[1]), int(args.worker[2])
+        print(json.dumps(run_profile(profile, args, min_id, max_id)))
+        return 0
+
+    if 'routes' in args.profiles:
+        from main import app
+        missing = uncovered_routes(app)
+        if missing:
+            print(f"Routes without a benchmark scenario: {', '.join(missing)}", file=sys.stderr)
+            return 2
+
+    min_id, max_id = seed(args.rows)
+    passthrough = []
+    for name in ('duration', 'warmup', 'concurrency', 'rate', 'seed'):
+        value = getattr(args, name)
+        if value is not None:
+            passthrough += [f'--{name}', str(value)]
+    if args.admission:
+        passthrough.append('--admission')
+
+    results = {'rows': args.rows, 'profiles': {}}
+    try:
+        for profile in args.profiles:
+            output = subprocess.run(
+                [sys.executable, __file__, *passthrough, '--worker', profile, str(min_id), str(max_id)],
+                check=True, capture_output=True, text=True, cwd=ROOT
+            ).stdout
+            results['profiles'][profile] = json.loads(output.strip().splitlines()[-1])
+    finally:
+        cleanup()
+    if not args.no_micro:
+        results['micro'] = run_micro()
+
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            found = regressions(results, json.load(baseline_file), args.threshold)
+        if found:
+            print(f"Regressions beyond {args.threshold:.0%}:", file=sys.stderr)
+            for line in found:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""Concurrent in-process load generator for the Flask app (used by bench_suite.py).
+
+Requests go through ``app.test_client()`` (one client per thread), so they
+exercise the full WSGI stack, the hooks and the database, without a network
+hop. Two modes:
+
+* closed loop: ``concurrency`` threads each send the next request as soon as
+  the previous one finished;
+* open loop: requests arrive at ``rate`` per second (Poisson arrivals)
+  whether or not earlier ones finished, and are served by up to
+  ``concurrency`` threads. Latency is measured from the scheduled arrival,
+  so time spent queued behind slow requests is included (no coordinated
+  omission).
+"""
+import collections
+import queue
+import random
+import threading
+import time
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Scenario:
+    """One kind of request: ``build(ctx, rng)`` returns (method, path, kwargs).
+
+    ``endpoint`` is the Flask endpoint it exercises and ``expected`` the
+    status codes that count as success. ``after(ctx, response)`` may record
+    state (created IDs, ETags, cursors) for later requests.
+    """
+
+    def __init__(self, name, endpoint, build, expected=(200,), after=None):
+        self.name = name
+        self.endpoint = endpoint
+        self.build = build
+        self.expected = frozenset(expected)
+        self.after = after
+
+
+class LoadResult:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = collections.defaultdict(list)
+        self.errors = collections.Counter()
+        self.statuses = collections.defaultdict(collections.Counter)
+        self.elapsed = 0.0
+        self.late = 0
+
+    def mark_late(self):
+        with self._lock:
+            self.late += 1
+
+    def record(self, scenario, status, latency, ok):
+        with self._lock:
+            self.latencies[scenario].append(latency)
+            self.statuses[scenario][status] += 1
+            if not ok:
+                self.errors[scenario] += 1
+
+    def summary(self):
+        everything = [latency for latencies in self.latencies.values() for latency in latencies]
+        total = len(everything)
+
+        def latency_ms(samples):
+            return {f"p{pct}": round(percentile(samples, pct) * 1000, 3) if samples else None
+                    for pct in (50, 95, 99)}
+
+        return {
+            'requests': total,
+            'elapsed_seconds': round(self.elapsed, 3),
+            'throughput_rps': round(total / self.elapsed, 1) if self.elapsed else 0.0,
+            'latency_ms': latency_ms(everything),
+            'errors': sum(self.errors.values()),
+            'late_arrivals': self.late,
+            'routes': {
+                name: dict(
+                    requests=len(samples),
+                    errors=self.errors[name],
+                    statuses={str(status): count for status, count in sorted(self.statuses[name].items())},
+                    **latency_ms(samples)
+                )
+                for name, samples in sorted(self.latencies.items())
+            },
+        }
+
+
+class LoadGenerator:
+    """Drive ``scenarios`` (name -> weight) against ``app`` for ``duration`` seconds."""
+
+    def __init__(self, app, scenarios, weights, ctx, concurrency=16, rate=None, duration=10.0, seed=1):
+        self.app = app
+        self.scenarios = [scenarios[name] for name in weights]
+        self.weights = list(weights.values())
+        self.ctx = ctx
+        self.concurrency = concurrency
+        self.rate = rate
+        self.duration = duration
+        self.seed = seed
+
+    def _send(self, client, rng, result, scheduled=None):
+        scenario = rng.choices(self.scenarios, self.weights)[0]
+        method, path, kwargs = scenario.build(self.ctx, rng)
+        started = time.perf_counter() if scheduled is None else scheduled
+        response = client.open(path, method=method, **kwargs)
+        try:
+            response.get_data()
+            if scenario.after and response.status_code in scenario.expected:
+                scenario.after(self.ctx, response)
+        finally:
+            # Fires call_on_close hooks, e.g. releasing the admission slot
+            response.close()
+        result.record(scenario.name, response.status_code, time.perf_counter() - started,
+                      response.status_code in scenario.expected)
+
+    def run(self):
+        result = LoadResult()
+        if self.rate:
+            self._run_open(result)
+        else:
+            self._run_closed(result)
+        return result
+
+    def _run_closed(self, result):
+        stop_at = time.perf_counter() + self.duration
+
+        def worker(index):
+            client = self.app.test_client()
+            rng = random.Random(self.seed * 1000 + index)
+            while time.perf_counter() < stop_at:
+                self._send(client, rng, result)
+
+        started = time.perf_counter()
+        self._join([threading.Thread(target=worker, args=(index,)) for index in range(self.concurrency)])
+        result.elapsed = time.perf_counter() - started
+
+    def _run_open(self, result):
+        arrivals = queue.Queue()
+        done = object()
+
+        def worker(index):
+            client = self.app.test_client()
+            rng = random.Random(self.seed * 1000 + index)
+            while True:
+                scheduled = arrivals.get()
+                if scheduled is done:
+                    return
+                if time.perf_counter() - scheduled > 0.001:
+                    result.mark_late()
+                self._send(client, rng, result, scheduled)
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        rng = random.Random(self.seed)
+        started = time.perf_counter()
+        next_arrival = started
+        stop_at = started + self.duration
+        while next_arrival < stop_at:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            arrivals.put(next_arrival)
+            next_arrival += rng.expovariate(self.rate)
+        for _ in threads:
+            arrivals.put(done)
+        for thread in threads:
+            thread.join()
+        result.elapsed = time.perf_counter() - started
+
+    @staticmethod
+    def _join(threads):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,107 @@
+"""Production server settings: ``gunicorn -c gunicorn.conf.py main:app``.
+
+The app is imported once in the master (``preload_app``) so workers fork
+fast, but nothing connects to Postgres at import time: every worker opens
+its own connection pool after fork, optionally pre-warmed in the
+background. On SIGTERM a worker reports not-ready, finishes the requests it
+has accepted (up to ``graceful_timeout``) and only then closes its pool.
+"""
+import logging
+import os
+import shutil
+import signal
+import tempfile
+import threading
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+# Keep below the pod's terminationGracePeriodSeconds
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "25"))
+keepalive = 5
+accesslog = "-"
+
+logger = logging.getLogger("gunicorn.error")
+
+
+def on_starting(server):
+    """Refuse unsynchronized memory caches; give the workers a directory to share metrics through."""
+    from app.utils.cache import LRUCache, cache_manager
+    from app.utils.metrics import metrics
+    if server.cfg.workers > 1 and isinstance(cache_manager.backend, LRUCache) and not cache_manager.channel:
+        raise RuntimeError("CACHE_BACKEND=memory with several workers needs CACHE_NOTIFY_CHANNEL "
+                           "(or use CACHE_BACKEND=sqlite/none, or WEB_CONCURRENCY=1)")
+    if metrics.directory is None:
+        metrics.configure(directory=tempfile.mkdtemp(prefix="student_api_metrics_"))
+        server.metrics_tempdir = metrics.directory
+    else:
+        metrics.clear_directory()
+
+
+def on_exit(server):
+    tempdir = getattr(server, "metrics_tempdir", None)
+    if tempdir:
+        shutil.rmtree(tempdir, ignore_errors=True)
+
+
+def child_exit(server, worker):
+    """Fold the exited worker's metrics into the totals kept for exited workers."""
+    from app.utils.metrics import metrics
+    try:
+        metrics.fold_process(worker.pid)
+    except Exception as error:
+        logger.warning(f"Could not fold metrics of worker {worker.pid}: {error}")
+
+
+def post_fork(server, worker):
+    """Start per-worker background threads; pre-warm the pool when DB_POOL_PREWARM is set."""
+    from app.models.student_change import change_log_maintenance
+    from app.utils.database import replica_monitor
+    from app.utils.idempotency import idempotency_purge
+    from app.utils.logs import log_pipeline
+    from app.utils.metrics import metrics_flush
+    from app.utils.notifications import notification_listener
+    log_pipeline.start()
+    metrics_flush.start()
+    # Cache invalidation (and change feed wake-ups) from the other workers
+    notification_listener.ensure_started()
+    replica_monitor.start()
+    change_log_maintenance.start()
+    idempotency_purge.start()
+    if os.getenv("DB_POOL_PREWARM", "true").lower() not in ("1", "true", "yes"):
+        return
+    from app.utils.database import db_manager
+
+    def prewarm():
+        try:
+            db_manager.init_pool()
+        except Exception as error:
+            # Not fatal: the pool is created on the first request instead
+            logger.warning(f"Worker {worker.pid}: pool pre-warm failed: {error}")
+
+    threading.Thread(target=prewarm, name="pool-prewarm", daemon=True).start()
+
+
+def post_worker_init(worker):
+    """Fail readiness as soon as the worker is told to stop, then let gunicorn drain."""
+    from app.utils.lifecycle import lifecycle
+    stop = signal.getsignal(signal.SIGTERM)
+
+    def drain(signum, frame):
+        lifecycle.start_draining()
+        stop(signum, frame)
+
+    signal.signal(signal.SIGTERM, drain)
+
+
+def worker_exit(server, worker):
+    """In-flight requests have finished (or timed out); close the pool, flush metrics and queued logs."""
+    from app.utils.database import db_manager
+    from app.utils.logs import log_pipeline
+    from app.utils.metrics import metrics
+    db_manager.disconnect()
+    metrics.flush()
+    log_pipeline.stop()
@@ -1,15 +1,23 @@
 import logging
 import os
 from flask import Flask
-from app.views.student_views import student_bp
-from app.utils.database import db_manager
+from app.views.student_views import configure_timeouts, configure_trusted_proxies, student_bp
+from app.views.metrics_views import metrics_bp
+from app.utils.database import db_manager, replica_monitor
+from app.utils.admission import admission_controller, rate_limiter
+from app.utils.cache import cache_manager
+from app.utils.metrics import instrument_app, metrics, metrics_flush
+from app.models.student import student_loader, student_writer
+from app.models.student_change import StudentChangeLog, change_log_maintenance
+from app.models.student_stats import StudentStats
+from app.utils.idempotency import idempotency_purge, idempotency_store
+from app.utils.logs import instrument_logging, log_pipeline
+from app.utils.notifications import notification_listener
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Create Flask app
@@ -21,14 +29,133 @@ class Config:
     DB_NAME = os.getenv("DB_NAME", "mydatabase")
     DB_USER = os.getenv("DB_USER", "myuser")
     DB_PASSWORD = os.getenv("DB_PASSWORD", "mypassword")
-    DB_POOL_MIN = 1
-    DB_POOL_MAX = 20
+    DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+    DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "20"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+    DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))
+    DB_POOL_VALIDATE_AFTER = float(os.getenv("DB_POOL_VALIDATE_AFTER", "30"))
+    # Read replicas as "host[:port],..."; read-only queries are spread over them
+    DB_REPLICA_HOSTS = os.getenv("DB_REPLICA_HOSTS", "")
+    DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+    DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "2"))
+    DB_REPLICA_SELECTION = os.getenv("DB_REPLICA_SELECTION", "least_loaded")  # or round_robin
+    DB_PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "true").lower() in ("1", "true", "yes")
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # memory, sqlite or none
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+    CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+    CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "/tmp/student_api_cache.sqlite3")
+    # LISTEN/NOTIFY channel invalidating the per-worker caches; empty only for a single process
+    CACHE_NOTIFY_CHANNEL = os.getenv("CACHE_NOTIFY_CHANNEL", "student_cache")
+    STUDENT_BATCH_WINDOW_MS = float(os.getenv("STUDENT_BATCH_WINDOW_MS", "1"))
+    STUDENT_BATCH_MAX = int(os.getenv("STUDENT_BATCH_MAX", "100"))
+    # Group commit for concurrent POST /students (off by default)
+    STUDENT_WRITE_COALESCING = os.getenv("STUDENT_WRITE_COALESCING", "false").lower() in ("1", "true", "yes")
+    STUDENT_WRITE_WINDOW_MS = float(os.getenv("STUDENT_WRITE_WINDOW_MS", "2"))
+    STUDENT_WRITE_MAX_BATCH = int(os.getenv("STUDENT_WRITE_MAX_BATCH", "100"))
+    # Concurrent requests admitted per worker; 0 means DB_POOL_MAX
+    ADMISSION_LIMIT = int(os.getenv("ADMISSION_LIMIT", "0"))
+    ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+    ADMISSION_QUEUE = int(os.getenv("ADMISSION_QUEUE", "0"))  # 0 means twice the limit
+    ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "500"))
+    RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", "0"))  # per client, 0 disables
+    RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "20"))
+    # Reverse proxies (addresses or CIDRs) whose X-Real-IP identifies the client
+    TRUSTED_PROXIES = os.getenv("TRUSTED_PROXIES", "")
+    # Database time budget per request (statement_timeout); clients may ask for less
+    REQUEST_TIMEOUT_MS = int(os.getenv("REQUEST_TIMEOUT_MS", "5000"))
+    REQUEST_TIMEOUT_MAX_MS = int(os.getenv("REQUEST_TIMEOUT_MAX_MS", "30000"))
+    # Change feed log: entries older than this are purged (0 keeps them forever)
+    CHANGE_LOG_RETENTION_HOURS = float(os.getenv("CHANGE_LOG_RETENTION_HOURS", "168"))
+    CHANGE_LOG_COMPACT = os.getenv("CHANGE_LOG_COMPACT", "true").lower() in ("1", "true", "yes")
+    CHANGE_LOG_MAINTENANCE_INTERVAL = float(os.getenv("CHANGE_LOG_MAINTENANCE_INTERVAL", "300"))  # 0 disables
+    # Full rebuilds of the roster statistics (they block writers) at most this often
+    STATS_REBUILD_MIN_INTERVAL = float(os.getenv("STATS_REBUILD_MIN_INTERVAL", "300"))
+    # Idempotency-Key responses are replayed for this long; duplicates wait up to IDEMPOTENCY_WAIT_SECONDS
+    IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+    IDEMPOTENCY_CACHE_ENTRIES = int(os.getenv("IDEMPOTENCY_CACHE_ENTRIES", "10000"))
+    IDEMPOTENCY_LEASE_SECONDS = float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "90"))
+    IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+    IDEMPOTENCY_PURGE_INTERVAL = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "600"))  # 0 disables
+    # Logging goes through a bounded queue to a writer thread; records beyond LOG_QUEUE_SIZE are dropped
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json or text
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # Fraction of routine success logs (writes, 2xx/3xx access lines) that are kept
+    LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+    # Directory where workers share metrics so any of them can answer a scrape
+    # (gunicorn.conf.py uses a temporary one when empty); seconds between writes
+    METRICS_DIR = os.getenv("METRICS_DIR", "")
+    METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
 
-# Initialize database pool
-db_manager.init_pool(Config())
+# Configure logging; the writer thread starts per process (see gunicorn.conf.py)
+log_pipeline.install(
+    level=Config.LOG_LEVEL,
+    json_format=Config.LOG_FORMAT == 'json',
+    queue_size=Config.LOG_QUEUE_SIZE,
+    sample_rate=Config.LOG_SAMPLE_RATE
+)
 
-# Register blueprint
+# Pool settings; each process opens its pool on first use (see gunicorn.conf.py)
+db_manager.configure(Config())
+# Replica lag is checked in the background; requests only read the result
+replica_monitor.configure(interval=Config.DB_REPLICA_CHECK_INTERVAL)
+
+# Initialize read-through cache
+cache_manager.init_cache(Config())
+
+# Coalescing window for concurrent get-by-id lookups
+student_loader.configure(window=Config.STUDENT_BATCH_WINDOW_MS / 1000, max_batch=Config.STUDENT_BATCH_MAX)
+
+# Concurrent creates within this window share one INSERT transaction
+student_writer.configure(
+    enabled=Config.STUDENT_WRITE_COALESCING,
+    window=Config.STUDENT_WRITE_WINDOW_MS / 1000,
+    max_batch=Config.STUDENT_WRITE_MAX_BATCH
+)
+
+# Shed load before requests queue up on the connection pool
+admission_limit = Config.ADMISSION_LIMIT or Config.DB_POOL_MAX
+admission_controller.configure(
+    enabled=Config.ADMISSION_ENABLED,
+    limit=admission_limit,
+    max_queue=Config.ADMISSION_QUEUE or 2 * admission_limit,
+    queue_timeout=Config.ADMISSION_QUEUE_TIMEOUT_MS / 1000
+)
+rate_limiter.configure(rate=Config.RATE_LIMIT_RPS, burst=Config.RATE_LIMIT_BURST)
+configure_trusted_proxies(Config.TRUSTED_PROXIES)
+
+# Per-request deadlines, enforced in Postgres with statement_timeout (the session default, SET LOCAL when it differs)
+configure_timeouts(default_ms=Config.REQUEST_TIMEOUT_MS, max_ms=Config.REQUEST_TIMEOUT_MAX_MS)
+
+# Change log compaction and retention; the thread starts in each worker (see gunicorn.conf.py)
+StudentChangeLog.configure(
+    retention_seconds=Config.CHANGE_LOG_RETENTION_HOURS * 3600,
+    compact=Config.CHANGE_LOG_COMPACT
+)
+change_log_maintenance.configure(interval=Config.CHANGE_LOG_MAINTENANCE_INTERVAL)
+StudentStats.configure(rebuild_min_interval=Config.STATS_REBUILD_MIN_INTERVAL)
+
+# Idempotency-Key replay store; the lease must outlast the slowest write request
+idempotency_store.configure(
+    ttl=Config.IDEMPOTENCY_TTL_HOURS * 3600,
+    lease=Config.IDEMPOTENCY_LEASE_SECONDS,
+    wait=Config.IDEMPOTENCY_WAIT_SECONDS,
+    max_entries=Config.IDEMPOTENCY_CACHE_ENTRIES
+)
+idempotency_purge.configure(interval=Config.IDEMPOTENCY_PURGE_INTERVAL)
+
+# Request latency and per-statement query timing, exposed on /metrics
+metrics.enabled = Config.METRICS_ENABLED
+metrics.configure(directory=Config.METRICS_DIR)
+metrics_flush.configure(interval=Config.METRICS_FLUSH_INTERVAL)
+instrument_app(app)
+# Request ID, route and database time on every log record of a request
+instrument_logging(app)
+
+# Register blueprints
 app.register_blueprint(student_bp)
+app.register_blueprint(metrics_bp)
 
 # Global error handlers
 @app.errorhandler(404)
@@ -37,10 +164,14 @@ def not_found(error):
 
 @app.errorhandler(500)
 def internal_error(error):
-    logger.error(f'Server Error: {error}')
+    logger.error('Server Error: %s', error)
     return {'error': 'Internal server error'}, 500
 
 if __name__ == "__main__":
+    notification_listener.ensure_started()
+    replica_monitor.start()
+    change_log_maintenance.start()
+    idempotency_purge.start()
     app.run(debug=True, host="0.0.0.0")
 #    port=int(os.getenv("PORT"))
 #    app.run(host="0.0.0.0", port=port, debug=True)
@@ -24,8 +24,38 @@ fi
 echo "Creating database if it doesn't exist..."
 psql -h "$DB_HOST" -U "$DB_USER" -d postgres -c "CREATE DATABASE $DB_NAME;" 2>/dev/null || echo "Database $DB_NAME already exists"
 
-# Apply migration
-echo "Applying migration to create students table..."
-psql -h "$DB_HOST" -U "$DB_USER" -d "$DB_NAME" -f migrations/001_create_students_table.sql || { echo "Migration failed"; exit 1; }
+PSQL=(psql -h "$DB_HOST" -U "$DB_USER" -d "$DB_NAME" -v ON_ERROR_STOP=1)
+
+# Record applied migrations so each runs once. A database migrated before this
+# table existed already has students: never re-run 001 (DROP TABLE) against it;
+# the later migrations are idempotent and get recorded on this run.
+"${PSQL[@]}" -q <<'SQL' || { echo "Could not create schema_migrations"; exit 1; }
+DO $$
+BEGIN
+    IF to_regclass('schema_migrations') IS NULL THEN
+        CREATE TABLE schema_migrations (
+            version TEXT PRIMARY KEY,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+        IF to_regclass('students') IS NOT NULL THEN
+            INSERT INTO schema_migrations (version) VALUES ('001_create_students_table.sql');
+        END IF;
+    END IF;
+END
+$$;
+SQL
+
+# Apply pending migrations in order
+for migration in migrations/*.sql; do
+    version=$(basename "$migration")
+    applied=$("${PSQL[@]}" -tAc "SELECT 1 FROM schema_migrations WHERE version = '$version'") || { echo "Could not read schema_migrations"; exit 1; }
+    if [ "$applied" = "1" ]; then
+        echo "Skipping $migration (already applied)"
+        continue
+    fi
+    echo "Applying migration $migration..."
+    "${PSQL[@]}" -f "$migration" || { echo "Migration $migration failed"; exit 1; }
+    "${PSQL[@]}" -qc "INSERT INTO schema_migrations (version) VALUES ('$version')" || { echo "Could not record $migration"; exit 1; }
+done
 
 echo "Migration completed successfully."
@@ -0,0 +1,8 @@
+-- B-tree indexes backing the filters and sort orders of GET /api/v1/students.
+-- Each index ends with id so keyset pagination on (column, id) is an index range scan.
+CREATE INDEX IF NOT EXISTS idx_students_age_id ON students (age, id);
+CREATE INDEX IF NOT EXISTS idx_students_email_id ON students (email, id);
+CREATE INDEX IF NOT EXISTS idx_students_name_id ON students (name, id);
+-- Pattern operator class so name LIKE 'prefix%' can use an index under any collation
+CREATE INDEX IF NOT EXISTS idx_students_name_pattern ON students (name text_pattern_ops);
+ANALYZE students;
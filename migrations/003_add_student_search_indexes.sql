@@ -0,0 +1,8 @@
+-- Trigram indexes backing GET /api/v1/students/search (substring and typo-tolerant matching)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_students_name_trgm ON students USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_students_email_trgm ON students USING gin (email gin_trgm_ops);
+-- Case-insensitive prefix-only search (?mode=prefix)
+CREATE INDEX IF NOT EXISTS idx_students_lower_name_prefix ON students (lower(name) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_students_lower_email_prefix ON students (lower(email) text_pattern_ops);
+ANALYZE students;
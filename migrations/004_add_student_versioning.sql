@@ -0,0 +1,37 @@
+-- Row versions and a table change counter backing ETags / If-None-Match / If-Match
+ALTER TABLE students ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 1;
+ALTER TABLE students ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+-- Every UPDATE bumps the row's version, whichever code path issued it
+CREATE OR REPLACE FUNCTION students_bump_version() RETURNS trigger AS $$
+BEGIN
+    NEW.version := OLD.version + 1;
+    NEW.updated_at := now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS students_bump_version ON students;
+CREATE TRIGGER students_bump_version
+    BEFORE UPDATE ON students
+    FOR EACH ROW EXECUTE FUNCTION students_bump_version();
+
+-- One counter per table, bumped once per modifying statement inside its
+-- transaction, so readers never see a version whose changes are not yet visible
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1
+);
+INSERT INTO table_versions (table_name) VALUES ('students') ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS students_bump_table_version ON students;
+CREATE TRIGGER students_bump_table_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON students
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
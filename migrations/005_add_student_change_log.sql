@@ -0,0 +1,61 @@
+-- Change log backing GET /api/v1/students/changes (delta sync)
+CREATE TABLE IF NOT EXISTS student_changes (
+    seq BIGSERIAL PRIMARY KEY,
+    student_id INTEGER,                      -- NULL for a TRUNCATE
+    op CHAR(1) NOT NULL,                     -- I(nsert), U(pdate), D(elete) or T(runcate)
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+-- Compaction keeps only the newest entry per student; retention purges by age
+CREATE INDEX IF NOT EXISTS idx_student_changes_student_seq ON student_changes (student_id, seq);
+CREATE INDEX IF NOT EXISTS idx_student_changes_changed_at ON student_changes (changed_at);
+
+-- Highest seq removed by retention; older cursors cannot be resumed
+CREATE TABLE IF NOT EXISTS change_log_state (
+    log_name TEXT PRIMARY KEY,
+    purged_through BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO change_log_state (log_name) VALUES ('student_changes') ON CONFLICT DO NOTHING;
+
+-- One row per changed student per statement, then a NOTIFY carrying the last seq
+-- so long-polling requests wake up. These triggers are named to fire after
+-- students_bump_table_version (004): that trigger locks the table_versions row
+-- until commit, so seqs are handed out in commit order and a reader never sees
+-- seq N+1 while seq N is still uncommitted.
+CREATE OR REPLACE FUNCTION log_student_changes() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO student_changes (student_id, op) SELECT id, 'I' FROM new_rows ORDER BY id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO student_changes (student_id, op) SELECT id, 'U' FROM new_rows ORDER BY id;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO student_changes (student_id, op) SELECT id, 'D' FROM old_rows ORDER BY id;
+    ELSE
+        INSERT INTO student_changes (student_id, op) VALUES (NULL, 'T');
+    END IF;
+    IF FOUND THEN
+        PERFORM pg_notify('student_changes', currval(pg_get_serial_sequence('student_changes', 'seq'))::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables allow only one event per trigger
+DROP TRIGGER IF EXISTS students_log_changes_insert ON students;
+CREATE TRIGGER students_log_changes_insert
+    AFTER INSERT ON students REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION log_student_changes();
+
+DROP TRIGGER IF EXISTS students_log_changes_update ON students;
+CREATE TRIGGER students_log_changes_update
+    AFTER UPDATE ON students REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION log_student_changes();
+
+DROP TRIGGER IF EXISTS students_log_changes_delete ON students;
+CREATE TRIGGER students_log_changes_delete
+    AFTER DELETE ON students REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION log_student_changes();
+
+DROP TRIGGER IF EXISTS students_log_changes_truncate ON students;
+CREATE TRIGGER students_log_changes_truncate
+    AFTER TRUNCATE ON students
+    FOR EACH STATEMENT EXECUTE FUNCTION log_student_changes();
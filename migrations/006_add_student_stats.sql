@@ -0,0 +1,129 @@
+-- Roster statistics backing GET /api/v1/students/stats, kept up to date by
+-- triggers so a request reads O(ages + domains) summary rows instead of students
+CREATE TABLE IF NOT EXISTS student_stats_totals (
+    singleton BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (singleton),
+    students BIGINT NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMPTZ                 -- last full rebuild
+);
+INSERT INTO student_stats_totals (singleton) VALUES (TRUE) ON CONFLICT DO NOTHING;
+
+-- Exact counts per age; histogram buckets are summed from these at request time.
+-- Students without an age are the total minus the sum of these counts.
+CREATE TABLE IF NOT EXISTS student_age_counts (
+    age INTEGER PRIMARY KEY,
+    students BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS student_email_domains (
+    email_domain TEXT PRIMARY KEY,
+    students BIGINT NOT NULL
+);
+-- Top-N domains without sorting the whole table
+CREATE INDEX IF NOT EXISTS idx_student_email_domains_students
+    ON student_email_domains (students DESC, email_domain);
+
+CREATE OR REPLACE FUNCTION student_email_domain(email TEXT) RETURNS TEXT AS $$
+    SELECT lower(split_part(email, '@', 2));
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Add deltas[i] students with ages[i] and domains[i]; rows whose deltas cancel
+-- out (e.g. an UPDATE that changed neither age nor email) touch nothing
+CREATE OR REPLACE FUNCTION apply_student_stats_delta(ages INTEGER[], domains TEXT[], deltas INTEGER[])
+RETURNS void AS $$
+DECLARE
+    total_delta BIGINT;
+BEGIN
+    SELECT coalesce(sum(delta), 0) INTO total_delta FROM unnest(deltas) AS delta;
+    IF total_delta <> 0 THEN
+        UPDATE student_stats_totals SET students = students + total_delta;
+    END IF;
+
+    INSERT INTO student_age_counts AS c (age, students)
+        SELECT age, sum(delta) FROM unnest(ages, deltas) AS d(age, delta)
+        WHERE age IS NOT NULL GROUP BY age HAVING sum(delta) <> 0
+        ON CONFLICT (age) DO UPDATE SET students = c.students + EXCLUDED.students;
+    DELETE FROM student_age_counts WHERE age = ANY(ages) AND students = 0;
+
+    INSERT INTO student_email_domains AS c (email_domain, students)
+        SELECT email_domain, sum(delta) FROM unnest(domains, deltas) AS d(email_domain, delta)
+        WHERE email_domain IS NOT NULL GROUP BY email_domain HAVING sum(delta) <> 0
+        ON CONFLICT (email_domain) DO UPDATE SET students = c.students + EXCLUDED.students;
+    DELETE FROM student_email_domains WHERE email_domain = ANY(domains) AND students = 0;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Once per statement from the transition tables. These triggers fire after
+-- students_bump_table_version (004), whose row lock serializes writers until
+-- commit, so concurrent statements never interleave their summary updates.
+CREATE OR REPLACE FUNCTION maintain_student_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM apply_student_stats_delta(array_agg(age), array_agg(student_email_domain(email)), array_agg(1))
+        FROM new_rows;
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM apply_student_stats_delta(array_agg(age), array_agg(email_domain), array_agg(delta))
+        FROM (
+            SELECT age, student_email_domain(email) AS email_domain, 1 AS delta FROM new_rows
+            UNION ALL
+            SELECT age, student_email_domain(email), -1 FROM old_rows
+        ) changed;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM apply_student_stats_delta(array_agg(age), array_agg(student_email_domain(email)), array_agg(-1))
+        FROM old_rows;
+    ELSE
+        UPDATE student_stats_totals SET students = 0;
+        DELETE FROM student_age_counts;
+        DELETE FROM student_email_domains;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recompute everything from students in one scan (GET /students/stats?refresh=full)
+CREATE OR REPLACE FUNCTION rebuild_student_stats() RETURNS void AS $$
+BEGIN
+    DELETE FROM student_age_counts;
+    DELETE FROM student_email_domains;
+    WITH counts AS MATERIALIZED (
+        SELECT age, student_email_domain(email) AS email_domain,
+               GROUPING(age) = 1 AS by_domain, count(*) AS students
+        FROM students
+        GROUP BY GROUPING SETS ((age), (student_email_domain(email)))
+    ), ages AS (
+        INSERT INTO student_age_counts (age, students)
+        SELECT age, students FROM counts WHERE NOT by_domain AND age IS NOT NULL
+    ), domains AS (
+        INSERT INTO student_email_domains (email_domain, students)
+        SELECT email_domain, students FROM counts WHERE by_domain AND email_domain IS NOT NULL
+    )
+    UPDATE student_stats_totals
+    SET students = (SELECT coalesce(sum(students), 0) FROM counts WHERE by_domain), refreshed_at = now();
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables allow only one event per trigger
+DROP TRIGGER IF EXISTS students_stats_insert ON students;
+CREATE TRIGGER students_stats_insert
+    AFTER INSERT ON students REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_student_stats();
+
+DROP TRIGGER IF EXISTS students_stats_update ON students;
+CREATE TRIGGER students_stats_update
+    AFTER UPDATE ON students REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_student_stats();
+
+DROP TRIGGER IF EXISTS students_stats_delete ON students;
+CREATE TRIGGER students_stats_delete
+    AFTER DELETE ON students REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_student_stats();
+
+DROP TRIGGER IF EXISTS students_stats_truncate ON students;
+CREATE TRIGGER students_stats_truncate
+    AFTER TRUNCATE ON students
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_student_stats();
+
+-- Seed from the existing rows, holding the writers' lock so none is missed
+BEGIN;
+SELECT version FROM table_versions WHERE table_name = 'students' FOR UPDATE;
+SELECT rebuild_student_stats();
+COMMIT;
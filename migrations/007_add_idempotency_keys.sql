@@ -0,0 +1,13 @@
+-- Responses stored per Idempotency-Key, replayed to retried POST/PUT requests
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    idempotency_key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,               -- method, path, If-Match and body digest of the first request
+    status_code INTEGER,                     -- NULL while the first request is in flight
+    response_body TEXT,
+    response_headers JSONB,
+    locked_until TIMESTAMPTZ,                -- lease of the in-flight request; a retry may take over after it
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    expires_at TIMESTAMPTZ NOT NULL
+);
+-- Purge of expired keys
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys (expires_at);
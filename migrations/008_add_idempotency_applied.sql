@@ -0,0 +1,3 @@
+-- Set by the write transaction of a request holding the key (same commit as the write),
+-- so a claim whose worker died before storing the response is never run a second time
+ALTER TABLE idempotency_keys ADD COLUMN IF NOT EXISTS applied_at TIMESTAMPTZ;
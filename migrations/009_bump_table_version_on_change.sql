@@ -0,0 +1,42 @@
+-- Bump table_versions only for statements that changed rows: a zero-row
+-- UPDATE or DELETE (e.g. PUT of a missing student) no longer takes the
+-- counter's row lock or invalidates every listing ETag
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        IF NOT EXISTS (SELECT 1 FROM old_rows) THEN
+            RETURN NULL;
+        END IF;
+    ELSIF TG_OP IN ('INSERT', 'UPDATE') THEN
+        IF NOT EXISTS (SELECT 1 FROM new_rows) THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+    UPDATE table_versions SET version = version + 1 WHERE table_name = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables allow only one event per trigger. The names keep these
+-- firing before the students_stats_* triggers (006), as the single trigger did
+DROP TRIGGER IF EXISTS students_bump_table_version ON students;
+
+DROP TRIGGER IF EXISTS students_bump_table_version_insert ON students;
+CREATE TRIGGER students_bump_table_version_insert
+    AFTER INSERT ON students REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS students_bump_table_version_update ON students;
+CREATE TRIGGER students_bump_table_version_update
+    AFTER UPDATE ON students REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS students_bump_table_version_delete ON students;
+CREATE TRIGGER students_bump_table_version_delete
+    AFTER DELETE ON students REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS students_bump_table_version_truncate ON students;
+CREATE TRIGGER students_bump_table_version_truncate
+    AFTER TRUNCATE ON students
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
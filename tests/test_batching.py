@@ -0,0 +1,146 @@
+import threading
+import time
+import unittest
+
+from app.utils.batching import BatchWriter
+from app.utils.deadline import DeadlineExceeded, clear_deadline, current_deadline, start_deadline
+
+
+def submit_all(writer, items, timeouts=None):
+    """Submit every item from its own thread; returns item -> value or exception."""
+    results = {}
+    barrier = threading.Barrier(len(items))
+
+    def submit(item, timeout):
+        token = start_deadline(timeout)
+        try:
+            barrier.wait()
+            results[item] = writer.submit(item)
+        except Exception as error:
+            results[item] = error
+        finally:
+            clear_deadline(token)
+
+    threads = [threading.Thread(target=submit, args=(item, (timeouts or {}).get(item))) for item in items]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+class TestBatchWriter(unittest.TestCase):
+    """BatchWriter with fake batch functions; needs no server or database."""
+
+    def setUp(self):
+        self.batches = []
+
+    def echo(self, items):
+        self.batches.append(list(items))
+        return [(item * 10, None) for item in items]
+
+    def test_concurrent_items_share_a_batch_and_get_their_own_values(self):
+        writer = BatchWriter(self.echo, window=1, max_batch=5, enabled=True)
+        results = submit_all(writer, [1, 2, 3, 4, 5])
+        self.assertEqual(results, {1: 10, 2: 20, 3: 30, 4: 40, 5: 50})
+        self.assertEqual([sorted(batch) for batch in self.batches], [[1, 2, 3, 4, 5]])
+        self.assertEqual(writer.stats()['batches'], 1)
+
+    def test_identical_items_are_each_written(self):
+        writer = BatchWriter(self.echo, window=1, max_batch=3, enabled=True)
+        results = submit_all(writer, ['a', 'b', 'c'])
+        self.assertEqual(results['a'], 'a' * 10)
+        self.assertEqual(sum(len(batch) for batch in self.batches), 3)
+
+    def test_batches_split_at_max_batch(self):
+        writer = BatchWriter(self.echo, window=0.2, max_batch=3, enabled=True)
+        results = submit_all(writer, list(range(7)))
+        self.assertEqual(results, {item: item * 10 for item in range(7)})
+        self.assertEqual(sorted(item for batch in self.batches for item in batch), list(range(7)))
+        self.assertTrue(all(len(batch) <= 3 for batch in self.batches))
+        self.assertLessEqual(writer.stats()['max_batch_seen'], 3)
+
+    def test_item_error_fails_only_that_item(self):
+        def batch_fn(items):
+            return [(None, "duplicate") if item == 2 else (item, None) for item in items]
+
+        writer = BatchWriter(batch_fn, window=1, max_batch=3, enabled=True)
+        results = submit_all(writer, [1, 2, 3])
+        self.assertEqual(results[1], 1)
+        self.assertEqual(results[3], 3)
+        self.assertIsInstance(results[2], Exception)
+        self.assertEqual(str(results[2]), "duplicate")
+        self.assertEqual(writer.stats()['failed'], 1)
+
+    def test_batch_exception_fails_every_item(self):
+        def batch_fn(items):
+            raise RuntimeError("connection lost")
+
+        writer = BatchWriter(batch_fn, window=1, max_batch=3, enabled=True)
+        results = submit_all(writer, [1, 2, 3])
+        for item in (1, 2, 3):
+            self.assertIsInstance(results[item], RuntimeError)
+        self.assertEqual(writer.stats()['failed'], 3)
+
+    def test_disabled_runs_a_batch_of_one(self):
+        writer = BatchWriter(self.echo)
+        self.assertEqual(writer.submit(4), 40)
+        self.assertEqual(self.batches, [[4]])
+
+    def test_batch_runs_under_loosest_deadline(self):
+        seen = []
+
+        def batch_fn(items):
+            seen.append(current_deadline().remaining())
+            return [(item, None) for item in items]
+
+        writer = BatchWriter(batch_fn, window=1, max_batch=2, enabled=True)
+        results = submit_all(writer, [1, 2], timeouts={1: 0.5, 2: 30})
+        self.assertEqual(results, {1: 1, 2: 2})
+        self.assertGreater(seen[0], 10)
+
+    def test_follower_waits_only_until_its_own_deadline(self):
+        release = threading.Event()
+
+        def batch_fn(items):
+            release.wait(5)
+            return [(item, None) for item in items]
+
+        writer = BatchWriter(batch_fn, window=1, max_batch=2, enabled=True)
+        started = time.monotonic()
+        results = {}
+        leader = threading.Thread(target=lambda: results.setdefault('leader', writer.submit('leader')))
+        leader.start()
+        time.sleep(0.05)
+        token = start_deadline(0.2)
+        try:
+            with self.assertRaises(DeadlineExceeded):
+                writer.submit('follower')
+        finally:
+            clear_deadline(token)
+        self.assertLess(time.monotonic() - started, 2)
+        release.set()
+        leader.join(5)
+        self.assertEqual(results['leader'], 'leader')
+
+    def test_timed_out_batch_is_resubmitted_for_callers_with_time_left(self):
+        calls = []
+
+        def batch_fn(items):
+            calls.append(list(items))
+            if len(calls) == 1:
+                raise DeadlineExceeded("batch ran out of time")
+            return [(item, None) for item in items]
+
+        writer = BatchWriter(batch_fn, window=0, enabled=True)
+        token = start_deadline(30)
+        try:
+            self.assertEqual(writer.submit(7), 7)
+        finally:
+            clear_deadline(token)
+        self.assertEqual(calls, [[7], [7]])
+        self.assertEqual(writer.stats()['retries'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+import unittest
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from app.models.student_query import StudentQuery  # noqa: E402
+
+
+class TestStudentQueryIndexes(unittest.TestCase):
+    """Checks with EXPLAIN that every list filter compiles to an index scan.
+
+    Sequential scans are disabled for the session so the planner has to use
+    an index whenever one applies, even on the small test table.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        try:
+            cls.conn = psycopg2.connect(
+                host=os.getenv('DB_HOST', 'localhost'),
+                port=os.getenv('DB_PORT', '5432'),
+                database=os.getenv('DB_NAME', 'student_db'),
+                user=os.getenv('DB_USER', 'postgres'),
+                password=os.getenv('DB_PASSWORD', 'password'),
+                connect_timeout=3
+            )
+        except psycopg2.OperationalError as e:
+            raise unittest.SkipTest(f"Database not reachable: {e}")
+        with cls.conn.cursor() as cur:
+            cur.execute("SET enable_seqscan = off")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+
+    def explain(self, query, after=None, limit=100):
+        sql, params = query.select(after, limit)
+        with self.conn.cursor() as cur:
+            cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            return json.dumps(cur.fetchone()[0])
+
+    def assertUsesIndex(self, query, index, after=None):
+        plan = self.explain(query, after)
+        self.assertIn(index, plan, plan)
+        self.assertNotIn('"Seq Scan"', plan, plan)
+
+    def test_age_range_uses_index(self):
+        self.assertUsesIndex(StudentQuery(age_min=18, age_max=30, sort='age'), 'idx_students_age_id')
+
+    def test_email_uses_index(self):
+        self.assertUsesIndex(StudentQuery(email='someone@example.com'), 'idx_students_email_id')
+
+    def test_name_prefix_uses_index(self):
+        self.assertUsesIndex(StudentQuery(name_prefix='Ali'), 'idx_students_name_pattern')
+
+    def test_sort_by_name_keyset_uses_index(self):
+        self.assertUsesIndex(StudentQuery(sort='name'), 'idx_students_name_id', after=('M', 10))
+
+    def test_sparse_fields_select_only_requested_columns(self):
+        sql, _ = StudentQuery(fields=['name']).select()
+        self.assertTrue(sql.startswith('SELECT id, name FROM students'))
+
+
+if __name__ == '__main__':
+    unittest.main()
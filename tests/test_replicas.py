@@ -0,0 +1,81 @@
+import os
+import time
+import unittest
+import uuid
+
+import psycopg2
+import requests
+
+
+def connect(host, port):
+    return psycopg2.connect(
+        host=host,
+        port=port,
+        database=os.getenv('DB_NAME', 'student_db'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', 'password'),
+        connect_timeout=3
+    )
+
+
+class TestReadReplicas(unittest.TestCase):
+    """Runs against docker-compose.yml + docker-compose.replica.yml.
+
+    The primary is reached on DB_HOST:DB_PORT and the replica on
+    REPLICA_HOST:REPLICA_PORT (localhost:5433 by default); skipped when
+    either is unreachable.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        try:
+            cls.primary = connect(os.getenv('DB_HOST', 'localhost'), os.getenv('DB_PORT', '5432'))
+            cls.replica = connect(os.getenv('REPLICA_HOST', 'localhost'), os.getenv('REPLICA_PORT', '5433'))
+        except psycopg2.OperationalError as e:
+            raise unittest.SkipTest(f"Primary and replica not reachable: {e}")
+        cls.primary.autocommit = True
+        cls.replica.autocommit = True
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.primary.close()
+        cls.replica.close()
+
+    def test_replica_is_streaming(self):
+        with self.replica.cursor() as cur:
+            cur.execute("SELECT pg_is_in_recovery()")
+            self.assertTrue(cur.fetchone()[0])
+        with self.primary.cursor() as cur:
+            cur.execute("SELECT count(*) FROM pg_stat_replication WHERE state = 'streaming'")
+            self.assertGreaterEqual(cur.fetchone()[0], 1)
+
+    def test_replica_in_rotation(self):
+        response = requests.get('http://localhost:5000/api/v1/replicas/stats')
+        self.assertEqual(response.status_code, 200)
+        replicas = response.json()['replicas']
+        self.assertTrue(replicas)
+        requests.get('http://localhost:5000/api/v1/students?limit=1')
+        stats = requests.get('http://localhost:5000/api/v1/replicas/stats').json()
+        self.assertTrue(any(replica['in_rotation'] for replica in stats['replicas']), stats)
+
+    def test_write_then_read_through_api(self):
+        email = f"replica-{uuid.uuid4().hex[:8]}@example.com"
+        created = requests.post('http://localhost:5000/api/v1/students', json={"name": "Replica Test", "email": email})
+        self.assertEqual(created.status_code, 201)
+        student_id = created.json()['id']
+        # The write reaches the replica well within the lag threshold
+        for _ in range(50):
+            with self.replica.cursor() as cur:
+                cur.execute("SELECT email FROM students WHERE id = %s", (student_id,))
+                row = cur.fetchone()
+            if row:
+                break
+            time.sleep(0.1)
+        self.assertEqual(row, (email,))
+        response = requests.get(f'http://localhost:5000/api/v1/students/{student_id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['email'], email)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,6 @@
+import json
 import unittest
+import uuid
 import requests
 
 class TestStudentsAPI(unittest.TestCase):
@@ -8,11 +10,266 @@ class TestStudentsAPI(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json()['status'],'ok')
     
+    def test_pool_stats(self):
+        response = requests.get('http://localhost:5000/api/v1/pool/stats')
+        self.assertEqual(response.status_code, 200)
+        stats = response.json()
+        self.assertLessEqual(stats['in_use'] + stats['idle'], stats['max'])
+        self.assertIn('+Inf', stats['wait_seconds_histogram'])
+
     def test_get_all_students(self):
         response = requests.get('http://localhost:5000/api/v1/students')
         self.assertEqual(response.status_code, 200)
         self.assertIsInstance(response.json(), list)
 
+    def test_get_students_page(self):
+        response = requests.get('http://localhost:5000/api/v1/students?limit=2')
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        self.assertIsInstance(page['data'], list)
+        self.assertLessEqual(len(page['data']), 2)
+        if page['next_after_id'] is not None:
+            next_response = requests.get(f"http://localhost:5000{page['next']}")
+            self.assertEqual(next_response.status_code, 200)
+            self.assertTrue(all(s['id'] > page['next_after_id'] for s in next_response.json()['data']))
+
+    def test_db_serialization_matches_python(self):
+        python_page = requests.get('http://localhost:5000/api/v1/students?limit=5').json()
+        db_page = requests.get('http://localhost:5000/api/v1/students?limit=5&serialize=db').json()
+        self.assertEqual(python_page['data'], db_page['data'])
+        self.assertEqual(python_page['next_after_id'], db_page['next_after_id'])
+        db_stream = requests.get('http://localhost:5000/api/v1/students?serialize=db')
+        self.assertEqual(db_stream.status_code, 200)
+        self.assertIsInstance(db_stream.json(), list)
+
+    def test_sparse_fields_filters_and_sort(self):
+        prefix = f"filter{uuid.uuid4().hex[:8]}"
+        for i, age in enumerate((40, 41, 42)):
+            requests.post('http://localhost:5000/api/v1/students',
+                          json={"name": f"{prefix}-{i}", "email": f"{prefix}-{i}@example.com", "age": age})
+        response = requests.get('http://localhost:5000/api/v1/students'
+                                f'?fields=name&name_prefix={prefix}&age_min=41&sort=-age&limit=1')
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        self.assertEqual(set(page['data'][0]), {'id', 'name'})
+        self.assertEqual(page['data'][0]['name'], f'{prefix}-2')
+        next_page = requests.get(f"http://localhost:5000{page['next']}").json()
+        self.assertEqual([s['name'] for s in next_page['data']], [f'{prefix}-1'])
+        self.assertIsNone(next_page['next'])
+
+    def test_unknown_field_and_sort_rejected(self):
+        self.assertEqual(requests.get('http://localhost:5000/api/v1/students?fields=password').status_code, 400)
+        self.assertEqual(requests.get('http://localhost:5000/api/v1/students?sort=password').status_code, 400)
+
+    def test_search_students(self):
+        token = uuid.uuid4().hex[:10]
+        student_id = requests.post('http://localhost:5000/api/v1/students',
+                                   json={"name": f"Searchable {token}", "email": f"{token}@example.com"}).json()['id']
+        response = requests.get(f'http://localhost:5000/api/v1/students/search?q={token[2:8]}&limit=5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'][0]['id'], student_id)
+        prefix_response = requests.get(f'http://localhost:5000/api/v1/students/search?q={token[:4]}&mode=prefix')
+        self.assertIn(student_id, [s['id'] for s in prefix_response.json()['data']])
+        self.assertEqual(requests.get('http://localhost:5000/api/v1/students/search').status_code, 400)
+
+    def test_metrics_endpoint(self):
+        requests.get('http://localhost:5000/api/v1/students?limit=1')
+        response = requests.get('http://localhost:5000/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers['Content-Type'].startswith('text/plain'))
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="/api/v1/students",status="200"',
+                      response.text)
+        self.assertIn('db_query_duration_seconds_count{statement="SELECT', response.text)
+        self.assertIn('db_pool_acquire_wait_seconds_bucket{le="+Inf"}', response.text)
+
+    def test_admission_stats(self):
+        response = requests.get('http://localhost:5000/api/v1/admission/stats')
+        self.assertEqual(response.status_code, 200)
+        stats = response.json()
+        for key in ('limit', 'active', 'queued', 'admitted', 'shed', 'rate_limit'):
+            self.assertIn(key, stats)
+        self.assertGreaterEqual(stats['limit'], 1)
+
+    def test_request_timeout_header(self):
+        response = requests.get('http://localhost:5000/api/v1/students?limit=1',
+                                headers={'X-Request-Timeout-Ms': '2000'})
+        self.assertEqual(response.status_code, 200)
+        response = requests.get('http://localhost:5000/api/v1/students?limit=1',
+                                headers={'X-Request-Timeout-Ms': 'soon'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_request_id_echoed(self):
+        response = requests.get('http://localhost:5000/api/v1/students?limit=1',
+                                headers={'X-Request-Id': 'trace-123'})
+        self.assertEqual(response.headers.get('X-Request-Id'), 'trace-123')
+        response = requests.get('http://localhost:5000/api/v1/students?limit=1')
+        self.assertEqual(len(response.headers.get('X-Request-Id', '')), 32)
+
+    def test_liveness_and_readiness(self):
+        response = requests.get('http://localhost:5000/api/v1/health/live')
+        self.assertEqual(response.status_code, 200)
+        response = requests.get('http://localhost:5000/api/v1/health/ready')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'ready')
+        self.assertGreaterEqual(response.json()['pool']['size'], 1)
+
+    def test_concurrent_creates_get_distinct_ids(self):
+        from concurrent.futures import ThreadPoolExecutor
+        token = uuid.uuid4().hex[:8]
+
+        def create(index):
+            return requests.post('http://localhost:5000/api/v1/students',
+                                 json={"name": f"Concurrent {index}", "email": f"{token}-{index}@example.com"})
+
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            responses = list(pool.map(create, range(20)))
+        self.assertTrue(all(response.status_code == 201 for response in responses))
+        for index, response in enumerate(responses):
+            self.assertEqual(response.json()['email'], f"{token}-{index}@example.com")
+            fetched = requests.get(f"http://localhost:5000/api/v1/students/{response.json()['id']}").json()
+            self.assertEqual(fetched['email'], f"{token}-{index}@example.com")
+        self.assertEqual(len({response.json()['id'] for response in responses}), 20)
+        stats = requests.get('http://localhost:5000/api/v1/writes/stats').json()
+        self.assertIn('batches', stats)
+
+    def test_conditional_get_student(self):
+        student_id = requests.post('http://localhost:5000/api/v1/students',
+                                   json={"name": "Etag", "email": f"{uuid.uuid4().hex[:8]}@example.com"}).json()['id']
+        response = requests.get(f'http://localhost:5000/api/v1/students/{student_id}')
+        etag = response.headers['ETag']
+        response = requests.get(f'http://localhost:5000/api/v1/students/{student_id}', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        requests.patch(f'http://localhost:5000/api/v1/students/{student_id}', json={"age": 30})
+        response = requests.get(f'http://localhost:5000/api/v1/students/{student_id}', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_conditional_get_students_page(self):
+        response = requests.get('http://localhost:5000/api/v1/students?limit=5')
+        etag = response.headers['ETag']
+        response = requests.get('http://localhost:5000/api/v1/students?limit=5', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        requests.post('http://localhost:5000/api/v1/students',
+                      json={"name": "Etag list", "email": f"{uuid.uuid4().hex[:8]}@example.com"})
+        response = requests.get('http://localhost:5000/api/v1/students?limit=5', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_match_rejects_stale_version(self):
+        student_id = requests.post('http://localhost:5000/api/v1/students',
+                                   json={"name": "Optimistic", "email": f"{uuid.uuid4().hex[:8]}@example.com"}).json()['id']
+        etag = requests.get(f'http://localhost:5000/api/v1/students/{student_id}').headers['ETag']
+        response = requests.put(f'http://localhost:5000/api/v1/students/{student_id}',
+                                json={"name": "First"}, headers={'If-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        response = requests.put(f'http://localhost:5000/api/v1/students/{student_id}',
+                                json={"name": "Second"}, headers={'If-Match': etag})
+        self.assertEqual(response.status_code, 412)
+        response = requests.delete(f'http://localhost:5000/api/v1/students/{student_id}', headers={'If-Match': etag})
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(requests.get(f'http://localhost:5000/api/v1/students/{student_id}').json()['name'], "First")
+
+    def test_change_feed_returns_compacted_delta(self):
+        cursor = requests.get('http://localhost:5000/api/v1/students/changes').json()['cursor']
+        student_id = requests.post('http://localhost:5000/api/v1/students',
+                                   json={"name": "Feed", "email": f"{uuid.uuid4().hex[:8]}@example.com"}).json()['id']
+        requests.patch(f'http://localhost:5000/api/v1/students/{student_id}', json={"age": 21})
+        feed = requests.get(f'http://localhost:5000/api/v1/students/changes?since={cursor}').json()
+        entries = [change for change in feed['changes'] if change.get('id') == student_id]
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]['op'], 'upsert')
+        self.assertEqual(entries[0]['student']['age'], 21)
+        requests.delete(f'http://localhost:5000/api/v1/students/{student_id}')
+        feed = requests.get(f"http://localhost:5000/api/v1/students/changes?since={feed['cursor']}").json()
+        self.assertIn({'op': 'delete', 'id': student_id}, feed['changes'])
+
+    def test_change_feed_long_poll_wakes_on_write(self):
+        import threading
+        cursor = requests.get('http://localhost:5000/api/v1/students/changes').json()['cursor']
+        email = f"{uuid.uuid4().hex[:8]}@example.com"
+        timer = threading.Timer(1.0, lambda: requests.post('http://localhost:5000/api/v1/students',
+                                                           json={"name": "Long poll", "email": email}))
+        timer.start()
+        response = requests.get(f'http://localhost:5000/api/v1/students/changes?since={cursor}&wait=10', timeout=15)
+        timer.join()
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.json()['cursor'], cursor)
+        self.assertIn(email, [change['student']['email'] for change in response.json()['changes'] if 'student' in change])
+
+    def test_stats_track_writes(self):
+        url = 'http://localhost:5000/api/v1/students/stats'
+        before = requests.get(url).json()
+        student_id = requests.post('http://localhost:5000/api/v1/students',
+                                   json={"name": "stats", "email": "stats@example.com", "age": 19}).json()['id']
+        after = requests.get(url).json()
+        self.assertEqual(after['total'], before['total'] + 1)
+        self.assertEqual(after['age']['known'], before['age']['known'] + 1)
+        requests.delete(f'http://localhost:5000/api/v1/students/{student_id}')
+        self.assertEqual(requests.get(url).json()['total'], before['total'])
+
+    def test_stats_buckets_and_full_refresh(self):
+        stats = requests.get('http://localhost:5000/api/v1/students/stats?age_buckets=18,30').json()
+        self.assertEqual([(b['min'], b['max']) for b in stats['age']['histogram']], [(None, 17), (18, 29), (30, None)])
+        self.assertEqual(sum(b['count'] for b in stats['age']['histogram']), stats['age']['known'])
+        rebuilt = requests.post('http://localhost:5000/api/v1/students/stats/rebuild')
+        # Throttled when the summary was rebuilt recently (e.g. by the migration)
+        self.assertIn(rebuilt.status_code, (200, 429))
+        if rebuilt.status_code == 200:
+            self.assertEqual(rebuilt.json()['drift'], {'students': 0, 'ages': 0, 'email_domains': 0})
+        else:
+            self.assertIn('Retry-After', rebuilt.headers)
+        self.assertEqual(requests.get('http://localhost:5000/api/v1/students/stats?refresh=full').status_code, 400)
+        self.assertEqual(requests.get('http://localhost:5000/api/v1/students/stats?age_buckets=30,18').status_code, 400)
+
+    def test_idempotency_key_replays_create(self):
+        key = uuid.uuid4().hex
+        body = {"name": "Idempotent", "email": f"{key[:8]}@example.com"}
+        first = requests.post('http://localhost:5000/api/v1/students', json=body, headers={'Idempotency-Key': key})
+        self.assertEqual(first.status_code, 201)
+        retry = requests.post('http://localhost:5000/api/v1/students', json=body, headers={'Idempotency-Key': key})
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json()['id'], first.json()['id'])
+        self.assertEqual(retry.headers.get('Idempotent-Replayed'), 'true')
+        other = requests.post('http://localhost:5000/api/v1/students', json=dict(body, name="Other"),
+                              headers={'Idempotency-Key': key})
+        self.assertEqual(other.status_code, 422)
+
+    def test_idempotency_key_concurrent_duplicates_create_once(self):
+        from concurrent.futures import ThreadPoolExecutor
+        key = uuid.uuid4().hex
+        body = {"name": "Idempotent", "email": f"{key[:8]}@example.com"}
+
+        def create(_):
+            return requests.post('http://localhost:5000/api/v1/students', json=body, headers={'Idempotency-Key': key})
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            responses = list(pool.map(create, range(5)))
+        self.assertTrue(all(response.status_code == 201 for response in responses))
+        self.assertEqual(len({response.json()['id'] for response in responses}), 1)
+
+    def test_idempotency_key_put_missing_student(self):
+        headers = {'Idempotency-Key': uuid.uuid4().hex}
+        for _ in range(2):
+            response = requests.put('http://localhost:5000/api/v1/students/999999999',
+                                    json={"name": "Nobody"}, headers=headers)
+            self.assertEqual(response.status_code, 404)
+
+    def test_create_reports_all_validation_errors(self):
+        response = requests.post('http://localhost:5000/api/v1/students',
+                                 json={"name": "", "email": "not-an-email", "age": "old"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'],
+                         ["Name is required", "Invalid email format", "Age must be a valid number"])
+
+    def test_create_normalizes_age(self):
+        response = requests.post('http://localhost:5000/api/v1/students',
+                                 json={"name": "Typed", "email": f"{uuid.uuid4().hex[:8]}@example.com", "age": "33"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['age'], 33)
+
+    def test_get_students_invalid_limit(self):
+        response = requests.get('http://localhost:5000/api/v1/students?limit=abc')
+        self.assertEqual(response.status_code, 400)
+
     def test_create_and_get_student(self):
         student_data = {"name": "test1", "email": "test1@example.com", "age": 20}
         create_response = requests.post('http://localhost:5000/api/v1/students', json=student_data)
@@ -22,6 +279,77 @@ class TestStudentsAPI(unittest.TestCase):
         self.assertEqual(get_response.status_code, 200)
         self.assertIsInstance(get_response.json(), dict)
 
+    def test_bulk_create_atomic_rejects_invalid(self):
+        records = [{"name": "bulk1", "email": "bulk1@example.com"}, {"name": "bulk2", "email": "not-an-email"}]
+        response = requests.post('http://localhost:5000/api/v1/students/bulk', json=records)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['created'], 0)
+        self.assertEqual(response.json()['results'][1]['status'], 'error')
+
+    def test_bulk_create_partial_ndjson(self):
+        body = '{"name": "bulk3", "email": "bulk3@example.com", "age": 21}\n{"name": "bulk4"}\n'
+        response = requests.post('http://localhost:5000/api/v1/students/bulk?mode=partial', data=body,
+                                 headers={'Content-Type': 'application/x-ndjson'})
+        self.assertEqual(response.status_code, 207)
+        results = response.json()['results']
+        self.assertEqual(results[0]['status'], 'created')
+        self.assertEqual(results[1]['status'], 'error')
+        get_response = requests.get(f"http://localhost:5000/api/v1/students/{results[0]['id']}")
+        self.assertEqual(get_response.status_code, 200)
+
+    def test_export_csv(self):
+        response = requests.get('http://localhost:5000/api/v1/students/export?format=csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.text.startswith('id,name,email,age'))
+
+    def test_export_ndjson(self):
+        response = requests.get('http://localhost:5000/api/v1/students/export?format=ndjson')
+        self.assertEqual(response.status_code, 200)
+        for line in response.text.splitlines():
+            self.assertIn('id', json.loads(line))
+
+    def test_cache_invalidated_on_update(self):
+        create_response = requests.post('http://localhost:5000/api/v1/students',
+                                        json={"name": "cached", "email": "cached@example.com", "age": 30})
+        student_id = create_response.json()['id']
+        requests.get(f'http://localhost:5000/api/v1/students/{student_id}')
+        requests.put(f'http://localhost:5000/api/v1/students/{student_id}', json={"age": 31})
+        get_response = requests.get(f'http://localhost:5000/api/v1/students/{student_id}')
+        self.assertEqual(get_response.json()['age'], 31)
+        stats = requests.get('http://localhost:5000/api/v1/cache/stats').json()
+        self.assertGreaterEqual(stats['hits'] + stats['misses'], 2)
+
+    def test_patch_student_only_touches_sent_fields(self):
+        create_response = requests.post('http://localhost:5000/api/v1/students',
+                                        json={"name": "patch1", "email": "patch1@example.com", "age": 22})
+        student_id = create_response.json()['id']
+        patch_response = requests.patch(f'http://localhost:5000/api/v1/students/{student_id}', json={"age": None})
+        self.assertEqual(patch_response.status_code, 200)
+        self.assertIsNone(patch_response.json()['age'])
+        self.assertEqual(patch_response.json()['name'], 'patch1')
+
+    def test_patch_and_delete_missing_student(self):
+        self.assertEqual(requests.patch('http://localhost:5000/api/v1/students/999999999', json={"age": 1}).status_code, 404)
+        self.assertEqual(requests.delete('http://localhost:5000/api/v1/students/999999999').status_code, 404)
+
+    def test_batch_get_students_by_ids(self):
+        created = [requests.post('http://localhost:5000/api/v1/students',
+                                 json={"name": f"batch{i}", "email": f"batch{i}@example.com"}).json()['id']
+                   for i in range(2)]
+        ids = ','.join(str(student_id) for student_id in created + [999999999])
+        response = requests.get(f'http://localhost:5000/api/v1/students?ids={ids}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([s['id'] for s in response.json()['data']], created)
+        self.assertEqual(response.json()['missing'], [999999999])
+
+    def test_prepared_statement_stats(self):
+        student_id = requests.post('http://localhost:5000/api/v1/students',
+                                   json={"name": "prep", "email": "prep@example.com"}).json()['id']
+        requests.delete(f'http://localhost:5000/api/v1/students/{student_id}')
+        statements = requests.get('http://localhost:5000/api/v1/prepared/stats').json()['statements']
+        self.assertGreaterEqual(statements['student_insert']['prepared'], 1)
+        self.assertGreaterEqual(statements['student_delete']['prepared'], 1)
+
 #    def test_delete_student(self):
 #        response = requests.delete('http://localhost:5000/api/v1/students/5')
 #        self.assertEqual(response.status_code, 200)